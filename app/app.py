@@ -12,16 +12,18 @@ st.set_page_config(
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from landing_page.app import render_landing_page
-from components.heart import show_main_app
+from backend.warm_up import start_background_warm_up
 
 def main():
     """Main application entry point."""
     params = st.query_params
     
     if "page" in params and params["page"] == "main":
+        from components.heart import show_main_app #imports the whole backend, deferred so the landing page does not wait for it
         show_main_app()
     else:
         render_landing_page()
+        start_background_warm_up() #torch and the embedding model load while the visitor reads the landing page
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,16 +1,18 @@
 import streamlit as st
-import os
-import tempfile
 import uuid
 import numpy as np
 from pathlib import Path
 
-from backend.pdf_ingestion import extract_text_from_pdf
-from backend.text_chunking import chunk_and_embed
-from backend.pinecone_storage import initialize_pinecone, store_embeddings
+from backend.ingestion_jobs import submit_ingestion_job, list_jobs, start_ingestion_workers, ACTIVE_STATUSES
+from backend.pinecone_storage import get_vector_index, delete_namespace, namespace_vector_counts
+from backend.namespace_registry import start_namespace_reaper
+from backend.embedding_service import warm_up_embedding_model
 from backend.query_processing import process_query
 from backend.retrieval import retrieve_chunks
-from backend.response_generation import generate_response
+from backend.reranking import rerank_chunks, RERANK_ENABLED, RERANK_CANDIDATES
+from backend.response_generation import stream_direct_response_with_chunks
+from backend.tracing import start_trace, current_trace, start_metrics_exporter
+from backend.warm_up import start_background_warm_up
 from landing_page.components.navbar import render_navbar
 from landing_page.components.footer import render_footer
 
@@ -43,6 +45,15 @@ def show_main_app():
     load_css()
     
     render_navbar()
+
+    if not start_background_warm_up(delay=0): #the page renders while the model loads, the first query waits for it if needed
+        warm_up_embedding_model()
+    start_ingestion_workers()
+    start_metrics_exporter()
+    start_namespace_reaper(
+        lambda namespace: delete_namespace(namespace, show_status=False),
+        lambda: namespace_vector_counts(show_status=False)
+    )
     
     st.markdown(
         """
@@ -54,61 +65,41 @@ def show_main_app():
     )
     
     def process_uploaded_files(uploaded_files):
-        with st.spinner("Processing files..."):
-            index = initialize_pinecone()
-            if not index:
-                st.error("Failed to connect to Pinecone. Check your API key.")
-                return False
-
-            for file in uploaded_files:
-                if file.name in st.session_state.processed_files:
-                    continue
-
-                with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp:
-                    tmp.write(file.getvalue())
-                    pdf_path = tmp.name
-
-                try:
-                    text_result = extract_text_from_pdf(pdf_path)
-                    if isinstance(text_result, tuple) and len(text_result) == 2:
-                        text, pdf_metadata = text_result
-                    else:
-                        text = text_result
-                        pdf_metadata = {}
-
-                    if not text or not isinstance(text, str):
-                        st.warning(f"No valid text extracted from {file.name}")
-                        continue
-
-                    metadata = {
-                        "filename": file.name,
-                        "source": "uploaded_pdf"
-                    }
-                    if isinstance(pdf_metadata, dict):
-                        for key, value in pdf_metadata.items():
-                            if key != "filename":
-                                metadata[key] = value
+        index = get_vector_index()
+        if not index:
+            st.error("Failed to connect to the vector index. Check your Pinecone API key or set VECTOR_STORE=local.")
+            return False
 
-                    chunks, embeddings, chunk_metadata = chunk_and_embed(text, metadata)
-
-                    if not chunks:
-                        st.warning(f"No chunks created for {file.name}")
-                        continue
-
-                    store_success = store_embeddings(
-                        embeddings,
-                        chunk_metadata,
-                        namespace=st.session_state.namespace
-                    )
-
-                    if store_success:
-                        st.session_state.processed_files.append(file.name)
-
-                finally:
-                    if os.path.exists(pdf_path):
-                        os.remove(pdf_path)
-
-            return len(st.session_state.processed_files) > 0
+        files = {file.name: file.getvalue() for file in uploaded_files} #content already in the namespace is skipped, new versions are diffed
+        for name, pdf_bytes in files.items():
+            submit_ingestion_job(st.session_state.namespace, name, pdf_bytes) #runs in the background, the page stays usable
+        return True
+    
+    def sync_finished_jobs(jobs):
+        """Move finished jobs into the processed file list, returns True if any file became queryable."""
+        added = False
+        for job in jobs:
+            if job["status"] == "done" and job["filename"] not in st.session_state.processed_files:
+                st.session_state.processed_files.append(job["filename"])
+                added = True
+        return added
+    
+    def show_job_status(jobs):
+        for job in jobs:
+            if job["status"] == "failed":
+                st.warning(f"Failed to process {job['filename']}: {job['error']}")
+            elif job["status"] == "skipped":
+                st.caption(f"📄 {job['filename']}: skipped, {job['detail']}")
+            elif job["status"] in ACTIVE_STATUSES:
+                st.caption(f"📄 {job['filename']}: {job['stage']}" + (f" ({job['detail']})" if job["detail"] else ""))
+    
+    def ingestion_progress():
+        jobs = list_jobs(st.session_state.namespace)
+        if sync_finished_jobs(jobs):
+            st.rerun() #the question box only appears on a full run once a file is queryable
+        show_job_status(jobs)
+    
+    fragment = getattr(st, "fragment", None) #reruns on its own timer without rerunning the rest of the page
     
     def display_chat_history():
         for message in st.session_state.chat_history:
@@ -127,10 +118,20 @@ def show_main_app():
         
         st.session_state.query_input = ""
         
+        st.session_state.pending_query = query #answered in the chat pane so the reply can stream in place
+    
+    def answer_pending_query():
+        query = st.session_state.pop("pending_query", None)
+        if not query:
+            return
+        
+        with start_trace("query"): #every stage below records its span under one request id
+            answer_query(query)
+    
+    def answer_query(query):
         try:
-            if 'sources_used' not in st.session_state:
-                st.session_state['sources_used'] = []
-                
+            st.session_state['sources_used'] = [] #filled with the chunks packed into this answer's prompt
+            
             if 'debug_info' not in st.session_state:
                 st.session_state['debug_info'] = {}
             
@@ -147,9 +148,12 @@ def show_main_app():
                 query_embedding,
                 query_text=processed_query,
                 namespace=st.session_state.namespace,
-                top_k=8
+                top_k=RERANK_CANDIDATES if RERANK_ENABLED else 8 #over-fetch when a reranker picks the final few
             )
             
+            if RERANK_ENABLED:
+                chunks = rerank_chunks(processed_query, chunks)
+            
             if not chunks:
                 st.session_state.chat_history.append({
                     "role": "assistant", 
@@ -157,7 +161,16 @@ def show_main_app():
                 })
                 return
             
-            answer = generate_response(original_query, chunks)
+            answer_placeholder = st.empty()
+            answer = ""
+            for piece in stream_direct_response_with_chunks(
+                original_query,
+                chunks,
+                query_embedding=query_embedding,
+                namespace=st.session_state.namespace
+            ):
+                answer += piece
+                answer_placeholder.markdown(f'<div class="assistant-message"><strong>QueryQuack 🦆:</strong><br>{answer}▌</div>', unsafe_allow_html=True)
             
             response_text = answer
             
@@ -167,20 +180,23 @@ def show_main_app():
                     sources_text += f"- {filename} (Chunk {chunk_index})\n"
                 response_text += sources_text
             
+            answer_placeholder.markdown(f'<div class="assistant-message"><strong>QueryQuack 🦆:</strong><br>{response_text}</div>', unsafe_allow_html=True)
+            
             st.session_state.chat_history.append({
                 "role": "assistant", 
                 "content": response_text
             })
             
-            if st.session_state.get('debug_info') and len(st.session_state['debug_info']) > 0:
-                with st.expander("Debug Info", expanded=False):
-                    st.write(st.session_state['debug_info'])
-            
         except Exception as e:
             st.session_state.chat_history.append({
                 "role": "assistant", 
                 "content": f"An error occurred: {str(e)}"
             })
+        
+        finally: #keep the trace of failed and empty answers too, they are the ones worth debugging
+            st.session_state.setdefault('debug_info', {})['trace'] = current_trace().to_dict()
+            with st.expander("Debug Info", expanded=False):
+                st.write(st.session_state['debug_info'])
     
     col1, col2 = st.columns([1, 1])
     
@@ -203,10 +219,21 @@ def show_main_app():
             if process_button:
                 success = process_uploaded_files(uploaded_files)
                 if success:
-                    st.success("Files processed successfully!")
+                    st.success("Files queued, you can ask questions about each one as soon as it is processed.")
                 else:
                     st.error("Failed to process files.")
         
+        jobs = list_jobs(st.session_state.namespace)
+        sync_finished_jobs(jobs)
+        if any(job["status"] in ACTIVE_STATUSES for job in jobs):
+            if fragment:
+                fragment(run_every=1)(ingestion_progress)()
+            else:
+                show_job_status(jobs)
+                st.button("Refresh status", key="refresh_jobs")
+        else:
+            show_job_status(jobs)
+        
         if st.session_state.processed_files:
             st.markdown("### Processed Files")
             st.markdown('<div class="file-list">', unsafe_allow_html=True)
@@ -222,6 +249,8 @@ def show_main_app():
         
         display_chat_history()
         
+        answer_pending_query()
+        
         if st.session_state.processed_files:
             if "query_input" not in st.session_state:
                 st.session_state.query_input = ""
@@ -0,0 +1,108 @@
+import os
+import time
+import itertools
+import threading
+import numpy as np
+from collections import OrderedDict
+
+ANSWER_CACHE_THRESHOLD = float(os.environ.get("ANSWER_CACHE_THRESHOLD", "0.95")) #min cosine similarity between query embeddings for a hit
+ANSWER_CACHE_TTL = float(os.environ.get("ANSWER_CACHE_TTL", "3600")) #seconds an answer stays valid
+ANSWER_CACHE_MAX_ENTRIES = int(os.environ.get("ANSWER_CACHE_MAX_ENTRIES", "512")) #answers kept per process
+
+_entries = OrderedDict() #entry id -> entry, least recently used first
+_groups = {} #(namespace, chunk ids) -> set of entry ids, so a lookup only compares candidates with the same context
+_entry_ids = itertools.count()
+_cache_lock = threading.Lock()
+_cache_stats = {"hits": 0, "misses": 0}
+
+def _chunk_key(chunks):
+    """Order-independent key for the set of retrieved chunks."""
+    return tuple(sorted(str(chunk.get('id')) for chunk in chunks if chunk.get('id') is not None))
+
+def _unit(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+def _remove(entry_id):
+    entry = _entries.pop(entry_id, None)
+    if entry is None:
+        return
+    group = _groups.get(entry["group"])
+    if group is not None:
+        group.discard(entry_id)
+        if not group:
+            del _groups[entry["group"]]
+
+def lookup_answer(namespace, chunks, query_embedding):
+    """
+    Return a cached answer for a similar question over the same chunks.
+
+    Args:
+        namespace: Pinecone namespace the chunks came from
+        chunks: Retrieved chunks, each with an id
+        query_embedding: Embedding of the processed query
+
+    Returns:
+        answer: Cached answer text, or None on a miss
+    """
+    chunk_key = _chunk_key(chunks)
+    if not chunk_key or query_embedding is None:
+        return None
+
+    query = _unit(query_embedding)
+    now = time.time()
+    with _cache_lock:
+        best_id, best_score = None, ANSWER_CACHE_THRESHOLD
+        for entry_id in list(_groups.get((namespace, chunk_key), ())):
+            entry = _entries[entry_id]
+            if now - entry["created_at"] > ANSWER_CACHE_TTL:
+                _remove(entry_id)
+                continue
+            score = float(np.dot(entry["embedding"], query))
+            if score >= best_score:
+                best_id, best_score = entry_id, score
+
+        if best_id is None:
+            _cache_stats["misses"] += 1
+            return None
+
+        _cache_stats["hits"] += 1
+        _entries.move_to_end(best_id)
+        return _entries[best_id]["answer"]
+
+def store_answer(namespace, chunks, query_embedding, answer):
+    """Cache a generated answer for this namespace, chunk set and query embedding."""
+    chunk_key = _chunk_key(chunks)
+    if not chunk_key or query_embedding is None or not answer:
+        return
+
+    group = (namespace, chunk_key)
+    with _cache_lock:
+        entry_id = next(_entry_ids)
+        _entries[entry_id] = {
+            "group": group,
+            "embedding": _unit(query_embedding),
+            "answer": answer,
+            "created_at": time.time()
+        }
+        _groups.setdefault(group, set()).add(entry_id)
+
+        while len(_entries) > ANSWER_CACHE_MAX_ENTRIES:
+            _remove(next(iter(_entries)))
+
+def invalidate_namespace(namespace):
+    """Drop every cached answer for a namespace, called whenever its vectors change."""
+    with _cache_lock:
+        for entry_id in [entry_id for entry_id, entry in _entries.items() if entry["group"][0] == namespace]:
+            _remove(entry_id)
+
+def get_answer_cache_stats():
+    """Return process-wide hit/miss counters and size of the answer cache."""
+    with _cache_lock:
+        return {
+            "hits": _cache_stats["hits"],
+            "misses": _cache_stats["misses"],
+            "size": len(_entries),
+            "max_size": ANSWER_CACHE_MAX_ENTRIES
+        }
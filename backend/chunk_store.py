@@ -0,0 +1,87 @@
+import os
+import json
+import sqlite3
+from contextlib import closing
+from backend.ingestion_cache import CACHE_ROOT
+
+CHUNK_STORE_PATH = os.environ.get("CHUNK_STORE_PATH", os.path.join(CACHE_ROOT, "chunks.db"))
+CHUNK_STORE_ENABLED = os.environ.get("CHUNK_STORE_ENABLED", "true").lower() == "true" #keep chunk text locally, send slim metadata to the index
+SLIM_METADATA_KEYS = ("filename", "source") #metadata still stored with each vector, none of it changes while the vector id stays the same
+_SQLITE_MAX_VARIABLES = 900 #stay under SQLite's bound parameter limit
+
+def _connect():
+    connection = sqlite3.connect(CHUNK_STORE_PATH, timeout=30) #one short-lived connection per call, safe across threads and processes
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute(
+        """CREATE TABLE IF NOT EXISTS chunks (
+            namespace TEXT NOT NULL,
+            id TEXT NOT NULL,
+            text TEXT NOT NULL,
+            metadata TEXT NOT NULL,
+            PRIMARY KEY (namespace, id)
+        )"""
+    )
+    return connection
+
+def slim_metadata(metadata):
+    """Return the small subset of chunk metadata that is stored with the vector."""
+    return {key: metadata[key] for key in SLIM_METADATA_KEYS if key in metadata}
+
+def put_chunks(namespace, vectors):
+    """
+    Store the text and full metadata of vectors about to be upserted.
+
+    Args:
+        namespace: Pinecone namespace
+        vectors: Vector dicts with id and metadata containing text
+    """
+    rows = []
+    for vector in vectors:
+        metadata = dict(vector.get("metadata") or {})
+        text = metadata.pop("text", None)
+        if text is not None:
+            rows.append((namespace, str(vector["id"]), text, json.dumps(metadata)))
+    if not rows:
+        return
+    with closing(_connect()) as connection, connection:
+        connection.executemany("INSERT OR REPLACE INTO chunks (namespace, id, text, metadata) VALUES (?, ?, ?, ?)", rows)
+
+def get_chunks(namespace, ids):
+    """
+    Look up stored chunks by id.
+
+    Returns:
+        chunks: Dict of id -> metadata dict including text, for the ids found
+    """
+    ids = [str(chunk_id) for chunk_id in ids]
+    found = {}
+    if not ids:
+        return found
+    with closing(_connect()) as connection:
+        for i in range(0, len(ids), _SQLITE_MAX_VARIABLES):
+            batch = ids[i:i + _SQLITE_MAX_VARIABLES]
+            rows = connection.execute(
+                f"SELECT id, text, metadata FROM chunks WHERE namespace = ? AND id IN ({','.join('?' * len(batch))})",
+                [namespace] + batch
+            ).fetchall()
+            for chunk_id, text, metadata in rows:
+                metadata = json.loads(metadata)
+                metadata["text"] = text
+                found[chunk_id] = metadata
+    return found
+
+def delete_chunks(namespace, ids):
+    """Delete stored chunks by id."""
+    ids = [str(chunk_id) for chunk_id in ids]
+    with closing(_connect()) as connection, connection:
+        for i in range(0, len(ids), _SQLITE_MAX_VARIABLES):
+            batch = ids[i:i + _SQLITE_MAX_VARIABLES]
+            connection.execute(
+                f"DELETE FROM chunks WHERE namespace = ? AND id IN ({','.join('?' * len(batch))})",
+                [namespace] + batch
+            )
+
+def delete_namespace_chunks(namespace):
+    """Delete every stored chunk of a namespace."""
+    with closing(_connect()) as connection, connection:
+        connection.execute("DELETE FROM chunks WHERE namespace = ?", (namespace,))
@@ -0,0 +1,119 @@
+import os
+import re
+from backend.text_chunking import CHUNK_OVERLAP_TOKENS
+
+CONTEXT_TOKEN_BUDGET = int(os.environ.get("CONTEXT_TOKEN_BUDGET", "1500")) #prompt tokens spent on document excerpts
+NEAR_DUPLICATE_THRESHOLD = float(os.environ.get("NEAR_DUPLICATE_THRESHOLD", "0.8")) #word shingle overlap above which a passage is dropped
+_MIN_MERGE_OVERLAP = 20 #shorter suffix/prefix matches are treated as coincidence
+
+def estimate_tokens(text):
+    """Rough token count for prompt budgeting, about four characters per token."""
+    return max(1, len(text) // 4)
+
+def _merge_adjacent(left, right, left_end=None, right_start=None):
+    """Join two consecutive chunks, writing the text they share through the splitter overlap only once."""
+    if isinstance(left_end, int) and isinstance(right_start, int): #character offsets from the splitter give the exact overlap
+        shared = left_end - right_start
+        if 0 <= shared <= len(right):
+            return left + right[shared:]
+    longest = min(len(left), len(right), CHUNK_OVERLAP_TOKENS * 16) #older chunks without offsets, matched on text
+    for size in range(longest, _MIN_MERGE_OVERLAP - 1, -1):
+        if left.endswith(right[:size]):
+            return left + right[size:]
+    return left + "\n" + right
+
+def _shingles(text, size=5):
+    words = re.findall(r"\w+", text.lower())
+    if len(words) <= size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+def _overlap_ratio(shingles, other):
+    """Share of the smaller passage's shingles also found in the other one."""
+    if not shingles or not other:
+        return 0.0
+    return len(shingles & other) / min(len(shingles), len(other))
+
+def _passages(chunks):
+    """Group chunks into passages, merging runs of consecutive chunks from the same file."""
+    by_file = {}
+    passages = []
+    for rank, chunk in enumerate(chunks):
+        text = chunk.get('text', '')
+        if not text:
+            continue
+        metadata = chunk.get('metadata') or {}
+        filename = metadata.get('filename')
+        chunk_index = metadata.get('chunk_index')
+        indexed = by_file.setdefault(filename, {}) if filename is not None else None
+        if indexed is None or not isinstance(chunk_index, (int, float)) or int(chunk_index) in indexed:
+            #no position, or two chunks claiming one, e.g. while a re-ingested document is being updated: keep it on its own
+            passages.append({'text': text, 'filename': filename, 'chunk_indexes': [], 'rank': rank})
+            continue
+        indexed[int(chunk_index)] = (rank, text, metadata.get('char_start'), metadata.get('char_end'))
+
+    for filename, indexed in by_file.items():
+        current = None
+        for chunk_index in sorted(indexed):
+            rank, text, char_start, char_end = indexed[chunk_index]
+            if current and current['chunk_indexes'][-1] == chunk_index - 1:
+                current['text'] = _merge_adjacent(current['text'], text, current_end, char_start)
+                current['chunk_indexes'].append(chunk_index)
+                current['rank'] = min(current['rank'], rank) #a passage is as relevant as its best chunk
+            else:
+                current = {'text': text, 'filename': filename, 'chunk_indexes': [chunk_index], 'rank': rank}
+                passages.append(current)
+            current_end = char_end
+
+    passages.sort(key=lambda passage: passage['rank'])
+    return passages
+
+def build_context(chunks, token_budget=CONTEXT_TOKEN_BUDGET):
+    """
+    Pack retrieved chunks into prompt passages under a token budget.
+
+    Consecutive chunks from the same file are merged with their shared
+    overlap written once, near-duplicate passages are dropped, and the rest
+    are added in relevance order until the budget is used up.
+
+    Args:
+        chunks: Retrieved chunks, best first
+        token_budget: Maximum estimated tokens of excerpt text
+
+    Returns:
+        passages: List of dicts with text, filename, chunk_indexes and rank, best first
+        stats: Dict with chunk, passage, duplicate and token counts
+    """
+    packed = []
+    kept_shingles = []
+    used_tokens = 0
+    duplicates = 0
+    over_budget = 0
+
+    for passage in _passages(chunks):
+        shingles = _shingles(passage['text'])
+        if any(_overlap_ratio(shingles, other) >= NEAR_DUPLICATE_THRESHOLD for other in kept_shingles):
+            duplicates += 1
+            continue
+
+        tokens = estimate_tokens(passage['text'])
+        if used_tokens + tokens > token_budget:
+            if packed: #smaller passages further down may still fit
+                over_budget += 1
+                continue
+            passage['text'] = passage['text'][:token_budget * 4] #always keep some of the best passage
+            tokens = estimate_tokens(passage['text'])
+
+        packed.append(passage)
+        kept_shingles.append(shingles)
+        used_tokens += tokens
+
+    stats = {
+        'chunks_in': len(chunks),
+        'passages': len(packed),
+        'duplicates_dropped': duplicates,
+        'over_budget': over_budget,
+        'tokens': used_tokens,
+        'token_budget': token_budget
+    }
+    return packed, stats
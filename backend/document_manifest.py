@@ -0,0 +1,154 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+from collections import Counter
+from backend.ingestion_cache import CACHE_ROOT
+
+MANIFEST_DIR = os.path.join(CACHE_ROOT, "manifests")
+POSITION_KEYS = ("chunk_index", "page", "page_end", "char_start", "char_end") #metadata that shifts when text before a chunk changes
+os.makedirs(MANIFEST_DIR, exist_ok=True)
+
+def _safe_name(name):
+    return "".join(c if c.isalnum() or c in "-_." else "_" for c in name) or "_default"
+
+def document_key(filename):
+    """
+    Return the stable key of a document within a namespace.
+
+    The key comes from the document name, so a new version of the same file
+    maps to the same manifest and can be diffed against the old one.
+    """
+    return hashlib.sha256(filename.encode("utf-8")).hexdigest()[:16]
+
+def chunk_ids(doc_key, chunks, seen=None):
+    """
+    Derive deterministic vector ids for a document's chunks.
+
+    Each id combines the document key, the hash of the chunk text and the
+    chunk's occurrence number among identical chunks. Re-ingesting the same
+    text yields the same ids, and an edit only changes the ids of the chunks
+    whose text changed, not of every chunk after it.
+
+    Args:
+        doc_key: Key from document_key
+        chunks: Chunk texts in document order
+        seen: Occurrence counter carried between calls when a document is
+            processed in batches
+
+    Returns:
+        ids: One id per chunk
+    """
+    seen = Counter() if seen is None else seen
+    ids = []
+    for chunk in chunks:
+        chunk_hash = hashlib.sha256(chunk.encode("utf-8")).hexdigest()[:16]
+        ids.append(f"{doc_key}-{chunk_hash}-{seen[chunk_hash]}")
+        seen[chunk_hash] += 1
+    return ids
+
+def chunk_position(chunk_meta):
+    """Return the positional part of a chunk's metadata, which is not covered by its id."""
+    return {key: chunk_meta[key] for key in POSITION_KEYS if key in chunk_meta}
+
+def moved_chunks(manifest, ids, positions):
+    """
+    Find chunks that were stored before but now sit at a different position.
+
+    Args:
+        manifest: Stored manifest of the document, or None
+        ids: Vector id of each chunk
+        positions: chunk_position of each chunk
+
+    Returns:
+        moved: Indexes into ids of stored chunks whose metadata must be rewritten
+    """
+    if not manifest:
+        return []
+    old_ids = set(manifest["ids"])
+    old_positions = manifest.get("positions") or {} #manifests written before positions were recorded match nothing
+    return [
+        i for i, (vector_id, position) in enumerate(zip(ids, positions))
+        if vector_id in old_ids and old_positions.get(vector_id) != position
+    ]
+
+def _manifest_path(namespace, doc_key):
+    return os.path.join(MANIFEST_DIR, _safe_name(namespace), f"{doc_key}.json")
+
+def load_manifest(namespace, doc_key):
+    """Return the stored manifest of a document, or None if it was never ingested."""
+    path = _manifest_path(namespace, doc_key)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def save_manifest(namespace, doc_key, filename, content_hash, ids, positions=None):
+    """Record which vector ids a document currently has in a namespace, and the chunk_position of each."""
+    path = _manifest_path(namespace, doc_key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({
+            "filename": filename,
+            "content_hash": content_hash,
+            "ids": ids,
+            "positions": dict(zip(ids, positions)) if positions is not None else {},
+            "updated_at": time.time()
+        }, f)
+    os.replace(path + ".tmp", path)
+
+def find_document(namespace, content_hash):
+    """Return the filename of the document stored in a namespace with this content, or None."""
+    directory = os.path.join(MANIFEST_DIR, _safe_name(namespace))
+    if not os.path.isdir(directory):
+        return None
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith(".json"):
+            continue
+        manifest = load_manifest(namespace, name[:-len(".json")])
+        if manifest and manifest.get("content_hash") == content_hash:
+            return manifest.get("filename")
+    return None
+
+def delete_manifests(namespace):
+    """Forget every document manifest of a namespace."""
+    shutil.rmtree(os.path.join(MANIFEST_DIR, _safe_name(namespace)), ignore_errors=True)
+
+def plan_document_update(namespace, filename, content_hash, chunks, chunk_metadata):
+    """
+    Diff a document's chunks against its stored manifest.
+
+    Args:
+        namespace: Pinecone namespace
+        filename: Document name
+        content_hash: sha256 of the PDF bytes
+        chunks: Chunk texts in document order
+        chunk_metadata: Metadata of each chunk, from build_chunk_metadata
+
+    Returns:
+        plan: Dict with doc_key, ids, positions (chunk_position of each chunk),
+            new_positions (chunks to embed and upsert), moved_positions
+            (stored chunks whose metadata must be rewritten), stale_ids
+            (vectors to delete) and unchanged
+    """
+    doc_key = document_key(filename)
+    ids = chunk_ids(doc_key, chunks)
+    positions = [chunk_position(chunk_meta) for chunk_meta in chunk_metadata]
+    manifest = load_manifest(namespace, doc_key)
+    old_ids = set(manifest["ids"]) if manifest else set()
+    new_ids = set(ids)
+    moved = moved_chunks(manifest, ids, positions)
+
+    return {
+        "doc_key": doc_key,
+        "ids": ids,
+        "positions": positions,
+        "new_positions": [position for position, vector_id in enumerate(ids) if vector_id not in old_ids],
+        "moved_positions": moved,
+        "stale_ids": sorted(old_ids - new_ids),
+        "unchanged": bool(manifest) and manifest.get("content_hash") == content_hash and old_ids == new_ids and not moved
+    }
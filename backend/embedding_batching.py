@@ -0,0 +1,104 @@
+import os
+import time
+import threading
+from backend.text_chunking import count_tokens
+
+EMBED_BUCKETING = os.environ.get("EMBED_BUCKETING", "true").lower() == "true" #group chunks of similar length into batches
+EMBED_BATCH_TOKENS = int(os.environ.get("EMBED_BATCH_TOKENS", "8192")) #padded tokens per forward pass, bounds activation memory
+EMBED_MAX_BATCH = int(os.environ.get("EMBED_MAX_BATCH", "256")) #chunks per forward pass, however short they are
+MODEL_MAX_TOKENS = 256 #all-MiniLM-L6-v2 truncates longer inputs, so they are never padded past this
+
+_batch_stats = {"chunks": 0, "batches": 0, "tokens": 0, "padded_tokens": 0, "seconds": 0.0}
+_batch_stats_lock = threading.Lock()
+
+def plan_batches(lengths, budget=EMBED_BATCH_TOKENS, max_batch=EMBED_MAX_BATCH):
+    """
+    Group texts into batches of similar length that fit a padded token budget.
+
+    Texts are taken longest first, so every batch is padded to the length of
+    its first text and grows until one more text would exceed the budget.
+
+    Args:
+        lengths: Token length of each text
+        budget: Max of batch size times longest text in the batch
+        max_batch: Max texts per batch
+
+    Returns:
+        batches: Lists of positions into lengths
+    """
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i], reverse=True)
+    batches = []
+    batch = []
+    for i in order:
+        if batch and (len(batch) + 1 > max_batch or (len(batch) + 1) * lengths[batch[0]] > budget):
+            batches.append(batch)
+            batch = []
+        batch.append(i)
+    if batch:
+        batches.append(batch)
+    return batches
+
+def _encode(embeddings_model, texts):
+    client = getattr(embeddings_model, "client", None)
+    if client is None or not hasattr(client, "encode"): #not a sentence-transformers model, let it batch by itself
+        return embeddings_model.embed_documents(texts)
+    encode_kwargs = dict(getattr(embeddings_model, "encode_kwargs", None) or {}, batch_size=len(texts), show_progress_bar=False)
+    vectors = client.encode([text.replace("\n", " ") for text in texts], **encode_kwargs) #same input cleanup as HuggingFaceEmbeddings
+    return vectors.tolist()
+
+def embed_chunks(embeddings_model, texts):
+    """
+    Embed texts in length-bucketed batches and return the vectors in input order.
+
+    Args:
+        embeddings_model: Model from embedding_service.get_embedding_model
+        texts: Chunk texts
+
+    Returns:
+        embeddings: One vector per text, in the order of texts
+        stats: Dict with chunks, batches, tokens, padded_tokens, padding_ratio, seconds and chunks_per_second
+    """
+    if not texts:
+        return [], {"chunks": 0, "batches": 0}
+
+    start = time.perf_counter()
+    if not EMBED_BUCKETING:
+        embeddings = embeddings_model.embed_documents(texts)
+        stats = {"chunks": len(texts), "batches": None, "tokens": None, "padded_tokens": None}
+    else:
+        lengths = [min(count, MODEL_MAX_TOKENS) for count in count_tokens(texts)]
+        batches = plan_batches(lengths)
+        embeddings = [None] * len(texts)
+        for batch in batches:
+            for i, vector in zip(batch, _encode(embeddings_model, [texts[i] for i in batch])):
+                embeddings[i] = vector
+        stats = {
+            "chunks": len(texts),
+            "batches": len(batches),
+            "tokens": sum(lengths),
+            "padded_tokens": sum(len(batch) * lengths[batch[0]] for batch in batches)
+        }
+    seconds = time.perf_counter() - start
+
+    with _batch_stats_lock:
+        _batch_stats["chunks"] += len(texts)
+        _batch_stats["seconds"] += seconds
+        if stats["batches"] is not None:
+            for key in ("batches", "tokens", "padded_tokens"):
+                _batch_stats[key] += stats[key]
+
+    stats["seconds"] = round(seconds, 4)
+    stats["chunks_per_second"] = round(len(texts) / max(seconds, 1e-9), 1)
+    if stats["padded_tokens"]:
+        stats["padding_ratio"] = round(1 - stats["tokens"] / stats["padded_tokens"], 4)
+    return embeddings, stats
+
+def get_embedding_batch_stats():
+    """Return process-wide totals of embed_chunks: chunks, batches, tokens, padding and throughput."""
+    with _batch_stats_lock:
+        stats = dict(_batch_stats)
+    stats["seconds"] = round(stats["seconds"], 3)
+    stats["chunks_per_second"] = round(stats["chunks"] / stats["seconds"], 1) if stats["seconds"] else None
+    stats["tokens_per_second"] = round(stats["tokens"] / stats["seconds"], 1) if stats["seconds"] else None
+    stats["padding_ratio"] = round(1 - stats["tokens"] / stats["padded_tokens"], 4) if stats["padded_tokens"] else None
+    return stats
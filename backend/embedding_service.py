@@ -0,0 +1,119 @@
+import os
+import threading
+import logging
+from backend.model_utils import ensure_model_exists
+from backend.status import report_status
+
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+EMBEDDING_BACKEND = os.environ.get("EMBEDDING_BACKEND", "fp32").lower() #fp32, or int8 for dynamically quantized linear layers
+EMBEDDING_BACKENDS = ("fp32", "int8")
+EMBEDDING_THREADS = int(os.environ.get("EMBEDDING_THREADS", "0")) #intra-op threads for CPU inference, 0 keeps the torch default
+
+logger = logging.getLogger(__name__)
+_embedding_model = None
+_warmed_up = False
+_embedding_lock = threading.Lock()
+
+def get_embedding_model(show_status=True):
+    """
+    Return the process-wide embedding model, loading it on first use.
+
+    The model is shared by every Streamlit session and thread in the process,
+    so it is only ever read from disk once.
+
+    Args:
+        show_status: Show download and loading errors on the page, otherwise log them
+
+    Returns:
+        embeddings_model: HuggingFaceEmbeddings instance, or None if loading failed
+    """
+    global _embedding_model
+
+    if _embedding_model is not None: #fast path once the model is loaded
+        return _embedding_model
+
+    with _embedding_lock: #only one thread loads the model, the others wait for it
+        if _embedding_model is None:
+            _embedding_model = load_embedding_model(EMBEDDING_BACKEND, show_status=show_status)
+
+    return _embedding_model
+
+def _set_thread_count(threads):
+    import torch
+    if threads > 0 and torch.get_num_threads() != threads:
+        torch.set_num_threads(threads) #process-wide, the reranker shares the same pool
+
+def _quantize_dynamic(embeddings_model):
+    import torch
+    engines = torch.backends.quantized.supported_engines
+    if "fbgemm" not in engines and "qnnpack" in engines: #ARM CPUs only ship the qnnpack kernels
+        torch.backends.quantized.engine = "qnnpack"
+    torch.quantization.quantize_dynamic( #int8 weights, activations quantized on the fly; attention and layer norms stay fp32
+        embeddings_model.client,
+        {torch.nn.Linear},
+        dtype=torch.qint8,
+        inplace=True
+    )
+
+def load_embedding_model(backend="fp32", threads=None, show_status=True):
+    """
+    Load a new embedding model instance. Use get_embedding_model for the shared one.
+
+    Args:
+        backend: One of EMBEDDING_BACKENDS
+        threads: Intra-op threads, defaults to EMBEDDING_THREADS
+        show_status: Show download and loading errors on the page, otherwise log them
+
+    Returns:
+        embeddings_model: HuggingFaceEmbeddings instance, or None if loading failed
+    """
+    if backend not in EMBEDDING_BACKENDS:
+        report_status(logger, "error", f"Unknown embedding backend: {backend}. Use one of {', '.join(EMBEDDING_BACKENDS)}.", show_status)
+        return None
+
+    model_path = ensure_model_exists(EMBEDDING_MODEL_NAME, show_status=show_status)
+    if not model_path:
+        report_status(logger, "error", "Failed to load embedding model", show_status)
+        return None
+
+    try:
+        from langchain_community.embeddings import HuggingFaceEmbeddings #pulls in torch, so only once the model is needed
+        _set_thread_count(EMBEDDING_THREADS if threads is None else threads)
+        embeddings_model = HuggingFaceEmbeddings(
+            model_name=model_path,
+            model_kwargs={'device': 'cpu'}
+        )
+        if backend == "int8":
+            _quantize_dynamic(embeddings_model)
+        return embeddings_model
+    except Exception as e:
+        report_status(logger, "error", f"Error loading the {backend} embedding model: {str(e)}", show_status)
+        return None
+
+def get_embedding_model_id(backend=None):
+    """Return an identifier for the embedding model, used to key caches of its vectors."""
+    backend = backend or EMBEDDING_BACKEND
+    return EMBEDDING_MODEL_NAME if backend == "fp32" else f"{EMBEDDING_MODEL_NAME}-{backend}"
+
+def warm_up_embedding_model(show_status=True):
+    """
+    Load the shared embedding model and run one encode so the first query is fast.
+
+    Args:
+        show_status: Show errors on the page, off on the background warm-up thread, which logs them
+    """
+    global _warmed_up
+
+    if _warmed_up: #already warm, nothing to do on later reruns
+        return True
+
+    try:
+        embeddings_model = get_embedding_model(show_status=show_status)
+        if not embeddings_model:
+            return False
+        embeddings_model.embed_query("warm up")
+        _warmed_up = True
+        return True
+    except Exception as e:
+        report_status(logger, "error", f"Error warming up embedding model: {str(e)}", show_status)
+        return False
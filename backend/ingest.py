@@ -0,0 +1,160 @@
+"""
+Bulk-ingest a directory tree of PDFs from the command line.
+
+    python -m backend.ingest <dir> --namespace X --workers N
+
+Progress is appended to a checkpoint file after every finished PDF, so an
+interrupted run picks up where it stopped when started again.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from backend.ingestion_cache import CACHE_ROOT
+from backend.ingestion_pipeline import ingest_files, INGEST_CPU_WORKERS, INGEST_IO_WORKERS
+from backend.pinecone_storage import get_vector_index
+from backend.namespace_registry import pin_namespace
+from backend.tracing import start_metrics_exporter, write_metrics_file, get_stage_stats
+
+CHECKPOINT_DIR = os.path.join(CACHE_ROOT, "checkpoints")
+STATS_EVERY = 25 #files between throughput lines
+
+def find_pdfs(root):
+    """Return the paths of every PDF under root, relative to it and sorted."""
+    paths = []
+    for directory, subdirectories, filenames in os.walk(root):
+        subdirectories.sort() #walk in a stable order so runs are comparable
+        for filename in filenames:
+            if filename.lower().endswith(".pdf"):
+                paths.append(os.path.relpath(os.path.join(directory, filename), root))
+    return sorted(paths)
+
+def _file_signature(path):
+    stat = os.stat(path)
+    return stat.st_size, int(stat.st_mtime)
+
+def load_checkpoint(path):
+    """
+    Read a checkpoint file.
+
+    Returns:
+        entries: Dict of relative path -> last recorded result, later lines win
+    """
+    entries = {}
+    if not os.path.exists(path):
+        return entries
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError: #a line cut short when the previous run was killed
+                continue
+            entries[entry["name"]] = entry
+    return entries
+
+def _format_rate(count, seconds):
+    return f"{count / max(seconds, 1e-6):.1f}/s"
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m backend.ingest", description="Ingest every PDF under a directory into one namespace.")
+    parser.add_argument("directory", help="Directory searched recursively for PDFs")
+    parser.add_argument("--namespace", required=True, help="Namespace the documents are stored in")
+    parser.add_argument("--workers", type=int, default=INGEST_CPU_WORKERS, help="PDFs extracted and embedded at once")
+    parser.add_argument("--upload-workers", type=int, default=INGEST_IO_WORKERS, help="PDFs upserted at once")
+    parser.add_argument("--checkpoint", help="Checkpoint file, defaults to one per namespace in the cache directory")
+    parser.add_argument("--no-pin", action="store_true", help="Leave the namespace subject to quotas and idle reaping")
+    args = parser.parse_args(argv)
+
+    root = os.path.abspath(args.directory)
+    if not os.path.isdir(root):
+        print(f"Not a directory: {root}", file=sys.stderr)
+        return 2
+
+    if not get_vector_index():
+        print("Failed to connect to the vector index. Check your Pinecone API key or set VECTOR_STORE=local.", file=sys.stderr)
+        return 1
+    if not args.no_pin:
+        pin_namespace(args.namespace) #a corpus may be far larger than a session quota and must not be reaped when idle
+
+    checkpoint_path = args.checkpoint or os.path.join(
+        CHECKPOINT_DIR, "".join(c if c.isalnum() or c in "-_." else "_" for c in args.namespace) + ".jsonl"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(checkpoint_path)), exist_ok=True)
+    checkpoint = load_checkpoint(checkpoint_path)
+
+    paths = find_pdfs(root)
+    todo = []
+    for name in paths:
+        entry = checkpoint.get(name)
+        size, mtime = _file_signature(os.path.join(root, name))
+        if entry and entry["status"] in ("done", "skipped") and entry.get("size") == size and entry.get("mtime") == mtime:
+            continue #finished in an earlier run and unchanged since
+        todo.append((name, size, mtime))
+    known_hashes = [entry["content_hash"] for entry in checkpoint.values() if entry["status"] == "done" and entry.get("content_hash")]
+
+    print(f"{len(paths)} PDFs found, {len(paths) - len(todo)} already ingested, {len(todo)} to go "
+          f"({args.workers} workers, {args.upload_workers} upload workers, checkpoint {checkpoint_path})")
+    if not todo:
+        return 0
+
+    start_metrics_exporter() #METRICS_PORT or METRICS_FILE let a long run be watched while it goes
+    signatures = {name: (size, mtime) for name, size, mtime in todo}
+    totals = {"done": 0, "skipped": 0, "failed": 0, "chunks": 0, "bytes": 0}
+    start_time = time.perf_counter()
+
+    def read(name):
+        def load():
+            with open(os.path.join(root, name), "rb") as f:
+                return f.read()
+        return load
+
+    def print_stats(final=False):
+        elapsed = time.perf_counter() - start_time
+        finished = totals["done"] + totals["skipped"] + totals["failed"]
+        print(
+            f"{'Finished' if final else 'Progress'}: {finished}/{len(todo)} files in {elapsed:.1f}s, "
+            f"{totals['done']} done, {totals['skipped']} skipped, {totals['failed']} failed | "
+            f"{_format_rate(finished, elapsed)} files, {_format_rate(totals['chunks'], elapsed)} chunks, "
+            f"{totals['bytes'] / 1e6 / max(elapsed, 1e-6):.2f} MB/s"
+        )
+        if final:
+            for stage, stats in get_stage_stats().items():
+                print(f"  {stage}: {stats['count']}x, {stats['total_seconds']:.1f}s total, {stats['mean_ms']} ms mean")
+            write_metrics_file()
+
+    with open(checkpoint_path, "a", encoding="utf-8") as checkpoint_file:
+        def record(result):
+            size, mtime = signatures[result["name"]]
+            totals[result["status"]] = totals.get(result["status"], 0) + 1
+            if result["status"] == "done":
+                totals["chunks"] += result["chunks"]
+                totals["bytes"] += size
+            checkpoint_file.write(json.dumps({**result, "size": size, "mtime": mtime}) + "\n")
+            checkpoint_file.flush() #a killed run loses at most the files still in flight
+
+            line = f"[{result['status']}] {result['name']} ({result['chunks']} chunks, {result['seconds']:.1f}s)"
+            print(line + (f": {result['error']}" if result["error"] else ""))
+            finished = totals["done"] + totals["skipped"] + totals["failed"]
+            if finished % STATS_EVERY == 0:
+                print_stats()
+
+        try:
+            ingest_files(
+                ((name, read(name)) for name, _, _ in todo),
+                namespace=args.namespace,
+                known_hashes=known_hashes,
+                on_result=record,
+                cpu_workers=args.workers,
+                io_workers=args.upload_workers
+            )
+        except KeyboardInterrupt:
+            print("Interrupted, run the same command again to resume.")
+            print_stats(final=True)
+            return 130
+
+    print_stats(final=True)
+    return 1 if totals["failed"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
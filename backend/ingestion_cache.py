@@ -0,0 +1,201 @@
+import os
+import json
+import shutil
+import hashlib
+import logging
+import tempfile
+import numpy as np
+from backend.embedding_service import get_embedding_model_id
+from backend.text_chunking import CHUNK_TOKENS, CHUNK_OVERLAP_TOKENS
+
+CACHE_ROOT = os.environ.get(
+    "QUERYQUACK_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cache")
+)
+INGESTION_CACHE_DIR = os.path.join(CACHE_ROOT, "ingestion")
+CACHE_VERSION = "3" #bump when the cached layout or chunking logic changes
+os.makedirs(INGESTION_CACHE_DIR, exist_ok=True)
+
+logger = logging.getLogger(__name__)
+
+def hash_pdf_bytes(pdf_bytes):
+    """Return the sha256 content hash of a PDF file's bytes."""
+    return hashlib.sha256(pdf_bytes).hexdigest()
+
+def ingestion_cache_key(content_hash):
+    """
+    Build the cache key for a document.
+
+    The key covers the document content and every parameter that changes the
+    chunks or their vectors, so changing any of them misses the cache.
+
+    Args:
+        content_hash: sha256 of the PDF bytes
+
+    Returns:
+        key: Hex digest identifying the cached entry
+    """
+    params = f"{CACHE_VERSION}|{get_embedding_model_id()}|{CHUNK_TOKENS}|{CHUNK_OVERLAP_TOKENS}"
+    return hashlib.sha256(f"{content_hash}|{params}".encode("utf-8")).hexdigest()
+
+def load_cached_ingestion(key):
+    """
+    Load a previously processed document from the cache.
+
+    Args:
+        key: Cache key from ingestion_cache_key
+
+    Returns:
+        entry: Dict with pdf_metadata, pages, chunks, chunk_offsets and embeddings, or None on a miss
+    """
+    entry_dir = os.path.join(INGESTION_CACHE_DIR, key)
+    meta_path = os.path.join(entry_dir, "document.json")
+    chunks_path = os.path.join(entry_dir, "chunks.jsonl")
+    embeddings_path = os.path.join(entry_dir, "embeddings.f32")
+
+    if not os.path.exists(meta_path):
+        return None
+
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            document = json.load(f)
+        chunks = []
+        chunk_offsets = []
+        with open(chunks_path, "r", encoding="utf-8") as f:
+            for line in f:
+                entry = json.loads(line)
+                chunks.append(entry["text"])
+                chunk_offsets.append(entry.get("offsets"))
+        if len(chunks) != document["count"]:
+            return None
+
+        embeddings = np.memmap( #memory mapped, pages are read only when upserted
+            embeddings_path,
+            dtype=np.float32,
+            mode="r",
+            shape=(document["count"], document["dimension"])
+        )
+        return {
+            "pdf_metadata": document.get("pdf_metadata") or {},
+            "pages": document.get("pages", 0),
+            "chunks": chunks,
+            "chunk_offsets": chunk_offsets,
+            "embeddings": embeddings
+        }
+    except Exception as e:
+        logger.warning("Ignoring unreadable ingestion cache entry %s: %s", key, e)
+        return None
+
+class IngestionCacheWriter:
+    """
+    Write a cache entry one batch of chunks at a time.
+
+    Chunks are appended to chunks.jsonl and their float32 rows to
+    embeddings.f32 in a temporary directory, which commit renames into place.
+    A streamed document is cached without ever being held in memory whole,
+    and concurrent readers never see a partial entry. Write errors are logged
+    and abort the entry; ingestion itself carries on.
+    """
+
+    def __init__(self, key):
+        self.key = key
+        self.entry_dir = os.path.join(INGESTION_CACHE_DIR, key)
+        self.count = 0
+        self.dimension = None
+        self.tmp_dir = tempfile.mkdtemp(prefix=f".{key}.", dir=INGESTION_CACHE_DIR)
+        self._chunks_file = open(os.path.join(self.tmp_dir, "chunks.jsonl"), "w", encoding="utf-8")
+        self._embeddings_file = open(os.path.join(self.tmp_dir, "embeddings.f32"), "wb")
+
+    def append(self, chunks, chunk_offsets, embeddings):
+        """Add a batch of chunks, their offsets and their embeddings, in document order."""
+        if self.tmp_dir is None or not chunks:
+            return
+        try:
+            rows = np.asarray(embeddings, dtype=np.float32)
+            if rows.ndim != 2 or rows.shape[0] != len(chunks) or self.dimension not in (None, rows.shape[1]):
+                raise ValueError(f"{len(chunks)} chunks do not match embeddings of shape {rows.shape}")
+            for i, chunk in enumerate(chunks):
+                offsets = chunk_offsets[i] if chunk_offsets and i < len(chunk_offsets) else None
+                self._chunks_file.write(json.dumps({"text": chunk, "offsets": offsets}) + "\n")
+            rows.tofile(self._embeddings_file)
+            self.dimension = rows.shape[1]
+            self.count += len(chunks)
+        except Exception as e:
+            logger.warning("Could not write ingestion cache: %s", e)
+            self.abort()
+
+    def commit(self, pdf_metadata, pages=0):
+        """
+        Move the finished entry into place.
+
+        Args:
+            pdf_metadata: PDF metadata
+            pages: Number of pages in the PDF, decides whether a hit is replayed as a stream
+
+        Returns:
+            bool: Whether the document is now cached
+        """
+        if self.tmp_dir is None:
+            return os.path.exists(self.entry_dir)
+        try:
+            self._chunks_file.close()
+            self._embeddings_file.close()
+            if self.count == 0:
+                self.abort()
+                return False
+            with open(os.path.join(self.tmp_dir, "document.json"), "w", encoding="utf-8") as f:
+                json.dump({"pdf_metadata": pdf_metadata, "pages": pages, "count": self.count, "dimension": self.dimension}, f)
+            os.rename(self.tmp_dir, self.entry_dir)
+            self.tmp_dir = None
+            return True
+        except Exception as e:
+            self.abort()
+            if os.path.exists(self.entry_dir): #another process cached the same document first
+                return True
+            logger.warning("Could not write ingestion cache: %s", e)
+            return False
+
+    def abort(self):
+        """Drop the partial entry, e.g. when not every chunk of the document was embedded."""
+        if self.tmp_dir is None:
+            return
+        self._chunks_file.close()
+        self._embeddings_file.close()
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+        self.tmp_dir = None
+
+def open_ingestion_cache(key):
+    """
+    Start writing a cache entry.
+
+    Returns:
+        writer: IngestionCacheWriter, or None if the entry already exists or cannot be written
+    """
+    if os.path.exists(os.path.join(INGESTION_CACHE_DIR, key)):
+        return None
+    try:
+        return IngestionCacheWriter(key)
+    except OSError as e:
+        logger.warning("Could not write ingestion cache: %s", e)
+        return None
+
+def save_ingestion(key, pdf_metadata, chunks, embeddings, chunk_offsets=None, pages=0):
+    """
+    Store a processed document in the cache.
+
+    Args:
+        key: Cache key from ingestion_cache_key
+        pdf_metadata: PDF metadata
+        chunks: Text chunks
+        embeddings: Embeddings for each chunk
+        chunk_offsets: Page and character offsets of each chunk
+        pages: Number of pages in the PDF
+
+    Returns:
+        bool: Success status
+    """
+    writer = open_ingestion_cache(key)
+    if writer is None:
+        return os.path.exists(os.path.join(INGESTION_CACHE_DIR, key))
+    writer.append(chunks, chunk_offsets, embeddings)
+    return writer.commit(pdf_metadata, pages)
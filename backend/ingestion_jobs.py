@@ -0,0 +1,214 @@
+import os
+import time
+import uuid
+import queue
+import sqlite3
+import threading
+from contextlib import closing
+from backend.ingestion_cache import CACHE_ROOT, hash_pdf_bytes
+from backend.ingestion_pipeline import ingest_document, claim_document, release_document, INGEST_CPU_WORKERS, INGEST_IO_WORKERS
+from backend.document_manifest import find_document
+
+JOBS_PATH = os.path.join(CACHE_ROOT, "jobs.db")
+JOB_FILES_DIR = os.path.join(CACHE_ROOT, "jobs") #uploaded PDFs wait here until their job finishes
+JOB_RETENTION = float(os.environ.get("INGEST_JOB_RETENTION", str(7 * 24 * 3600))) #seconds finished jobs are kept for
+ACTIVE_STATUSES = ("queued", "running")
+os.makedirs(JOB_FILES_DIR, exist_ok=True)
+
+_JOB_COLUMNS = ("id", "namespace", "filename", "content_hash", "status", "stage", "detail", "chunks", "error", "created_at", "updated_at", "finished_at")
+
+_prepare_queue = queue.Queue() #jobs whose document is claimed, see _queue_job
+_store_queue = queue.Queue(maxsize=max(1, INGEST_IO_WORKERS)) #bounds how many embedded documents wait in memory for upload
+_workers = []
+_workers_lock = threading.Lock()
+
+def _connect():
+    connection = sqlite3.connect(JOBS_PATH, timeout=30) #one short-lived connection per call, safe across threads and processes
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute(
+        """CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            namespace TEXT NOT NULL,
+            filename TEXT NOT NULL,
+            content_hash TEXT NOT NULL,
+            status TEXT NOT NULL,
+            stage TEXT NOT NULL,
+            detail TEXT NOT NULL DEFAULT '',
+            chunks INTEGER NOT NULL DEFAULT 0,
+            error TEXT,
+            created_at REAL NOT NULL,
+            updated_at REAL NOT NULL,
+            finished_at REAL
+        )"""
+    )
+    connection.execute("CREATE INDEX IF NOT EXISTS jobs_namespace ON jobs (namespace, created_at)")
+    return connection
+
+def _job_path(job_id):
+    return os.path.join(JOB_FILES_DIR, f"{job_id}.pdf")
+
+def _update_job(job_id, **fields):
+    fields["updated_at"] = time.time()
+    with closing(_connect()) as connection, connection:
+        connection.execute(
+            f"UPDATE jobs SET {', '.join(f'{key} = ?' for key in fields)} WHERE id = ?",
+            list(fields.values()) + [job_id]
+        )
+
+def _finish_job(job_id, status, error=None, detail=""):
+    now = time.time()
+    _update_job(job_id, status=status, stage=status, detail=detail, error=error, finished_at=now)
+    try:
+        os.remove(_job_path(job_id))
+    except OSError:
+        pass
+
+def _queue_job(job_id, namespace, filename):
+    """Queue a job for preparing once no earlier version of its file is being ingested in the namespace."""
+    if not claim_document(namespace, filename, lambda: _prepare_queue.put((job_id, namespace, filename))):
+        _update_job(job_id, stage="waiting", detail="an earlier version of this file is still being ingested")
+
+def get_job(job_id):
+    """Return a job as a dict, or None if it does not exist."""
+    with closing(_connect()) as connection:
+        row = connection.execute(f"SELECT {', '.join(_JOB_COLUMNS)} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    return dict(zip(_JOB_COLUMNS, row)) if row else None
+
+def list_jobs(namespace):
+    """Return every job of a namespace, oldest first."""
+    with closing(_connect()) as connection:
+        rows = connection.execute(
+            f"SELECT {', '.join(_JOB_COLUMNS)} FROM jobs WHERE namespace = ? ORDER BY created_at",
+            (namespace,)
+        ).fetchall()
+    return [dict(zip(_JOB_COLUMNS, row)) for row in rows]
+
+def submit_ingestion_job(namespace, filename, pdf_bytes):
+    """
+    Queue a PDF for background ingestion.
+
+    The file is written to the cache directory and the job recorded on disk
+    before it is queued, so jobs survive a server restart. Submitting content
+    that is already queued or running for the namespace returns that job;
+    content already stored in the namespace, under any filename, is recorded
+    as a skipped job and not ingested again. Versions of the same filename
+    are ingested one after the other, in the order they were submitted.
+
+    Args:
+        namespace: Pinecone namespace
+        filename: Name of the uploaded file
+        pdf_bytes: Contents of the PDF
+
+    Returns:
+        job_id: Id to poll with get_job
+    """
+    start_ingestion_workers()
+    content_hash = hash_pdf_bytes(pdf_bytes)
+    with closing(_connect()) as connection:
+        row = connection.execute(
+            f"SELECT id FROM jobs WHERE namespace = ? AND content_hash = ? AND status IN ({','.join('?' * len(ACTIVE_STATUSES))})",
+            (namespace, content_hash) + ACTIVE_STATUSES
+        ).fetchone()
+    if row:
+        return row[0]
+
+    job_id = uuid.uuid4().hex[:12]
+    now = time.time()
+    stored_as = find_document(namespace, content_hash)
+    if stored_as is not None: #the same vectors would be stored twice and retrieved as duplicates
+        with closing(_connect()) as connection, connection:
+            connection.execute(
+                """INSERT INTO jobs (id, namespace, filename, content_hash, status, stage, detail, created_at, updated_at, finished_at)
+                VALUES (?, ?, ?, ?, 'skipped', 'skipped', ?, ?, ?, ?)""",
+                (job_id, namespace, filename, content_hash, f"same content as {stored_as}", now, now, now)
+            )
+        return job_id
+
+    with open(_job_path(job_id), "wb") as f:
+        f.write(pdf_bytes)
+    with closing(_connect()) as connection, connection:
+        connection.execute(
+            """INSERT INTO jobs (id, namespace, filename, content_hash, status, stage, created_at, updated_at)
+            VALUES (?, ?, ?, ?, 'queued', 'queued', ?, ?)""",
+            (job_id, namespace, filename, content_hash, now, now)
+        )
+    _queue_job(job_id, namespace, filename)
+    return job_id
+
+def _prepare_worker():
+    while True:
+        job_id, namespace, filename = _prepare_queue.get()
+        try:
+            job = get_job(job_id)
+            if not job or job["status"] not in ACTIVE_STATUSES:
+                release_document(namespace, filename)
+                continue
+            with open(_job_path(job_id), "rb") as f:
+                pdf_bytes = f.read()
+            _update_job(job_id, status="running", stage="preparing", detail="")
+        except Exception as e:
+            release_document(namespace, filename)
+            _finish_job(job_id, "failed", error=str(e))
+            continue
+
+        try:
+            chunks, store = ingest_document(
+                job["filename"],
+                pdf_bytes,
+                job["namespace"],
+                job_id, #the job id ties the spans of both stages together
+                lambda stage, detail="": _update_job(job_id, stage=stage, detail=detail)
+            )
+            if store is None:
+                _update_job(job_id, chunks=chunks)
+                _finish_job(job_id, "done")
+            else:
+                _update_job(job_id, chunks=chunks, stage="waiting to store")
+                _store_queue.put((job_id, store))
+        except Exception as e:
+            _finish_job(job_id, "failed", error=str(e))
+
+def _store_worker():
+    while True:
+        job_id, store = _store_queue.get()
+        try:
+            store()
+            _finish_job(job_id, "done")
+        except Exception as e:
+            _finish_job(job_id, "failed", error=str(e))
+
+def start_ingestion_workers():
+    """
+    Start the background ingestion threads, once per process.
+
+    Extraction and embedding run on INGEST_CPU_WORKERS threads and upserts on
+    INGEST_IO_WORKERS threads. Jobs left queued or running by a previous
+    server process are queued again; re-running one is cheap because chunks
+    that were already stored are skipped by the document manifest. Finished
+    jobs older than JOB_RETENTION are dropped.
+    """
+    with _workers_lock:
+        if _workers:
+            return
+
+        for i in range(max(1, INGEST_CPU_WORKERS)):
+            _workers.append(threading.Thread(target=_prepare_worker, name=f"ingest-job-prepare-{i}", daemon=True))
+        for i in range(max(1, INGEST_IO_WORKERS)):
+            _workers.append(threading.Thread(target=_store_worker, name=f"ingest-job-store-{i}", daemon=True))
+        for worker in _workers:
+            worker.start()
+
+        with closing(_connect()) as connection, connection:
+            connection.execute(
+                f"DELETE FROM jobs WHERE status NOT IN ({','.join('?' * len(ACTIVE_STATUSES))}) AND updated_at < ?",
+                ACTIVE_STATUSES + (time.time() - JOB_RETENTION,)
+            )
+            rows = connection.execute(
+                f"SELECT id, namespace, filename FROM jobs WHERE status IN ({','.join('?' * len(ACTIVE_STATUSES))}) ORDER BY created_at",
+                ACTIVE_STATUSES
+            ).fetchall()
+        for job_id, namespace, filename in rows:
+            if os.path.exists(_job_path(job_id)):
+                _queue_job(job_id, namespace, filename)
+            else:
+                _finish_job(job_id, "failed", error="Uploaded file was lost before the job ran")
@@ -0,0 +1,773 @@
+import os
+import time
+import uuid
+import queue
+import tempfile
+import threading
+import contextvars
+import streamlit as st
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from PyPDF2 import PdfReader
+from backend.pdf_ingestion import iter_pdf_pages, read_pdf_metadata, extract_pages_from_pdf, count_pdf_pages
+from collections import Counter, deque
+from backend.text_chunking import build_chunk_metadata, split_pages
+from backend.embedding_service import get_embedding_model
+from backend.embedding_batching import embed_chunks
+from backend.ingestion_cache import hash_pdf_bytes, ingestion_cache_key, load_cached_ingestion, save_ingestion, open_ingestion_cache
+from backend.namespace_registry import NamespaceQuotaExceeded
+from backend.pinecone_storage import get_vector_index, build_vectors, upsert_vectors, persist_vector_index, store_embeddings, delete_vectors, update_vector_metadata
+from backend.document_manifest import document_key, chunk_ids, chunk_position, moved_chunks, load_manifest, save_manifest, plan_document_update
+from backend.tracing import span, start_trace
+
+try:
+    from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+except ImportError: #older streamlit, worker threads just cannot draw messages
+    add_script_run_ctx = None
+    get_script_run_ctx = None
+
+STREAM_QUEUE_SIZE = int(os.environ.get("INGEST_QUEUE_SIZE", "4")) #items buffered between two stages
+STREAM_EMBED_BATCH = int(os.environ.get("INGEST_EMBED_BATCH", "64")) #chunks embedded and upserted together
+STREAM_MIN_PAGES = int(os.environ.get("INGEST_STREAM_MIN_PAGES", "100")) #documents this long are streamed instead of loaded whole
+INGEST_CPU_WORKERS = int(os.environ.get("INGEST_CPU_WORKERS", "2")) #files extracted and embedded at once
+INGEST_IO_WORKERS = int(os.environ.get("INGEST_IO_WORKERS", "2")) #files upserted at once
+
+_DONE = object() #end of stream marker passed between stages
+_document_claims = {} #(namespace, document key) -> callbacks of the claims queued behind the current one
+_document_claims_lock = threading.Lock()
+
+def _put(stage_queue, item, stop_event):
+    """Put into a bounded queue, giving up if the pipeline is being torn down."""
+    while not stop_event.is_set():
+        try:
+            stage_queue.put(item, timeout=0.2)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+def _drain(stage_queue, stop_event):
+    """Yield items from a stage queue until the end of stream marker or teardown."""
+    while not stop_event.is_set():
+        try:
+            item = stage_queue.get(timeout=0.2)
+        except queue.Empty:
+            continue
+        if item is _DONE:
+            return
+        yield item
+
+def _plan_batch(doc_key, chunks, chunk_offsets, metadata, position, seen, manifest):
+    """
+    Give one batch of a streamed document its ids and metadata, and diff it against the manifest.
+
+    Returns:
+        ids: Vector id of every chunk in the batch
+        chunk_metadata: Metadata of every chunk, chunk_index counted from position
+        positions: chunk_position of every chunk, for the manifest
+        changed: Indexes of chunks that are not stored yet
+        moved: Indexes of stored chunks whose position metadata is out of date
+    """
+    ids = chunk_ids(doc_key, chunks, seen)
+    chunk_metadata = build_chunk_metadata(chunks, metadata, chunk_offsets)
+    for i, chunk_meta in enumerate(chunk_metadata):
+        chunk_meta["chunk_index"] = position + i
+    positions = [chunk_position(chunk_meta) for chunk_meta in chunk_metadata]
+    old_ids = set(manifest["ids"]) if manifest else set()
+    changed = [i for i, vector_id in enumerate(ids) if vector_id not in old_ids] #unchanged chunks are already stored
+    moved = moved_chunks(manifest, ids, positions)
+    return ids, chunk_metadata, positions, changed, moved
+
+def _store_batch(index, namespace, embeddings, ids, chunk_metadata, moved_ids, moved_metadata, stats):
+    """Upsert the new chunks of one batch and rewrite the metadata of its moved ones."""
+    if ids:
+        with span("upsert", vectors=len(ids)):
+            upsert_vectors(index, build_vectors(embeddings, chunk_metadata, ids=ids), namespace=namespace)
+        stats["upserted"] += len(ids)
+    if moved_ids:
+        with span("update_metadata", vectors=len(moved_ids)):
+            if not update_vector_metadata(moved_ids, moved_metadata, namespace):
+                raise ValueError("Updating moved chunks failed")
+        stats["moved"] += len(moved_ids)
+
+def _finish_stream(namespace, doc_key, filename, content_hash, manifest, all_ids, all_positions, stats):
+    """Delete the chunks the new version no longer has and record its manifest."""
+    old_ids = set(manifest["ids"]) if manifest else set()
+    stale_ids = sorted(old_ids - set(all_ids))
+    if stale_ids and not delete_vectors(stale_ids, namespace):
+        return False
+    stats["deleted"] = len(stale_ids)
+    save_manifest(namespace, doc_key, filename, content_hash, all_ids, all_positions)
+    persist_vector_index(namespace)
+    return True
+
+def _stream_stats(total_pages):
+    return {
+        "pages": 0,
+        "total_pages": total_pages,
+        "chunks": 0,
+        "upserted": 0,
+        "moved": 0,
+        "deleted": 0,
+        "seconds": 0.0,
+        "first_searchable_seconds": None
+    }
+
+def _batch_stored(stats, batch_size, start_time, on_progress):
+    stats["chunks"] += batch_size
+    stats["seconds"] = time.perf_counter() - start_time
+    if stats["first_searchable_seconds"] is None:
+        stats["first_searchable_seconds"] = stats["seconds"]
+    if on_progress:
+        on_progress(stats)
+
+def stream_ingest_pdf(pdf_path, metadata, namespace="default", on_progress=None, content_hash=None, cache_key=None):
+    """
+    Extract, chunk, embed and upsert a PDF as a stream of batches.
+
+    Extraction and embedding run on their own threads connected by bounded
+    queues, and the calling thread upserts each batch as soon as it is
+    embedded. Pages are extracted ahead, in order, by the shared PDF
+    extraction pool. Peak memory depends on the queue sizes, not the
+    document size, and the first chunks are searchable while later pages
+    are still being read.
+
+    Chunks get deterministic ids; chunks already stored for an earlier
+    version of the document are not embedded again, only their position
+    metadata is rewritten if they moved, and chunks that no longer exist are
+    deleted at the end.
+
+    When every chunk is embedded, e.g. on the first upload to a namespace,
+    each batch is also appended to an ingestion cache entry under cache_key,
+    so later uploads of the same file skip extraction and embedding.
+
+    Args:
+        pdf_path: Path to the PDF file
+        metadata: Document metadata copied onto every chunk, including filename
+        namespace: Pinecone namespace
+        on_progress: Called with the stats dict after every upserted batch
+        content_hash: sha256 of the PDF bytes, recorded in the document manifest
+        cache_key: Ingestion cache key to write the document under, None to skip caching
+
+    Returns:
+        stats: Dict with pages, chunks, upserted, deleted, seconds and
+            first_searchable_seconds, or None on failure
+
+    Raises:
+        NamespaceQuotaExceeded: If a batch does not fit the namespace quota
+    """
+    index = get_vector_index()
+    if not index:
+        return None
+
+    embeddings_model = get_embedding_model()
+    if not embeddings_model:
+        return None
+
+    metadata = dict(metadata or {})
+    try:
+        pdf_reader = PdfReader(pdf_path)
+        total_pages = len(pdf_reader.pages)
+        pdf_metadata = read_pdf_metadata(pdf_reader)
+        for key, value in pdf_metadata.items():
+            if key != "filename":
+                metadata.setdefault(key, value)
+    except Exception as e:
+        st.error(f"Error reading PDF: {str(e)}")
+        return None
+
+    filename = metadata.get("filename", os.path.basename(pdf_path))
+    doc_key = document_key(filename)
+    manifest = load_manifest(namespace, doc_key)
+    all_ids = [] #ids of every chunk in document order, for the manifest
+    all_positions = [] #chunk_position of every chunk, for the manifest
+    cache_writer = open_ingestion_cache(cache_key) if cache_key else None
+
+    stats = _stream_stats(total_pages)
+    page_queue = queue.Queue(maxsize=STREAM_QUEUE_SIZE * 4)
+    embed_queue = queue.Queue(maxsize=STREAM_QUEUE_SIZE)
+    stop_event = threading.Event()
+    errors = []
+
+    def extract_stage():
+        try:
+            for page in iter_pdf_pages(pdf_path):
+                stats["pages"] = page[0]
+                if not _put(page_queue, page, stop_event):
+                    return
+        except Exception as e:
+            errors.append(e)
+        finally:
+            _put(page_queue, _DONE, stop_event)
+
+    def embed_stage():
+        try:
+            seen = Counter()
+            position = 0
+            batch = []
+
+            def flush(batch):
+                chunks = [chunk for chunk, _ in batch]
+                chunk_offsets = [offsets for _, offsets in batch]
+                ids, chunk_metadata, positions, changed, moved = _plan_batch(doc_key, chunks, chunk_offsets, metadata, position, seen, manifest)
+                all_ids.extend(ids)
+                all_positions.extend(positions)
+                texts = [chunks[i] for i in changed]
+                with span("embed_documents", chunks=len(texts)) as record:
+                    embeddings, batch_stats = embed_chunks(embeddings_model, texts)
+                    record.update(batch_stats)
+                if cache_writer is not None:
+                    if len(changed) == len(chunks): #the whole batch was embedded, in order
+                        cache_writer.append(chunks, chunk_offsets, embeddings)
+                    else: #the cache needs every vector of the document
+                        cache_writer.abort()
+                return _put(embed_queue, (
+                    len(batch),
+                    embeddings,
+                    [ids[i] for i in changed],
+                    [chunk_metadata[i] for i in changed],
+                    [ids[i] for i in moved],
+                    [chunk_metadata[i] for i in moved]
+                ), stop_event)
+
+            for chunk, offsets in split_pages(_drain(page_queue, stop_event)):
+                batch.append((chunk, offsets))
+                if len(batch) >= STREAM_EMBED_BATCH:
+                    if not flush(batch):
+                        return
+                    position += len(batch)
+                    batch = []
+            if batch:
+                flush(batch)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            _put(embed_queue, _DONE, stop_event)
+
+    workers = [ #each stage runs in a copy of this context, so its spans land in the caller's trace
+        threading.Thread(target=contextvars.copy_context().run, args=(extract_stage,), name="ingest-extract", daemon=True),
+        threading.Thread(target=contextvars.copy_context().run, args=(embed_stage,), name="ingest-embed", daemon=True)
+    ]
+    start_time = time.perf_counter()
+    for worker in workers:
+        worker.start()
+
+    try:
+        try:
+            for batch_size, embeddings, ids, chunk_metadata, moved_ids, moved_metadata in _drain(embed_queue, stop_event):
+                _store_batch(index, namespace, embeddings, ids, chunk_metadata, moved_ids, moved_metadata, stats)
+                _batch_stored(stats, batch_size, start_time, on_progress)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            stop_event.set() #unblocks any stage still waiting on a full queue
+            for worker in workers:
+                worker.join()
+
+        if errors:
+            if isinstance(errors[0], NamespaceQuotaExceeded): #the job records it, so the user learns why
+                raise errors[0]
+            st.error(f"Error in streaming ingestion: {str(errors[0])}")
+            return None
+
+        if stats["chunks"] == 0:
+            st.warning("No text extracted from PDF. The file might be scanned or image-based.")
+            return None
+
+        if not _finish_stream(namespace, doc_key, filename, content_hash, manifest, all_ids, all_positions, stats):
+            return None
+        if cache_writer is not None:
+            with span("cache_write"):
+                cache_writer.commit(pdf_metadata, total_pages)
+    finally:
+        if cache_writer is not None:
+            cache_writer.abort() #no-op once committed
+
+    stats["seconds"] = time.perf_counter() - start_time
+    return stats
+
+def replay_cached_document(cached, metadata, namespace="default", on_progress=None, content_hash=None):
+    """
+    Store a long document from the ingestion cache in batches, like stream_ingest_pdf.
+
+    Batches of STREAM_EMBED_BATCH chunks are diffed against the manifest and
+    their cached rows upserted straight from the memory mapped embeddings,
+    so only one batch of vectors is built at a time.
+
+    Args:
+        cached: Entry from load_cached_ingestion
+        metadata: Document metadata copied onto every chunk, including filename
+        namespace: Pinecone namespace
+        on_progress: Called with the stats dict after every upserted batch
+        content_hash: sha256 of the PDF bytes, recorded in the document manifest
+
+    Returns:
+        stats: Same as stream_ingest_pdf, or None on failure
+
+    Raises:
+        NamespaceQuotaExceeded: If a batch does not fit the namespace quota
+    """
+    index = get_vector_index()
+    if not index:
+        return None
+
+    metadata = dict(metadata or {})
+    for key, value in cached["pdf_metadata"].items():
+        if key != "filename":
+            metadata.setdefault(key, value)
+    filename = metadata["filename"]
+    doc_key = document_key(filename)
+    manifest = load_manifest(namespace, doc_key)
+    chunks = cached["chunks"]
+    chunk_offsets = cached["chunk_offsets"]
+    all_ids = []
+    all_positions = []
+    seen = Counter()
+    stats = _stream_stats(cached["pages"])
+    stats["pages"] = cached["pages"]
+    start_time = time.perf_counter()
+
+    for position in range(0, len(chunks), STREAM_EMBED_BATCH):
+        end = min(position + STREAM_EMBED_BATCH, len(chunks))
+        ids, chunk_metadata, positions, changed, moved = _plan_batch(
+            doc_key, chunks[position:end], chunk_offsets[position:end], metadata, position, seen, manifest
+        )
+        all_ids.extend(ids)
+        all_positions.extend(positions)
+        _store_batch(
+            index,
+            namespace,
+            cached["embeddings"][[position + i for i in changed]] if changed else [],
+            [ids[i] for i in changed],
+            [chunk_metadata[i] for i in changed],
+            [ids[i] for i in moved],
+            [chunk_metadata[i] for i in moved],
+            stats
+        )
+        _batch_stored(stats, end - position, start_time, on_progress)
+
+    if not _finish_stream(namespace, doc_key, filename, content_hash, manifest, all_ids, all_positions, stats):
+        return None
+    stats["seconds"] = time.perf_counter() - start_time
+    return stats
+
+def prepare_document(filename, pdf_bytes, namespace="default", report=None):
+    """
+    Run the CPU-bound part of ingesting one PDF.
+
+    Documents seen before are loaded from the ingestion cache, and long ones
+    are replayed from it in batches; other long documents are streamed
+    straight into the vector store; everything else is extracted and chunked. The chunks are then diffed against the document's
+    manifest so only new or changed chunks are embedded.
+
+    Args:
+        filename: Name of the uploaded file
+        pdf_bytes: Contents of the PDF
+        namespace: Pinecone namespace
+        report: Optional callback(stage, detail) for progress updates
+
+    Returns:
+        document: Dict with filename, content_hash, chunks, ids, doc_key,
+            positions, plus the embeddings, chunk_metadata and upsert_ids of
+            the chunks to store, the moved_ids and moved_metadata of stored
+            chunks that changed position, the stale_ids to delete, and
+            cached, streamed and unchanged flags
+
+    Raises:
+        ValueError: If no text or chunks could be produced, NamespaceQuotaExceeded
+            if a streamed or replayed document does not fit the namespace quota
+    """
+    report = report or (lambda stage, detail="": None)
+    content_hash = hash_pdf_bytes(pdf_bytes)
+    metadata = {
+        "filename": filename,
+        "source": "uploaded_pdf"
+    }
+    document = {
+        "filename": filename,
+        "content_hash": content_hash,
+        "chunks": [],
+        "embeddings": [],
+        "chunk_metadata": [],
+        "upsert_ids": [],
+        "moved_ids": [],
+        "moved_metadata": [],
+        "stale_ids": [],
+        "cached": False,
+        "streamed": False,
+        "unchanged": False
+    }
+
+    cache_key = ingestion_cache_key(content_hash)
+    with span("cache_lookup") as record:
+        cached = load_cached_ingestion(cache_key)
+        record["hit"] = cached is not None
+    pdf_metadata = {}
+    total_pages = 0
+    if cached and cached["pages"] >= STREAM_MIN_PAGES: #long documents are replayed batch by batch, like they were streamed
+        report("cached", f"{len(cached['chunks'])} chunks from cache")
+        with span("replay_cached"):
+            stats = replay_cached_document(
+                cached,
+                metadata,
+                namespace=namespace,
+                on_progress=lambda stats: report("streaming", f"{stats['chunks']} of {len(cached['chunks'])} cached chunks searchable"),
+                content_hash=content_hash
+            )
+        if not stats:
+            raise ValueError("Storing the cached document failed")
+        document.update({"cached": True, "streamed": True, "stats": stats})
+        return document
+    elif cached:
+        pdf_metadata = cached["pdf_metadata"]
+        chunks = cached["chunks"]
+        chunk_offsets = cached["chunk_offsets"]
+        document["cached"] = True
+        report("cached", f"{len(chunks)} chunks from cache")
+    else:
+        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp:
+            tmp.write(pdf_bytes)
+            pdf_path = tmp.name
+
+        try:
+            total_pages = count_pdf_pages(pdf_path)
+            if total_pages >= STREAM_MIN_PAGES: #long documents are streamed page by page instead of loaded whole
+                with span("stream_ingest"):
+                    stats = stream_ingest_pdf(
+                        pdf_path,
+                        metadata,
+                        namespace=namespace,
+                        on_progress=lambda stats: report(
+                            "streaming",
+                            f"{stats['chunks']} chunks searchable, page {stats['pages']} of {stats['total_pages']} read"
+                        ),
+                        content_hash=content_hash,
+                        cache_key=cache_key
+                    )
+                if not stats:
+                    raise ValueError("Streaming ingestion failed")
+                document["streamed"] = True
+                document["stats"] = stats
+                return document
+
+            report("extracting")
+            with span("extract") as record:
+                pages, pdf_metadata = extract_pages_from_pdf(pdf_path)
+                record["pages"] = len(pages or [])
+        finally:
+            if os.path.exists(pdf_path):
+                os.remove(pdf_path)
+
+        if not pages:
+            raise ValueError("No valid text extracted")
+
+        with span("split") as record:
+            split = list(split_pages(pages))
+            record["chunks"] = len(split)
+        chunks = [chunk for chunk, _ in split]
+        chunk_offsets = [offsets for _, offsets in split]
+        if not chunks:
+            raise ValueError("No chunks created")
+
+    if isinstance(pdf_metadata, dict):
+        for key, value in pdf_metadata.items():
+            if key != "filename":
+                metadata[key] = value
+
+    chunk_metadata = build_chunk_metadata(chunks, metadata, chunk_offsets)
+    with span("diff"):
+        plan = plan_document_update(namespace, filename, content_hash, chunks, chunk_metadata)
+    document.update({
+        "chunks": chunks,
+        "ids": plan["ids"],
+        "positions": plan["positions"],
+        "doc_key": plan["doc_key"],
+        "stale_ids": plan["stale_ids"],
+        "unchanged": plan["unchanged"]
+    })
+    if plan["unchanged"]:
+        report("unchanged")
+        return document
+
+    document["moved_ids"] = [plan["ids"][position] for position in plan["moved_positions"]]
+    document["moved_metadata"] = [chunk_metadata[position] for position in plan["moved_positions"]]
+    positions = plan["new_positions"]
+    document["chunk_metadata"] = [chunk_metadata[position] for position in positions]
+    document["upsert_ids"] = [plan["ids"][position] for position in positions]
+
+    if cached:
+        document["embeddings"] = cached["embeddings"][positions] if positions else []
+        return document
+
+    if not positions:
+        return document
+
+    embeddings_model = get_embedding_model()
+    if not embeddings_model:
+        raise ValueError("Failed to load embedding model")
+
+    report("embedding", f"{len(positions)} of {len(chunks)} chunks new or changed")
+    with span("embed_documents", chunks=len(positions)) as record:
+        embeddings, batch_stats = embed_chunks(embeddings_model, [chunks[position] for position in positions])
+        record.update(batch_stats)
+    document["embeddings"] = embeddings
+
+    if len(positions) == len(chunks): #a full set of vectors can serve later uploads of the same file
+        save_ingestion(cache_key, pdf_metadata if isinstance(pdf_metadata, dict) else {}, chunks, embeddings, chunk_offsets, total_pages)
+
+    return document
+
+def store_document(document, namespace="default"):
+    """
+    Apply a prepared document to the vector store and record its manifest.
+
+    Args:
+        document: Result of prepare_document
+        namespace: Pinecone namespace
+
+    Raises:
+        ValueError: If storing or deleting vectors failed, NamespaceQuotaExceeded
+            with the quota that was hit
+    """
+    if document["upsert_ids"]:
+        with span("upsert", vectors=len(document["upsert_ids"])):
+            stored = store_embeddings(
+                document["embeddings"],
+                document["chunk_metadata"],
+                namespace=namespace,
+                show_progress=False,
+                ids=document["upsert_ids"]
+            )
+        if not stored:
+            raise ValueError("Storing embeddings failed")
+
+    if document["moved_ids"]:
+        with span("update_metadata", vectors=len(document["moved_ids"])):
+            updated = update_vector_metadata(document["moved_ids"], document["moved_metadata"], namespace)
+        if not updated:
+            raise ValueError("Updating moved chunks failed")
+
+    if document["stale_ids"]:
+        with span("delete_stale", vectors=len(document["stale_ids"])):
+            deleted = delete_vectors(document["stale_ids"], namespace)
+        if not deleted:
+            raise ValueError("Deleting stale chunks failed")
+
+    save_manifest(namespace, document["doc_key"], document["filename"], document["content_hash"], document["ids"], document["positions"])
+
+def claim_document(namespace, filename, on_claimed):
+    """
+    Queue for the right to ingest a document, so versions of one file are ingested one at a time.
+
+    Two versions prepared at once would both be diffed against the same
+    manifest, and whichever was stored last would leave the other's chunks
+    behind. Claims on the same document are granted in the order they are
+    made, each once the one before it is released with release_document.
+
+    Args:
+        namespace: Pinecone namespace
+        filename: Name of the PDF, versions share its document_key
+        on_claimed: Called once the claim is granted, right away if the
+            document is free, otherwise on the thread that releases it
+
+    Returns:
+        claimed: True if the claim was granted right away
+    """
+    key = (namespace, document_key(filename))
+    with _document_claims_lock:
+        waiting = _document_claims.get(key)
+        if waiting is not None:
+            waiting.append(on_claimed)
+            return False
+        _document_claims[key] = deque()
+    on_claimed()
+    return True
+
+def release_document(namespace, filename):
+    """Release a claim made with claim_document, granting the next one queued on the document."""
+    key = (namespace, document_key(filename))
+    with _document_claims_lock:
+        waiting = _document_claims.get(key)
+        if not waiting:
+            _document_claims.pop(key, None)
+            return
+        on_claimed = waiting.popleft()
+    on_claimed()
+
+def ingest_document(filename, pdf_bytes, namespace="default", request_id=None, report=None):
+    """
+    Prepare one document for storing, the per-document step of ingest_files and the ingestion jobs.
+
+    Streamed, replayed and unchanged documents are already stored when this
+    returns. For the others the storing stage is handed back instead of run,
+    so the caller can run it on its upload workers while the next document is
+    being prepared. The document must have been claimed with claim_document,
+    and is released once it is stored or either stage fails.
+
+    Args:
+        filename: Name of the PDF
+        pdf_bytes: Contents of the PDF
+        namespace: Pinecone namespace
+        request_id: Trace id both stages are recorded under
+        report: Called as report(stage, detail) as the document moves through the stages
+
+    Returns:
+        chunks: Number of chunks in the document
+        store: Function that stores the document and records its manifest,
+            or None if there is nothing left to store
+
+    Raises:
+        ValueError: If no text or chunks could be produced, or, from store,
+            if storing failed. NamespaceQuotaExceeded with the quota that was hit
+    """
+    report = report or (lambda stage, detail="": None)
+    try:
+        with start_trace("ingest", request_id=request_id):
+            document = prepare_document(filename, pdf_bytes, namespace, report)
+    except BaseException:
+        release_document(namespace, filename)
+        raise
+    chunks = len(document["chunks"]) or document.get("stats", {}).get("chunks", 0)
+    if document["streamed"] or document["unchanged"]: #already upserted while it was being read, or nothing to do
+        release_document(namespace, filename)
+        return chunks, None
+
+    def store():
+        try:
+            report("storing", f"{len(document['upsert_ids'])} new, {len(document['moved_ids'])} moved, {len(document['stale_ids'])} stale chunks")
+            with start_trace("ingest_store", request_id=request_id):
+                store_document(document, namespace)
+        finally:
+            release_document(namespace, filename)
+
+    return chunks, store
+
+def ingest_files(files, namespace="default", known_hashes=None, on_progress=None, on_result=None, cpu_workers=None, io_workers=None):
+    """
+    Ingest several PDFs with their CPU and network stages overlapped.
+
+    Extraction and embedding run on one thread pool and upserts on another,
+    so file N+1 is being embedded while file N is being uploaded. A failure
+    in one file is recorded in its result and does not stop the others.
+    Files are taken from the iterable only as workers free up, so a large
+    corpus is never held in memory at once. Files with the same name are
+    ingested one after the other, in the order given.
+
+    Args:
+        files: Iterable of (filename, pdf_bytes), pdf_bytes may be a callable returning them
+        namespace: Pinecone namespace
+        known_hashes: Content hashes already stored in the namespace, skipped
+        on_progress: Called as on_progress(filename, stage, detail) from the calling thread
+        on_result: Called with each file's result dict once it is finished, from the calling thread
+        cpu_workers: Files extracted and embedded at once, defaults to INGEST_CPU_WORKERS
+        io_workers: Files upserted at once, defaults to INGEST_IO_WORKERS
+
+    Returns:
+        results: One dict per file with name, request_id, status,
+            content_hash, chunks, seconds and error, in the order given
+    """
+    known_hashes = set(known_hashes or [])
+    cpu_workers = max(1, cpu_workers or INGEST_CPU_WORKERS)
+    io_workers = max(1, io_workers or INGEST_IO_WORKERS)
+    events = queue.Queue()
+    results = {}
+    order = []
+    started = {}
+    ctx = get_script_run_ctx() if get_script_run_ctx else None
+
+    def attach_ctx():
+        if ctx and add_script_run_ctx:
+            add_script_run_ctx(threading.current_thread(), ctx) #lets warnings from worker threads reach the page
+
+    def report(name, stage, detail=""):
+        events.put((name, stage, detail))
+
+    def prepare(name, pdf_bytes):
+        started[name] = time.perf_counter()
+        return ingest_document(name, pdf_bytes, namespace, results[name]["request_id"], lambda stage, detail="": report(name, stage, detail))
+
+    def finish(name, status, error=None):
+        results[name]["status"] = status
+        results[name]["error"] = error
+        results[name]["seconds"] = time.perf_counter() - started.get(name, time.perf_counter())
+        report(name, status, error or "")
+        if on_result:
+            on_result(results[name])
+
+    def flush_events():
+        while True:
+            try:
+                name, stage, detail = events.get_nowait()
+            except queue.Empty:
+                return
+            if on_progress:
+                on_progress(name, stage, detail)
+
+    waiting = iter(files)
+    exhausted = False
+    pending = {}
+    ready = queue.Queue() #claimed files, put here once no earlier version is being ingested
+    claimed = 0 #files claimed and not yet submitted
+    max_prepared_ahead = cpu_workers + io_workers #bounds how many embedded files wait in memory for upload
+
+    with ThreadPoolExecutor(max_workers=cpu_workers, initializer=attach_ctx) as cpu_pool, \
+            ThreadPoolExecutor(max_workers=io_workers, initializer=attach_ctx) as io_pool:
+        while not exhausted or pending or claimed:
+            while not exhausted and len(pending) + claimed < max_prepared_ahead:
+                try:
+                    name, pdf_bytes = next(waiting)
+                except StopIteration:
+                    exhausted = True
+                    break
+                if name not in results:
+                    order.append(name)
+                results[name] = {"name": name, "request_id": uuid.uuid4().hex[:12], "status": "queued", "content_hash": None, "chunks": 0, "seconds": 0.0, "error": None}
+                started[name] = time.perf_counter()
+                try:
+                    pdf_bytes = pdf_bytes() if callable(pdf_bytes) else pdf_bytes
+                except OSError as e:
+                    finish(name, "failed", str(e))
+                    continue
+                content_hash = hash_pdf_bytes(pdf_bytes)
+                results[name]["content_hash"] = content_hash
+                if content_hash in known_hashes: #same content already stored or queued under another name
+                    finish(name, "skipped", "duplicate content")
+                    continue
+                known_hashes.add(content_hash)
+                claimed += 1
+                claim_document(namespace, name, lambda name=name, pdf_bytes=pdf_bytes: ready.put((name, pdf_bytes)))
+
+            while True:
+                try:
+                    name, pdf_bytes = ready.get_nowait()
+                except queue.Empty:
+                    break
+                claimed -= 1
+                pending[cpu_pool.submit(prepare, name, pdf_bytes)] = ("prepare", name)
+
+            if pending:
+                done, _ = wait(list(pending), timeout=0.2, return_when=FIRST_COMPLETED)
+            else: #only files whose earlier version another caller is still ingesting
+                done = set()
+                time.sleep(0.2)
+            for future in done:
+                stage, name = pending.pop(future)
+                error = future.exception()
+                if error is not None:
+                    known_hashes.discard(results[name]["content_hash"]) #a later copy of the same file may still succeed
+                    finish(name, "failed", str(error))
+                    continue
+
+                if stage == "store":
+                    finish(name, "done")
+                    continue
+
+                results[name]["chunks"], store = future.result()
+                if store is None:
+                    finish(name, "done")
+                else:
+                    pending[io_pool.submit(store)] = ("store", name)
+
+            flush_events()
+
+    flush_events()
+    return [results[name] for name in order]
@@ -0,0 +1,160 @@
+import re
+import sqlite3
+import threading
+from contextlib import closing
+from backend.chunk_store import CHUNK_STORE_PATH, get_chunks
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-_./][a-z0-9]+)*") #keeps part numbers and codes like ab-1234 or e.404 together
+_SQLITE_MAX_VARIABLES = 900 #stay under SQLite's bound parameter limit
+_schema_ready = False
+_schema_lock = threading.Lock()
+
+def tokenize(text):
+    """
+    Split text into lower case terms for the lexical index.
+
+    Compound codes are indexed whole and also by their parts, so "AB-1234"
+    matches a query for "AB-1234" exactly and a query for "1234" partially.
+    """
+    terms = []
+    for token in _TOKEN_PATTERN.findall(text.lower()):
+        terms.append(token)
+        if not token.isalnum():
+            terms.extend(part for part in re.split(r"[-_./]", token) if part)
+    return terms
+
+def _create_schema(connection):
+    """Create the full-text tables on first use and index the chunks already in the chunk store."""
+    connection.execute("BEGIN IMMEDIATE") #one process creates and fills the tables, the others wait for it
+    try:
+        exists = connection.execute("SELECT 1 FROM sqlite_master WHERE name = 'lexical_terms'").fetchone()
+        if not exists:
+            connection.execute(
+                """CREATE TABLE lexical_docs (
+                    rowid INTEGER PRIMARY KEY,
+                    namespace TEXT NOT NULL,
+                    id TEXT NOT NULL,
+                    UNIQUE (namespace, id)
+                )"""
+            )
+            connection.execute( #terms are tokenized here, so codes like ab-1234 must stay one FTS token
+                """CREATE VIRTUAL TABLE lexical_terms USING fts5(terms, tokenize="unicode61 tokenchars '-_./'")"""
+            )
+            has_chunks = connection.execute("SELECT 1 FROM sqlite_master WHERE name = 'chunks'").fetchone()
+            if has_chunks: #chunks stored before the lexical index was kept on disk
+                for namespace, chunk_id, text in connection.execute("SELECT namespace, id, text FROM chunks").fetchall():
+                    _index_document(connection, namespace, chunk_id, text)
+        connection.execute("COMMIT")
+    except Exception:
+        connection.execute("ROLLBACK")
+        raise
+
+def _connect():
+    global _schema_ready
+
+    connection = sqlite3.connect(CHUNK_STORE_PATH, timeout=30, isolation_level=None) #autocommit, transactions are explicit
+    connection.execute("PRAGMA journal_mode=WAL")
+    if not _schema_ready:
+        with _schema_lock:
+            if not _schema_ready:
+                _create_schema(connection)
+                _schema_ready = True
+    return connection
+
+def _index_document(connection, namespace, doc_id, text):
+    row = connection.execute("SELECT rowid FROM lexical_docs WHERE namespace = ? AND id = ?", (namespace, doc_id)).fetchone()
+    if row:
+        rowid = row[0]
+        connection.execute("DELETE FROM lexical_terms WHERE rowid = ?", (rowid,))
+    else:
+        rowid = connection.execute("INSERT INTO lexical_docs (namespace, id) VALUES (?, ?)", (namespace, doc_id)).lastrowid
+    connection.execute("INSERT INTO lexical_terms (rowid, terms) VALUES (?, ?)", (rowid, " ".join(tokenize(text))))
+
+def add_documents(namespace, vectors):
+    """
+    Index the text of upserted vectors.
+
+    The index is an SQLite FTS5 table next to the chunk store, so it is
+    shared by every process, e.g. the app and python -m backend.ingest, and
+    survives a restart. Only terms are indexed; lexical-only hits read their
+    text and metadata from the chunk store.
+
+    Args:
+        namespace: Pinecone namespace
+        vectors: Upserted vector dicts with id and metadata containing text
+    """
+    documents = [
+        (str(vector["id"]), (vector.get("metadata") or {}).get("text"))
+        for vector in vectors
+    ]
+    documents = [(doc_id, text) for doc_id, text in documents if text]
+    if not documents:
+        return
+    with closing(_connect()) as connection:
+        connection.execute("BEGIN IMMEDIATE")
+        for doc_id, text in documents:
+            _index_document(connection, namespace, doc_id, text)
+        connection.execute("COMMIT")
+
+def remove_documents(namespace, ids):
+    """Remove vectors from a namespace's lexical index."""
+    ids = [str(doc_id) for doc_id in ids]
+    with closing(_connect()) as connection:
+        connection.execute("BEGIN IMMEDIATE")
+        for i in range(0, len(ids), _SQLITE_MAX_VARIABLES):
+            batch = ids[i:i + _SQLITE_MAX_VARIABLES]
+            where = f"namespace = ? AND id IN ({','.join('?' * len(batch))})"
+            connection.execute(f"DELETE FROM lexical_terms WHERE rowid IN (SELECT rowid FROM lexical_docs WHERE {where})", [namespace] + batch)
+            connection.execute(f"DELETE FROM lexical_docs WHERE {where}", [namespace] + batch)
+        connection.execute("COMMIT")
+
+def clear_namespace(namespace):
+    """Drop a namespace's lexical index."""
+    with closing(_connect()) as connection:
+        connection.execute("BEGIN IMMEDIATE")
+        connection.execute("DELETE FROM lexical_terms WHERE rowid IN (SELECT rowid FROM lexical_docs WHERE namespace = ?)", (namespace,))
+        connection.execute("DELETE FROM lexical_docs WHERE namespace = ?", (namespace,))
+        connection.execute("COMMIT")
+
+def search(namespace, query_text, top_k=10):
+    """
+    Rank a namespace's chunks against a query with FTS5's BM25.
+
+    Term statistics cover every namespace in the store; only the ranking
+    within the namespace is used, by reciprocal rank fusion.
+
+    Returns:
+        results: List of (doc id, score, metadata), best first; metadata
+            includes text, or is None when the chunk is not in the chunk store
+    """
+    query_terms = sorted(set(tokenize(query_text or "")))
+    if not query_terms:
+        return []
+    match = " OR ".join('"' + term + '"' for term in query_terms) #quoted, so - and . are not read as FTS operators
+    with closing(_connect()) as connection:
+        rows = connection.execute(
+            """SELECT lexical_docs.id, -bm25(lexical_terms) FROM lexical_terms
+            JOIN lexical_docs ON lexical_docs.rowid = lexical_terms.rowid
+            WHERE lexical_terms MATCH ? AND lexical_docs.namespace = ?
+            ORDER BY bm25(lexical_terms) LIMIT ?""",
+            (match, namespace, top_k)
+        ).fetchall()
+    stored = get_chunks(namespace, [doc_id for doc_id, _ in rows])
+    return [(doc_id, score, stored.get(doc_id)) for doc_id, score in rows]
+
+def reciprocal_rank_fusion(rankings, k=60):
+    """
+    Fuse several ranked id lists into one.
+
+    Args:
+        rankings: Lists of ids, each best first
+        k: Damping constant, larger values flatten the contribution of top ranks
+
+    Returns:
+        fused: List of (id, score), best first
+    """
+    scores = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
@@ -0,0 +1,362 @@
+import os
+import json
+import threading
+import numpy as np
+
+try:
+    import faiss
+except ImportError: #faiss-cpu is optional, large namespaces fall back to brute force
+    faiss = None
+
+LOCAL_VECTOR_DIMENSION = 384 #all-MiniLM-L6-v2 embedding size, same as the Pinecone index
+LOCAL_ANN_THRESHOLD = int(os.environ.get("LOCAL_ANN_THRESHOLD", "20000")) #namespaces larger than this are searched with faiss HNSW
+LOCAL_VECTOR_STORE_DIR = os.environ.get("LOCAL_VECTOR_STORE_DIR") #optional directory to persist namespaces in
+LOCAL_COMPACT_MIN_ENTRIES = int(os.environ.get("LOCAL_COMPACT_MIN_ENTRIES", "10000")) #journal entries before a namespace snapshot is rewritten
+
+class Match:
+    """One query result, shaped like a Pinecone match."""
+    __slots__ = ("id", "score", "metadata", "values")
+
+    def __init__(self, id, score, metadata=None, values=None):
+        self.id = id
+        self.score = score
+        self.metadata = metadata
+        self.values = values
+
+class QueryResponse:
+    """Query results, shaped like a Pinecone query response."""
+
+    def __init__(self, matches, namespace=""):
+        self.matches = matches
+        self.namespace = namespace
+
+class _Namespace:
+    """Vectors, ids and metadata for one namespace, stored as a growable matrix."""
+
+    def __init__(self, dimension):
+        self.dimension = dimension
+        self.ids = []
+        self.row_of = {}
+        self.metadata = []
+        self.matrix = np.zeros((0, dimension), dtype=np.float32)
+        self.ann = None
+        self.ann_rows = 0 #rows already added to the ann index, later rows are appended lazily
+        self.journal_entries = 0 #changes written to the journal since the last snapshot
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _reserve(self, extra):
+        needed = len(self.ids) + extra
+        if needed > self.matrix.shape[0]:
+            capacity = max(needed, self.matrix.shape[0] * 2, 64)
+            grown = np.zeros((capacity, self.dimension), dtype=np.float32)
+            grown[:len(self.ids)] = self.matrix[:len(self.ids)]
+            self.matrix = grown
+
+    def upsert(self, ids, values, metadata):
+        self._reserve(len(ids))
+        for vector_id, vector, meta in zip(ids, values, metadata):
+            row = self.row_of.get(vector_id)
+            if row is None:
+                row = len(self.ids)
+                self.ids.append(vector_id)
+                self.metadata.append(meta)
+                self.row_of[vector_id] = row
+            else:
+                self.metadata[row] = meta
+                self.ann = None #overwritten rows invalidate the ann graph
+            self.matrix[row] = vector
+
+    def delete(self, ids):
+        for vector_id in ids:
+            row = self.row_of.pop(vector_id, None)
+            if row is None:
+                continue
+            last = len(self.ids) - 1
+            if row != last: #move the last row into the hole to keep the matrix dense
+                moved_id = self.ids[last]
+                self.ids[row] = moved_id
+                self.metadata[row] = self.metadata[last]
+                self.matrix[row] = self.matrix[last]
+                self.row_of[moved_id] = row
+            self.ids.pop()
+            self.metadata.pop()
+        self.ann = None
+
+    def search(self, query, top_k):
+        count = len(self.ids)
+        if count == 0:
+            return [], []
+        top_k = min(top_k, count)
+
+        if faiss is not None and count >= LOCAL_ANN_THRESHOLD:
+            if self.ann is None:
+                self.ann = faiss.IndexHNSWFlat(self.dimension, 32, faiss.METRIC_INNER_PRODUCT)
+                self.ann_rows = 0
+            if self.ann_rows < count:
+                self.ann.add(np.ascontiguousarray(self.matrix[self.ann_rows:count]))
+                self.ann_rows = count
+            scores, rows = self.ann.search(query.reshape(1, -1), top_k)
+            keep = rows[0] >= 0
+            return rows[0][keep].tolist(), scores[0][keep].tolist()
+
+        scores = self.matrix[:count] @ query
+        if top_k < count:
+            rows = np.argpartition(-scores, top_k - 1)[:top_k]
+        else:
+            rows = np.arange(count)
+        rows = rows[np.argsort(-scores[rows])]
+        return rows.tolist(), scores[rows].tolist()
+
+def _normalize(vectors):
+    """L2 normalize rows so inner product equals cosine similarity."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors.reshape(1, -1)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+class LocalVectorIndex:
+    """
+    In-process vector index with the subset of the Pinecone Index API the app uses.
+
+    Small namespaces are searched with an exact NumPy dot product; namespaces past
+    LOCAL_ANN_THRESHOLD switch to a faiss HNSW graph when faiss-cpu is installed.
+    Scores are cosine similarities, matching the Pinecone index metric.
+    """
+
+    def __init__(self, dimension=LOCAL_VECTOR_DIMENSION, persist_dir=LOCAL_VECTOR_STORE_DIR):
+        self.dimension = dimension
+        self.persist_dir = persist_dir
+        self._namespaces = {}
+        self._lock = threading.RLock()
+        if self.persist_dir:
+            os.makedirs(self.persist_dir, exist_ok=True)
+
+    def _namespace(self, namespace, create=False):
+        ns = self._namespaces.get(namespace)
+        if ns is None:
+            ns = self._load(namespace)
+            if ns is None and create:
+                ns = _Namespace(self.dimension)
+            if ns is not None:
+                self._namespaces[namespace] = ns
+                if ns.journal_entries < 0: #later entries would be appended after the damaged one and lost on the next load
+                    self.compact(namespace)
+        return ns
+
+    def upsert(self, vectors, namespace=""):
+        """Insert or overwrite vectors given as dicts with id, values and metadata."""
+        if not vectors:
+            return {"upserted_count": 0}
+
+        ids = []
+        values = []
+        metadata = []
+        for vector in vectors:
+            if isinstance(vector, dict):
+                ids.append(str(vector["id"]))
+                values.append(vector["values"])
+                metadata.append(vector.get("metadata") or {})
+            else: #(id, values) or (id, values, metadata) tuples
+                ids.append(str(vector[0]))
+                values.append(vector[1])
+                metadata.append(vector[2] if len(vector) > 2 else {})
+
+        normalized = _normalize(values)
+        if normalized.shape[1] != self.dimension:
+            raise ValueError(f"Vector dimension {normalized.shape[1]} does not match index dimension {self.dimension}")
+
+        with self._lock:
+            ns = self._namespace(namespace, create=True)
+            ns.upsert(ids, normalized, metadata)
+            self._journal(namespace, ns, {"op": "upsert", "ids": ids, "metadata": metadata}, normalized)
+        return {"upserted_count": len(ids)}
+
+    def query(self, vector, top_k=10, namespace="", include_metadata=False, include_values=False, **kwargs):
+        """Return the top_k most similar vectors in a namespace."""
+        query = _normalize(vector)[0]
+        with self._lock:
+            ns = self._namespace(namespace)
+            if ns is None:
+                return QueryResponse([], namespace)
+
+            rows, scores = ns.search(query, top_k)
+            matches = [
+                Match(
+                    ns.ids[row],
+                    float(score),
+                    dict(ns.metadata[row]) if include_metadata else None,
+                    ns.matrix[row].tolist() if include_values else None
+                )
+                for row, score in zip(rows, scores)
+            ]
+        return QueryResponse(matches, namespace)
+
+    def update(self, id, set_metadata=None, namespace="", **kwargs):
+        """Merge set_metadata into the metadata of one stored vector, leaving its values as they are."""
+        with self._lock:
+            ns = self._namespace(namespace)
+            row = ns.row_of.get(str(id)) if ns is not None else None
+            if row is not None and set_metadata:
+                ns.metadata[row] = {**ns.metadata[row], **set_metadata}
+                self._journal(namespace, ns, {"op": "update", "id": str(id), "metadata": ns.metadata[row]})
+        return {}
+
+    def delete(self, ids=None, delete_all=False, namespace="", **kwargs):
+        """Delete vectors by id, or the whole namespace with delete_all=True."""
+        with self._lock:
+            if delete_all:
+                self._namespaces.pop(namespace, None)
+                self._remove_persisted(namespace)
+                return {}
+            ns = self._namespace(namespace)
+            if ns is not None and ids:
+                ids = [str(vector_id) for vector_id in ids]
+                ns.delete(ids)
+                self._journal(namespace, ns, {"op": "delete", "ids": ids})
+        return {}
+
+    def describe_index_stats(self):
+        """Return vector counts per namespace."""
+        with self._lock:
+            namespaces = {name: {"vector_count": len(ns)} for name, ns in self._namespaces.items()}
+        return {
+            "dimension": self.dimension,
+            "namespaces": namespaces,
+            "total_vector_count": sum(ns["vector_count"] for ns in namespaces.values())
+        }
+
+    def _paths(self, namespace):
+        safe_name = "".join(c if c.isalnum() or c in "-_." else "_" for c in namespace) or "_default"
+        base = os.path.join(self.persist_dir, safe_name)
+        return base + ".npy", base + ".json", base + ".journal.jsonl", base + ".journal.f32"
+
+    def _journal(self, namespace, ns, entry, values=None):
+        """
+        Append one change to a namespace's journal, so a write costs the size of the change.
+
+        Upserted rows go to a raw float32 file and the entry records the byte
+        offset they start at, so rows left behind by an entry that was never
+        written cannot shift the rows of later entries.
+        """
+        if not self.persist_dir:
+            return
+        _, _, journal_path, rows_path = self._paths(namespace)
+        if values is not None:
+            with open(rows_path, "ab") as f:
+                entry["offset"] = f.tell()
+                f.write(np.ascontiguousarray(values, dtype=np.float32).tobytes())
+        with open(journal_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+        ns.journal_entries += len(entry["ids"]) if "ids" in entry else 1
+
+    def _replay(self, ns, journal_path, rows_path):
+        """
+        Apply a journal to a namespace loaded from its snapshot.
+
+        Replay stops at an entry cut short by a crash, and journal_entries is
+        set to -1 so the caller compacts the namespace before writing to it.
+        """
+        rows = b""
+        if os.path.exists(rows_path):
+            with open(rows_path, "rb") as f:
+                rows = f.read()
+        with open(journal_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError: #the last line of a process that was killed mid-write
+                    ns.journal_entries = -1
+                    return
+                if entry["op"] == "upsert":
+                    size = len(entry["ids"]) * self.dimension * 4
+                    values = rows[entry["offset"]:entry["offset"] + size]
+                    if len(values) < size:
+                        ns.journal_entries = -1
+                        return
+                    ns.upsert(entry["ids"], np.frombuffer(values, dtype=np.float32).reshape(-1, self.dimension), entry["metadata"])
+                elif entry["op"] == "delete":
+                    ns.delete(entry["ids"])
+                elif entry["op"] == "update":
+                    row = ns.row_of.get(entry["id"])
+                    if row is not None:
+                        ns.metadata[row] = entry["metadata"]
+                ns.journal_entries += len(entry["ids"]) if "ids" in entry else 1
+
+    def _load(self, namespace):
+        if not self.persist_dir:
+            return None
+        matrix_path, meta_path, journal_path, rows_path = self._paths(namespace)
+        has_snapshot = os.path.exists(matrix_path) and os.path.exists(meta_path)
+        if not has_snapshot and not os.path.exists(journal_path):
+            return None
+        ns = _Namespace(self.dimension)
+        if has_snapshot:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                saved = json.load(f)
+            ns.upsert(saved["ids"], np.load(matrix_path), saved["metadata"])
+        if os.path.exists(journal_path):
+            self._replay(ns, journal_path, rows_path)
+        return ns
+
+    def _remove_persisted(self, namespace):
+        if not self.persist_dir:
+            return
+        for path in self._paths(namespace):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def persist(self, namespace):
+        """
+        Make sure a namespace survives a restart.
+
+        Every change is already in the namespace's journal, so this only
+        rewrites the snapshot once the journal holds more entries than the
+        namespace has vectors (and at least LOCAL_COMPACT_MIN_ENTRIES). Each
+        rewrite is paid for by as many cheap appends, so a bulk load stays
+        linear in its size.
+        """
+        if not self.persist_dir:
+            return False
+        with self._lock:
+            ns = self._namespaces.get(namespace)
+            if ns is None:
+                return False
+            if ns.journal_entries > max(len(ns), LOCAL_COMPACT_MIN_ENTRIES):
+                self.compact(namespace)
+        return True
+
+    def compact(self, namespace):
+        """Write a namespace's snapshot to LOCAL_VECTOR_STORE_DIR and empty its journal."""
+        if not self.persist_dir:
+            return False
+        with self._lock:
+            ns = self._namespaces.get(namespace)
+            if ns is None:
+                return False
+            matrix_path, meta_path, journal_path, rows_path = self._paths(namespace)
+            np.save(matrix_path + ".tmp.npy", ns.matrix[:len(ns)])
+            with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump({"ids": ns.ids, "metadata": ns.metadata}, f)
+            os.replace(matrix_path + ".tmp.npy", matrix_path)
+            os.replace(meta_path + ".tmp", meta_path)
+            for path in (journal_path, rows_path): #replaying it over the new snapshot would give the same state, so a crash here is harmless
+                if os.path.exists(path):
+                    os.remove(path)
+            ns.journal_entries = 0
+        return True
+
+_local_index = None
+_local_index_lock = threading.Lock()
+
+def get_local_index():
+    """Return the process-wide local vector index."""
+    global _local_index
+    if _local_index is None:
+        with _local_index_lock:
+            if _local_index is None:
+                _local_index = LocalVectorIndex()
+    return _local_index
@@ -1,14 +1,17 @@
 import os
 import shutil
-import streamlit as st
+import logging
+from backend.status import report_status
 
+logger = logging.getLogger(__name__)
 MODELS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "models")
 os.makedirs(MODELS_DIR, exist_ok=True)
 
-def ensure_model_exists(model_name):
+def ensure_model_exists(model_name, show_status=True):
     """
     Check if model exists locally, download if not.
     Returns the path to the model.
+    Download messages are logged instead of shown when show_status is False, e.g. from the warm-up thread.
     """
     model_path = os.path.join(MODELS_DIR, model_name)
     
@@ -20,7 +23,7 @@ def ensure_model_exists(model_name):
         check_file = os.path.join(model_path, "config.json")
         
     if not os.path.exists(check_file):
-        st.info(f"Downloading model: {model_name}. This may take a few minutes...")
+        report_status(logger, "info", f"Downloading model: {model_name}. This may take a few minutes...", show_status)
         try:
             if model_name == "tinyllama-1.1b-chat":
                 try:
@@ -42,7 +45,7 @@ def ensure_model_exists(model_name):
                         shutil.rmtree(model_path)
                     shutil.move(temp_path, model_path)
                 except Exception as e:
-                    st.error(f"Error downloading {model_name}: {str(e)}")
+                    report_status(logger, "error", f"Error downloading {model_name}: {str(e)}", show_status)
                     return None
             elif model_name == "all-MiniLM-L6-v2":
                 try:
@@ -50,13 +53,21 @@ def ensure_model_exists(model_name):
                     model = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
                     model.save(model_path)
                 except Exception as e:
-                    st.error(f"Error downloading {model_name}: {str(e)}")
+                    report_status(logger, "error", f"Error downloading {model_name}: {str(e)}", show_status)
+                    return None
+            elif model_name == "ms-marco-MiniLM-L-6-v2":
+                try:
+                    from sentence_transformers import CrossEncoder
+                    model = CrossEncoder("cross-encoder/ms-marco-MiniLM-L-6-v2")
+                    model.save(model_path)
+                except Exception as e:
+                    report_status(logger, "error", f"Error downloading {model_name}: {str(e)}", show_status)
                     return None
             else:
-                st.error(f"Unknown model: {model_name}")
+                report_status(logger, "error", f"Unknown model: {model_name}", show_status)
                 return None
         except Exception as e:
-            st.error(f"Error downloading {model_name}: {str(e)}")
+            report_status(logger, "error", f"Error downloading {model_name}: {str(e)}", show_status)
             return None
-        st.success(f"Model {model_name} downloaded successfully!")
+        report_status(logger, "success", f"Model {model_name} downloaded successfully!", show_status)
     return model_path
\ No newline at end of file
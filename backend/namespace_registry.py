@@ -0,0 +1,193 @@
+import os
+import time
+import logging
+import sqlite3
+import threading
+from contextlib import closing
+from backend.ingestion_cache import CACHE_ROOT
+
+logger = logging.getLogger(__name__)
+REGISTRY_PATH = os.path.join(CACHE_ROOT, "namespaces.db")
+NAMESPACE_TTL = float(os.environ.get("NAMESPACE_TTL", str(24 * 3600))) #seconds a namespace may sit idle before it is deleted
+NAMESPACE_MAX_VECTORS = int(os.environ.get("NAMESPACE_MAX_VECTORS", "50000")) #quota per namespace
+NAMESPACE_MAX_BYTES = int(os.environ.get("NAMESPACE_MAX_BYTES", str(200 * 1024 * 1024))) #quota per namespace, serialized upsert size
+NAMESPACE_REAPER_INTERVAL = float(os.environ.get("NAMESPACE_REAPER_INTERVAL", "600")) #seconds between reaper passes
+_TOUCH_INTERVAL = 60 #last_access is written at most this often per namespace
+
+_last_touch = {}
+_reaper_thread = None
+_reaper_lock = threading.Lock()
+
+class NamespaceQuotaExceeded(ValueError):
+    """Raised when an upsert would push a namespace past its quota."""
+
+def _connect():
+    connection = sqlite3.connect(REGISTRY_PATH, timeout=30) #one short-lived connection per call, safe across threads and processes
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute(
+        """CREATE TABLE IF NOT EXISTS namespaces (
+            name TEXT PRIMARY KEY,
+            created_at REAL NOT NULL,
+            last_access REAL NOT NULL,
+            vector_count INTEGER NOT NULL DEFAULT 0,
+            byte_size INTEGER NOT NULL DEFAULT 0
+        )"""
+    )
+    connection.execute("CREATE TABLE IF NOT EXISTS pinned_namespaces (name TEXT PRIMARY KEY)")
+    return connection
+
+def get_namespace(namespace):
+    """Return the registry record of a namespace as a dict, or None if it is not registered."""
+    with closing(_connect()) as connection:
+        row = connection.execute(
+            "SELECT name, created_at, last_access, vector_count, byte_size FROM namespaces WHERE name = ?",
+            (namespace,)
+        ).fetchone()
+    if row is None:
+        return None
+    return dict(zip(("name", "created_at", "last_access", "vector_count", "byte_size"), row))
+
+def pin_namespace(namespace):
+    """Exempt a namespace from quotas and idle reaping, e.g. a corpus loaded from the command line."""
+    with closing(_connect()) as connection, connection:
+        connection.execute("INSERT OR IGNORE INTO pinned_namespaces (name) VALUES (?)", (namespace,))
+
+def is_pinned(namespace):
+    """Return True if a namespace is exempt from quotas and idle reaping."""
+    with closing(_connect()) as connection:
+        return connection.execute("SELECT 1 FROM pinned_namespaces WHERE name = ?", (namespace,)).fetchone() is not None
+
+def check_quota(namespace, vector_count, byte_size):
+    """
+    Refuse an upsert that would take a namespace past its quota.
+
+    Args:
+        namespace: Pinecone namespace
+        vector_count: Vectors about to be upserted
+        byte_size: Serialized size of those vectors
+
+    Raises:
+        NamespaceQuotaExceeded: If either quota would be exceeded
+    """
+    if is_pinned(namespace):
+        return
+    record = get_namespace(namespace) or {"vector_count": 0, "byte_size": 0}
+    if record["vector_count"] + vector_count > NAMESPACE_MAX_VECTORS:
+        raise NamespaceQuotaExceeded(
+            f"Namespace {namespace} would hold {record['vector_count'] + vector_count} vectors, over the quota of {NAMESPACE_MAX_VECTORS}"
+        )
+    if record["byte_size"] + byte_size > NAMESPACE_MAX_BYTES:
+        raise NamespaceQuotaExceeded(
+            f"Namespace {namespace} would hold {(record['byte_size'] + byte_size) / 1e6:.1f} MB, over the quota of {NAMESPACE_MAX_BYTES / 1e6:.1f} MB"
+        )
+
+def record_upsert(namespace, vector_count, byte_size):
+    """Add upserted vectors to a namespace's totals, registering it on first use."""
+    now = time.time()
+    with closing(_connect()) as connection, connection:
+        connection.execute(
+            """INSERT INTO namespaces (name, created_at, last_access, vector_count, byte_size)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(name) DO UPDATE SET
+                last_access = excluded.last_access,
+                vector_count = vector_count + excluded.vector_count,
+                byte_size = byte_size + excluded.byte_size""",
+            (namespace, now, now, vector_count, byte_size)
+        )
+    _last_touch[namespace] = now
+
+def record_delete(namespace, vector_count):
+    """Subtract deleted vectors from a namespace's totals, estimating their size from the average."""
+    with closing(_connect()) as connection, connection:
+        connection.execute(
+            """UPDATE namespaces SET
+                byte_size = MAX(0, byte_size - CASE WHEN vector_count > 0 THEN byte_size * ? / vector_count ELSE 0 END),
+                vector_count = MAX(0, vector_count - ?)
+            WHERE name = ?""",
+            (vector_count, vector_count, namespace)
+        )
+
+def touch_namespace(namespace):
+    """Mark a namespace as used, e.g. when it is queried."""
+    now = time.time()
+    if now - _last_touch.get(namespace, 0) < _TOUCH_INTERVAL:
+        return
+    _last_touch[namespace] = now
+    with closing(_connect()) as connection, connection:
+        connection.execute("UPDATE namespaces SET last_access = ? WHERE name = ?", (now, namespace))
+
+def unregister_namespace(namespace):
+    """Remove a deleted namespace from the registry."""
+    _last_touch.pop(namespace, None)
+    with closing(_connect()) as connection, connection:
+        connection.execute("DELETE FROM namespaces WHERE name = ?", (namespace,))
+        connection.execute("DELETE FROM pinned_namespaces WHERE name = ?", (namespace,))
+
+def idle_namespaces(ttl=NAMESPACE_TTL):
+    """Return the names of namespaces not used for longer than ttl seconds."""
+    with closing(_connect()) as connection:
+        rows = connection.execute(
+            "SELECT name FROM namespaces WHERE last_access < ? AND name NOT IN (SELECT name FROM pinned_namespaces) ORDER BY last_access",
+            (time.time() - ttl,)
+        ).fetchall()
+    return [row[0] for row in rows]
+
+def sync_vector_counts(namespace_counts):
+    """Replace estimated vector counts with the counts reported by the index."""
+    with closing(_connect()) as connection, connection:
+        for namespace, vector_count in namespace_counts.items():
+            connection.execute(
+                """UPDATE namespaces SET
+                    byte_size = CASE WHEN vector_count > 0 THEN byte_size * ? / vector_count ELSE byte_size END,
+                    vector_count = ?
+                WHERE name = ?""",
+                (vector_count, vector_count, namespace)
+            )
+
+def reap_idle_namespaces(delete_fn, ttl=NAMESPACE_TTL):
+    """
+    Delete every namespace idle for longer than ttl.
+
+    Args:
+        delete_fn: Called with each idle namespace, returns True once it is deleted
+        ttl: Idle time in seconds
+
+    Returns:
+        reaped: Names of the namespaces deleted
+    """
+    reaped = []
+    for namespace in idle_namespaces(ttl):
+        if delete_fn(namespace):
+            unregister_namespace(namespace)
+            reaped.append(namespace)
+            logger.info("Deleted idle namespace %s", namespace)
+    return reaped
+
+def start_namespace_reaper(delete_fn, stats_fn=None, interval=NAMESPACE_REAPER_INTERVAL):
+    """
+    Start the background thread that deletes idle namespaces, once per process.
+
+    Args:
+        delete_fn: Deletes one namespace, e.g. pinecone_storage.delete_namespace with show_status=False
+        stats_fn: Optional, returns {namespace: vector_count} from the index to correct estimates.
+            Both run without a page to draw on and should log instead of calling st.*
+        interval: Seconds between passes
+    """
+    global _reaper_thread
+
+    with _reaper_lock:
+        if _reaper_thread is not None and _reaper_thread.is_alive():
+            return
+
+        def run():
+            while True:
+                try:
+                    if stats_fn:
+                        sync_vector_counts(stats_fn())
+                    reap_idle_namespaces(delete_fn)
+                except Exception:
+                    logger.exception("Namespace reaper pass failed")
+                time.sleep(interval)
+
+        _reaper_thread = threading.Thread(target=run, name="namespace-reaper", daemon=True)
+        _reaper_thread.start()
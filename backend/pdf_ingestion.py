@@ -2,39 +2,198 @@ import streamlit as st
 from PyPDF2 import PdfReader
 import tempfile
 import os
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 
-def extract_text_from_pdf(pdf_path):
+PDF_EXTRACT_WORKERS = int(os.environ.get("PDF_EXTRACT_WORKERS", str(os.cpu_count() or 1))) #processes in the extraction pool, shared by every PDF being ingested
+PARALLEL_EXTRACT_MIN_PAGES = int(os.environ.get("PARALLEL_EXTRACT_MIN_PAGES", "40")) #smaller PDFs are extracted serially
+PDF_EXTRACT_RANGE_PAGES = int(os.environ.get("PDF_EXTRACT_RANGE_PAGES", "16")) #most pages per pool task, so streamed documents get their first pages early
+
+_extract_pool = None
+_extract_pool_lock = threading.Lock()
+
+def read_pdf_metadata(pdf_reader):
+    """Return the PDF's string metadata with the leading / stripped from keys."""
+    metadata = {}               #dictionary to store metadata of the pdf
+    if pdf_reader.metadata:     #if there is metadata in the pdf
+        for key, value in pdf_reader.metadata.items(): #iterating key,value pairs of th metadata
+            if key and value and isinstance(key, str) and isinstance(value, str): #whether key and value exists? and whether they are strings
+                clean_key = key.replace('/', '') if key.startswith('/') else key #if key starts with / then remove it else same key. ex: /Author to Author 
+                metadata[clean_key] = value #adding key,value pair to metadata dictionary
+    return metadata
+
+def count_pdf_pages(pdf_path):
+    """Return the number of pages in a PDF without extracting any text."""
+    return len(PdfReader(pdf_path).pages)
+
+def iter_pdf_pages(pdf_path, workers=None):
     """
-    Extract text from a PDF file.
+    Yield the text of a PDF one page at a time, in page order.
+    
+    Long documents are extracted ahead by the shared process pool, see
+    iter_page_texts, so a streamed document is read in parallel too.
     
     Args:
         pdf_path: Path to the PDF file
+        workers: Max pool tasks in flight for this document, defaults to PDF_EXTRACT_WORKERS
+        
+    Yields:
+        page_number: 1-based page number
+        page_text: Extracted text of that page, skipped when empty
+    """
+    pdf_reader = PdfReader(pdf_path)
+    for page_number, page_text in enumerate(iter_page_texts(pdf_reader, pdf_path, workers), start=1):
+        if page_text:
+            yield page_number, page_text
+
+def _extract_page_range(pdf_path, start, end):
+    """Extract the text of pages [start, end) in a worker process."""
+    pdf_reader = PdfReader(pdf_path) #every worker opens its own reader, readers cannot be pickled
+    return [pdf_reader.pages[i].extract_text() or "" for i in range(start, end)]
+
+def _get_extract_pool():
+    """Return the process-wide extraction pool, starting it on first use."""
+    global _extract_pool
+    
+    with _extract_pool_lock:
+        if _extract_pool is None:
+            _extract_pool = ProcessPoolExecutor(
+                max_workers=max(1, PDF_EXTRACT_WORKERS),
+                mp_context=multiprocessing.get_context("spawn") #forking a multithreaded server can copy held locks into the child
+            )
+        return _extract_pool
+
+def _reset_extract_pool(pool):
+    """Drop a pool that stopped working, e.g. after a worker was killed, so the next call starts a new one."""
+    global _extract_pool
+    
+    with _extract_pool_lock:
+        if _extract_pool is pool:
+            _extract_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def _page_ranges(total_pages, workers):
+    """Split the pages into [start, end) ranges, a few per worker so slow pages do not leave others idle."""
+    range_size = max(1, min(-(-total_pages // (workers * 4)), PDF_EXTRACT_RANGE_PAGES))
+    return [(start, min(start + range_size, total_pages)) for start in range(0, total_pages, range_size)]
+
+def _iter_pool_texts(pdf_path, ranges, workers):
+    """
+    Yield the page texts of each range from the shared pool, in range order.
+    
+    At most `workers` ranges are submitted at a time; the next one is only
+    submitted once the oldest has been handed to the caller.
+    """
+    pool = _get_extract_pool()
+    in_flight = deque()
+    try:
+        for start, end in ranges:
+            in_flight.append(pool.submit(_extract_page_range, pdf_path, start, end))
+            if len(in_flight) >= workers:
+                yield in_flight.popleft().result()
+        while in_flight:
+            yield in_flight.popleft().result()
+    except Exception:
+        _reset_extract_pool(pool)
+        raise
+    finally:
+        for future in in_flight: #the caller stopped early or a range failed
+            future.cancel()
+
+def iter_page_texts(pdf_reader, pdf_path, workers=None):
+    """
+    Yield the text of every page, in page order, empty string for empty pages.
+    
+    Large documents are split into page ranges extracted by the shared
+    process pool, so PDFs ingested at the same time queue for the same
+    PDF_EXTRACT_WORKERS processes and a single document never has more than
+    `workers` ranges in flight. Small ones are extracted serially, and if the
+    pool fails the remaining pages are extracted serially.
+    
+    Args:
+        pdf_reader: Open PdfReader for the file
+        pdf_path: Path to the PDF file, reopened by each worker
+        workers: Max ranges of this document in flight in the pool, defaults to
+            PDF_EXTRACT_WORKERS, 1 extracts serially in this thread
+        
+    Yields:
+        page_text: Text of the next page
+    """
+    total_pages = len(pdf_reader.pages)
+    workers = min(workers or PDF_EXTRACT_WORKERS, PDF_EXTRACT_WORKERS, total_pages)
+    next_page = 0
+    
+    if workers > 1 and total_pages >= PARALLEL_EXTRACT_MIN_PAGES:
+        try:
+            for range_texts in _iter_pool_texts(pdf_path, _page_ranges(total_pages, workers), workers):
+                for page_text in range_texts:
+                    next_page += 1
+                    yield page_text
+        except Exception as e:
+            st.warning(f"Parallel extraction failed, extracting serially: {str(e)}")
+    
+    for page in pdf_reader.pages[next_page:]:
+        yield page.extract_text() or ""
+
+def extract_page_texts(pdf_reader, pdf_path, workers=None):
+    """
+    Extract the text of every page, in page order.
+    
+    Args:
+        pdf_reader: Open PdfReader for the file
+        pdf_path: Path to the PDF file, reopened by each worker
+        workers: Max ranges of this document in flight in the pool, see iter_page_texts
         
     Returns:
-        text: Extracted text
+        page_texts: List with the text of each page, empty string for empty pages
+    """
+    return list(iter_page_texts(pdf_reader, pdf_path, workers))
+
+def extract_pages_from_pdf(pdf_path, workers=None):
+    """
+    Extract the text of each non-empty page of a PDF file.
+    
+    Args:
+        pdf_path: Path to the PDF file
+        workers: Max pool processes busy with this PDF, defaults to PDF_EXTRACT_WORKERS
+        
+    Returns:
+        pages: List of (page_number, page_text), or None on failure
         metadata: PDF metadata
     """
     try:
-        text = "" #string to store all the extracted text from the inputed pdf
         pdf_reader = PdfReader(pdf_path) #object to access the content and metadata of the pdf accessing from pdf path
         
-        metadata = {}               #dictionary to store metadata of the pdf
-        if pdf_reader.metadata:     #if there is metadata in the pdf
-            for key, value in pdf_reader.metadata.items(): #iterating key,value pairs of th metadata
-                if key and value and isinstance(key, str) and isinstance(value, str): #whether key and value exists? and whether they are strings
-                    clean_key = key.replace('/', '') if key.startswith('/') else key #if key starts with / then remove it else same key. ex: /Author to Author 
-                    metadata[clean_key] = value #adding key,value pair to metadata dictionary
+        metadata = read_pdf_metadata(pdf_reader)
+        
+        page_texts = extract_page_texts(pdf_reader, pdf_path, workers) #text of each page, in page order
         
-        for page in pdf_reader.pages: #iterating through pages of the pdf
-            page_text = page.extract_text() #if page=1 extracting text from page 1 and storing it in page_text object
-            if page_text: #if page_text is not empty or not None
-                text += page_text + "\n\n" #adding page_text to main text string and adding 1 new line after each page_text
+        pages = [(page_number, page_text) for page_number, page_text in enumerate(page_texts, start=1) if page_text]
         
-        if not text: #if text is empty-
+        if not pages: #if every page is empty
             st.warning("No text extracted from PDF. The file might be scanned or image-based.")
         
-        return text, metadata
+        return pages, metadata
     
     except Exception as e:
         st.error(f"Error extracting text from PDF: {str(e)}")
-        return None, {}
\ No newline at end of file
+        return None, {}
+
+def extract_text_from_pdf(pdf_path, workers=None):
+    """
+    Extract text from a PDF file.
+    
+    Args:
+        pdf_path: Path to the PDF file
+        workers: Max pool processes busy with this PDF, defaults to PDF_EXTRACT_WORKERS
+        
+    Returns:
+        text: Extracted text, each page followed by a blank line
+        metadata: PDF metadata
+    """
+    pages, metadata = extract_pages_from_pdf(pdf_path, workers)
+    if pages is None:
+        return None, {}
+    return "".join(page_text + "\n\n" for _, page_text in pages), metadata
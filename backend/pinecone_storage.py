@@ -1,59 +1,295 @@
 import streamlit as st
 import uuid
 import time
+import threading
+import json
 import os
+import logging
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import List, Dict, Any, Optional
 from dotenv import load_dotenv
-from pinecone import Pinecone
-from langchain_community.vectorstores import Pinecone as LangchainPinecone
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from backend.model_utils import ensure_model_exists
+from backend.local_vector_store import get_local_index
+from backend.answer_cache import invalidate_namespace
+from backend.lexical_index import add_documents, clear_namespace, remove_documents
+from backend.document_manifest import delete_manifests
+from backend.namespace_registry import check_quota, record_upsert, record_delete, unregister_namespace, NamespaceQuotaExceeded
+from backend.status import report_status
+from backend.chunk_store import CHUNK_STORE_ENABLED, slim_metadata, put_chunks, delete_chunks, delete_namespace_chunks
 
 load_dotenv()
 
-def initialize_pinecone():
-    """Initialize and return Pinecone index."""
+logger = logging.getLogger(__name__)
+
+PINECONE_POOL_THREADS = int(os.environ.get("PINECONE_POOL_THREADS", "8")) #connections kept open to the index host
+
+_pinecone_client = None
+_pinecone_index = None
+_pinecone_lock = threading.Lock()
+
+def _get_pinecone_client(api_key):
+    """Return the process-wide Pinecone client, creating it on first use."""
+    global _pinecone_client
+    
+    if _pinecone_client is None:
+        from pinecone import Pinecone #imported on first connection so pages that never reach the index start faster
+        _pinecone_client = Pinecone(api_key=api_key, pool_threads=PINECONE_POOL_THREADS)
+    return _pinecone_client
+
+def initialize_pinecone(refresh: bool = False, show_status: bool = True):
+    """
+    Return the shared Pinecone index handle.
+    
+    The client, the index existence check and the index handle are created
+    once per process and reused by every session, so later calls cost no
+    network round trip.
+    
+    Args:
+        refresh: Drop the cached client and index and connect again
+        show_status: Show connection messages on the page, otherwise log them
+        
+    Returns:
+        index: Pinecone index, or None if the connection failed
+    """
+    global _pinecone_client, _pinecone_index
+    
+    if _pinecone_index is not None and not refresh: #fast path, already connected
+        return _pinecone_index
+    
     api_key = os.environ.get("PINECONE_API_KEY") #pinecone api key
     index_name = os.environ.get("PINECONE_INDEX", "queryquack") #index name in pinecone here queryquack
     
     if not api_key: #checking if no api key
-        st.error("Pinecone API key not found. Please set the PINECONE_API_KEY in your .env file.")
+        report_status(logger, "error", "Pinecone API key not found. Please set the PINECONE_API_KEY in your .env file.", show_status)
         return None
     
-    try:
-        pc = Pinecone(api_key=api_key) #pc object is Pinecone client with my api_key
-        
-        existing_indexes = pc.list_indexes().names() #existing_indexes contains list of existing index names from pc object 
-        if index_name not in existing_indexes: #if queryquack index is not in existing_indexes1 creating index with name queryquack,embedding dimension=384, metric for similarity search is cosine
-            pc.create_index(
-                name=index_name,
-                dimension=384,
-                metric="cosine"
-            )
-            st.info(f"Created new Pinecone index: {index_name}")
+    with _pinecone_lock: #only one thread connects, the others reuse its handle
+        if refresh:
+            _pinecone_client = None
+            _pinecone_index = None
         
-        index = pc.Index(index_name) #index object for queryquack index
-        st.success("Successfully connected to Pinecone")
-        return index
-    except Exception as e:
-        st.error(f"Failed to connect to Pinecone: {str(e)}")
-        return None
+        if _pinecone_index is not None:
+            return _pinecone_index
+        
+        try:
+            pc = _get_pinecone_client(api_key) #pc object is the shared Pinecone client with my api_key
+            
+            existing_indexes = pc.list_indexes().names() #one time existence check per process
+            if index_name not in existing_indexes: #if queryquack index is not in existing_indexes1 creating index with name queryquack,embedding dimension=384, metric for similarity search is cosine
+                pc.create_index(
+                    name=index_name,
+                    dimension=384,
+                    metric="cosine"
+                )
+                report_status(logger, "info", f"Created new Pinecone index: {index_name}", show_status)
+            
+            _pinecone_index = pc.Index(index_name, pool_threads=PINECONE_POOL_THREADS) #pooled index handle for queryquack index
+            report_status(logger, "success", "Successfully connected to Pinecone", show_status)
+            return _pinecone_index
+        except Exception as e:
+            _pinecone_client = None
+            report_status(logger, "error", f"Failed to connect to Pinecone: {str(e)}", show_status)
+            return None
 
-def store_embeddings(embeddings: List, metadata_list: List[Dict], namespace: str = "default", batch_size: int = 50):
+VECTOR_STORE = os.environ.get("VECTOR_STORE", "pinecone").lower() #"pinecone" or "local"
+
+def get_vector_index(refresh: bool = False, show_status: bool = True):
     """
-    Store embeddings in Pinecone with batching to avoid size limits.
+    Return the configured vector index.
+    
+    Both backends expose the same upsert/query/delete calls, so callers do not
+    need to know which one is in use.
+    
+    Args:
+        refresh: Reconnect to Pinecone (ignored by the local backend)
+        show_status: Show connection messages on the page, otherwise log them
+        
+    Returns:
+        index: Pinecone index or LocalVectorIndex, or None if unavailable
+    """
+    if VECTOR_STORE == "local":
+        return get_local_index()
+    return initialize_pinecone(refresh=refresh, show_status=show_status)
+
+def persist_vector_index(namespace: str):
+    """Write a namespace to disk when the local backend is configured to persist."""
+    if VECTOR_STORE == "local":
+        get_local_index().persist(namespace)
+
+PINECONE_MAX_REQUEST_BYTES = int(os.environ.get("PINECONE_MAX_REQUEST_BYTES", str(1_800_000))) #headroom under the 2MB request limit
+PINECONE_MAX_BATCH_VECTORS = 1000 #pinecone rejects upserts with more vectors than this
+PINECONE_UPSERT_WORKERS = int(os.environ.get("PINECONE_UPSERT_WORKERS", "4")) #batches in flight at once
+PINECONE_UPSERT_RETRIES = 5
+
+class _AdaptiveThrottle:
+    """Shared backoff delay that grows when Pinecone throttles and decays on success."""
+    
+    def __init__(self, initial_delay=0.5, max_delay=30.0):
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.delay = 0.0
+        self.throttled = 0
+        self._lock = threading.Lock()
+    
+    def wait(self):
+        with self._lock:
+            delay = self.delay
+        if delay > 0:
+            time.sleep(delay)
+    
+    def on_throttle(self):
+        with self._lock:
+            self.throttled += 1
+            self.delay = min(self.max_delay, max(self.initial_delay, self.delay * 2))
+    
+    def on_success(self):
+        with self._lock:
+            self.delay = self.delay / 2 if self.delay >= 0.05 else 0.0
+
+def _is_throttled(error):
+    """Check whether an exception is Pinecone telling us to slow down."""
+    status = getattr(error, "status", None) or getattr(error, "status_code", None)
+    if status == 429:
+        return True
+    message = str(error)
+    return "429" in message or "Too Many Requests" in message or "RESOURCE_EXHAUSTED" in message
+
+def _vector_size_bytes(vector):
+    """Approximate the serialized size of one vector in an upsert request."""
+    return len(json.dumps(vector, separators=(",", ":"))) + 1
+
+def _build_upsert_batches(vectors, max_vectors, max_bytes):
+    """
+    Group vectors into batches bounded by vector count and serialized request size.
+    
+    Returns:
+        batches: Lists of vectors
+        total_bytes: Serialized size of all vectors
+    """
+    batches = []
+    batch = []
+    batch_bytes = 0
+    total_bytes = 0
+    for vector in vectors:
+        size = _vector_size_bytes(vector)
+        total_bytes += size
+        if batch and (len(batch) >= max_vectors or batch_bytes + size > max_bytes):
+            batches.append(batch)
+            batch = []
+            batch_bytes = 0
+        batch.append(vector)
+        batch_bytes += size
+    if batch:
+        batches.append(batch)
+    return batches, total_bytes
+
+def _upsert_batch(index, batch, namespace, throttle):
+    """Upsert one batch, backing off and retrying only while the server is throttling."""
+    for attempt in range(PINECONE_UPSERT_RETRIES):
+        throttle.wait()
+        try:
+            index.upsert(vectors=batch, namespace=namespace)
+            throttle.on_success()
+            return len(batch)
+        except Exception as e:
+            if not _is_throttled(e) or attempt == PINECONE_UPSERT_RETRIES - 1:
+                raise
+            throttle.on_throttle()
+    return 0
+
+def build_vectors(embeddings, metadata_list: List[Dict], start_index: int = 0, ids: Optional[List[str]] = None):
+    """
+    Turn embeddings and their metadata into upsert-ready vector dicts.
     
     Args:
         embeddings: List of embedding vectors
         metadata_list: List of metadata dictionaries
+        start_index: Offset added to each chunk_index, for documents stored in parts
+        ids: Vector ids, random ids are generated when not given
+        
+    Returns:
+        vectors: List of dicts with id, values and metadata
+    """
+    vectors = []
+    for j in range(len(metadata_list)):
+        metadata = metadata_list[j].copy()
+        metadata["chunk_index"] = start_index + metadata.get("chunk_index", j) #position of the chunk in its document
+        
+        if hasattr(embeddings[j], "tolist"): #numpy rows need converting to plain floats
+            vector = embeddings[j].tolist()
+        else:
+            vector = list(embeddings[j])
+        
+        vectors.append({
+            "id": ids[j] if ids else str(uuid.uuid4()),
+            "values": vector,
+            "metadata": metadata
+        })
+    return vectors
+
+def upsert_vectors(index, vectors: List[Dict], namespace: str = "default", batch_size: int = PINECONE_MAX_BATCH_VECTORS, throttle=None, on_progress=None):
+    """
+    Upsert vectors in concurrent batches bounded by request size.
+    
+    With the chunk store enabled, chunk text and full metadata are written
+    locally first and the index only receives slim metadata, so far more
+    vectors fit in each request and query responses stay small.
+    
+    Args:
+        index: Vector index from get_vector_index
+        vectors: List of dicts with id, values and metadata
         namespace: Pinecone namespace
-        batch_size: Number of vectors per batch to stay under 2MB limit
+        batch_size: Maximum number of vectors per batch
+        throttle: Shared backoff state, pass one in to keep it across calls
+        on_progress: Called with the number of vectors stored so far, from the calling thread
+        
+    Returns:
+        stored: Number of vectors stored
+        batch_count: Number of upsert requests sent
+    """
+    sent = [{**vector, "metadata": slim_metadata(vector.get("metadata") or {})} for vector in vectors] if CHUNK_STORE_ENABLED else vectors
+    batches, total_bytes = _build_upsert_batches(sent, min(batch_size, PINECONE_MAX_BATCH_VECTORS), PINECONE_MAX_REQUEST_BYTES)
+    check_quota(namespace, len(vectors), total_bytes) #raises NamespaceQuotaExceeded before anything is sent
+    if CHUNK_STORE_ENABLED:
+        put_chunks(namespace, vectors) #text must be readable before its vector can be returned by a query
+    throttle = throttle or _AdaptiveThrottle()
+    stored = 0
+    invalidate_namespace(namespace) #cached answers may no longer reflect the namespace
+    
+    with ThreadPoolExecutor(max_workers=max(1, PINECONE_UPSERT_WORKERS)) as executor: #several batches in flight, progress reported from this thread
+        futures = [executor.submit(_upsert_batch, index, batch, namespace, throttle) for batch in batches]
+        for future in as_completed(futures):
+            stored += future.result()
+            if on_progress:
+                on_progress(stored)
+    
+    add_documents(namespace, vectors) #keep the namespace's lexical index in step with the vectors
+    record_upsert(namespace, stored, total_bytes)
+    return stored, len(batches)
+
+def store_embeddings(embeddings: List, metadata_list: List[Dict], namespace: str = "default", batch_size: int = PINECONE_MAX_BATCH_VECTORS, show_progress: bool = True, ids: Optional[List[str]] = None):
+    """
+    Store embeddings in Pinecone with concurrent, size-bounded batches.
+    
+    Batches are sized by their serialized bytes to stay under the 2MB request
+    limit, several are sent in parallel, and the sender only slows down when
+    Pinecone signals throttling.
+    
+    Args:
+        embeddings: List of embedding vectors
+        metadata_list: List of metadata dictionaries
+        namespace: Pinecone namespace
+        batch_size: Maximum number of vectors per batch
+        show_progress: Draw a progress bar and success message, off when called from worker threads
+        ids: Deterministic vector ids, so storing the same chunks again overwrites instead of duplicating
     
     Returns:
         bool: Success status
+        
+    Raises:
+        NamespaceQuotaExceeded: If the vectors do not fit the namespace quota, so the caller can tell the user why
     """
-    index = initialize_pinecone() #initialize queryquack index
+    index = get_vector_index() #initialize queryquack index
     if not index:   #checking if index exists
         return False
     
@@ -74,108 +310,153 @@ def store_embeddings(embeddings: List, metadata_list: List[Dict], namespace: str
     total_vectors = len(embeddings) if not isinstance(embeddings, np.ndarray) else embeddings.shape[0] #if embeddings are not of numpy array type then total_vectors=len(embeddings) else .shape[0]
     
     try:
-        for i in range(0, total_vectors, batch_size):       #ranging from 0 to total_vectors and batch_size
-            batch_end = min(i + batch_size, total_vectors)  #batch_end is equal to i+batch_size if its minimmum else total_vecors
-            
-            vectors_batch = []              
-            for j in range(i, batch_end):
-                vector_id = str(uuid.uuid4())
-                metadata = metadata_list[j].copy()
-                metadata["chunk_index"] = j
-                
-                if isinstance(embeddings, np.ndarray):
-                    vector = embeddings[j].tolist()
-                else:
-                    vector = embeddings[j]
-                
-                vectors_batch.append({
-                    "id": vector_id,
-                    "values": vector,
-                    "metadata": metadata
-                })
-            
-            index.upsert(vectors=vectors_batch, namespace=namespace)
-            
-            if batch_end < total_vectors:
-                time.sleep(0.5)
-            
-            if i == 0:
-                progress_bar = st.progress(0)
-            progress = min(1.0, batch_end / total_vectors)
-            if 'progress_bar' in locals():
-                progress_bar.progress(progress)
+        vectors = build_vectors(embeddings, metadata_list[:total_vectors], ids=ids)
+        
+        throttle = _AdaptiveThrottle()
+        progress_bar = st.progress(0) if show_progress and total_vectors > PINECONE_MAX_BATCH_VECTORS // 4 else None
+        start_time = time.perf_counter()
         
-        if 'progress_bar' in locals():
+        stored, batch_count = upsert_vectors(
+            index,
+            vectors,
+            namespace=namespace,
+            batch_size=batch_size,
+            throttle=throttle,
+            on_progress=(lambda done: progress_bar.progress(min(1.0, done / total_vectors))) if progress_bar else None
+        )
+        
+        if progress_bar:
             progress_bar.empty()
-            
-        st.success(f"Successfully stored {total_vectors} embeddings in Pinecone")
+        
+        persist_vector_index(namespace)
+        
+        elapsed = max(time.perf_counter() - start_time, 1e-6)
+        if show_progress:
+            st.success(
+                f"Successfully stored {total_vectors} embeddings in {'the local index' if VECTOR_STORE == 'local' else 'Pinecone'} "
+                f"({batch_count} batches, {total_vectors / elapsed:.0f} vectors/s"
+                + (f", throttled {throttle.throttled}x" if throttle.throttled else "") + ")"
+            )
         return True
         
+    except NamespaceQuotaExceeded:
+        if progress_bar:
+            progress_bar.empty()
+        raise
     except Exception as e:
         st.error(f"Error storing embeddings: {str(e)}")
         return False
 
-def get_langchain_retriever(namespace="default"):
+def update_vector_metadata(ids: List[str], metadata_list: List[Dict], namespace: str = "default"):
     """
-    Create a LangChain retriever from Pinecone.
+    Rewrite the metadata of stored vectors without embedding them again.
+    
+    Used for chunks whose text, and so whose id, is unchanged but whose
+    position moved in an edited document. With the chunk store enabled the
+    positions only live there; otherwise every vector is updated in the index.
     
     Args:
+        ids: Vector ids
+        metadata_list: Full metadata of each vector, including text
         namespace: Pinecone namespace
         
     Returns:
-        retriever: LangChain retriever
+        bool: Success status
     """
+    if not ids:
+        return True
+    
+    vectors = [{"id": vector_id, "metadata": metadata} for vector_id, metadata in zip(ids, metadata_list)]
     try:
-        api_key = os.environ.get("PINECONE_API_KEY")
-        index_name = os.environ.get("PINECONE_INDEX", "queryquack")
-        
-        if not api_key:
-            st.error("Pinecone API key not found")
-            return None
-        
-        model_path = ensure_model_exists("all-MiniLM-L6-v2")
-        if not model_path:
-            st.error("Failed to load embedding model")
-            return None
-            
-        embeddings = HuggingFaceEmbeddings(
-            model_name=model_path,
-            model_kwargs={'device': 'cpu'}
-        )
-        
-        pc = Pinecone(api_key=api_key)
-        index = pc.Index(index_name)
-        
-        vectorstore = LangchainPinecone.from_existing_index(
-            index_name=index_name,
-            embedding=embeddings,
-            text_key="text",
-            namespace=namespace,
-            pinecone_kwargs={"api_key": api_key}
-        )
-        
-        retriever = vectorstore.as_retriever(
-            search_kwargs={
-                "k": 8
-            }
-        )
-        
-        return retriever
+        if CHUNK_STORE_ENABLED:
+            put_chunks(namespace, vectors)
+        else:
+            index = get_vector_index()
+            if not index:
+                return False
+            with ThreadPoolExecutor(max_workers=max(1, PINECONE_UPSERT_WORKERS)) as executor: #pinecone updates one vector per request
+                list(executor.map(lambda vector: index.update(id=vector["id"], set_metadata=vector["metadata"], namespace=namespace), vectors))
+        invalidate_namespace(namespace)
+        persist_vector_index(namespace)
+        return True
+    except Exception as e:
+        st.error(f"Error updating chunk metadata: {str(e)}")
+        return False
+
+def delete_vectors(ids: List[str], namespace: str = "default"):
+    """
+    Delete vectors by id, e.g. the stale chunks of an updated document.
+    
+    Args:
+        ids: Vector ids to delete
+        namespace: Pinecone namespace
         
+    Returns:
+        bool: Success status
+    """
+    if not ids:
+        return True
+    
+    index = get_vector_index()
+    if not index:
+        return False
+    
+    try:
+        for i in range(0, len(ids), PINECONE_MAX_BATCH_VECTORS): #pinecone deletes at most 1000 ids per request
+            index.delete(ids=ids[i:i + PINECONE_MAX_BATCH_VECTORS], namespace=namespace)
+        remove_documents(namespace, ids)
+        delete_chunks(namespace, ids)
+        record_delete(namespace, len(ids))
+        invalidate_namespace(namespace)
+        persist_vector_index(namespace)
+        return True
     except Exception as e:
-        st.error(f"Error creating LangChain retriever: {str(e)}")
-        return None
+        st.error(f"Error deleting vectors: {str(e)}")
+        return False
 
-def delete_namespace(namespace: str = "default"):
-    """Delete all vectors in a namespace."""
-    index = initialize_pinecone()
+def delete_namespace(namespace: str = "default", show_status: bool = True):
+    """
+    Delete all vectors in a namespace.
+    
+    Args:
+        namespace: Pinecone namespace
+        show_status: Show success and error messages on the page, off for the background reaper, which logs them
+        
+    Returns:
+        bool: Success status
+    """
+    index = get_vector_index(show_status=show_status)
     if not index:
         return False
     
     try:
-        index.delete(delete_all=True, namespace=namespace)
-        st.success(f"Successfully deleted all vectors in namespace: {namespace}")
+        try:
+            index.delete(delete_all=True, namespace=namespace)
+        except Exception:
+            index = get_vector_index(refresh=True, show_status=show_status) #stale connection, reconnect once and retry
+            if not index:
+                return False
+            index.delete(delete_all=True, namespace=namespace)
+        invalidate_namespace(namespace)
+        clear_namespace(namespace)
+        delete_namespace_chunks(namespace)
+        delete_manifests(namespace)
+        unregister_namespace(namespace)
+        report_status(logger, "success", f"Successfully deleted all vectors in namespace: {namespace}", show_status)
         return True
     except Exception as e:
-        st.error(f"Error deleting namespace: {str(e)}")
-        return False
\ No newline at end of file
+        report_status(logger, "error", f"Error deleting namespace {namespace}: {str(e)}", show_status)
+        return False
+
+def namespace_vector_counts(show_status: bool = True):
+    """Return {namespace: vector_count} as reported by the vector index."""
+    index = get_vector_index(show_status=show_status)
+    if not index:
+        return {}
+    
+    stats = index.describe_index_stats()
+    namespaces = stats["namespaces"] if isinstance(stats, dict) else getattr(stats, "namespaces", {}) or {}
+    counts = {}
+    for name, summary in namespaces.items():
+        counts[name] = summary["vector_count"] if isinstance(summary, dict) else getattr(summary, "vector_count", 0)
+    return counts
@@ -1,16 +1,68 @@
 import streamlit as st
 import re
-from langchain.prompts import PromptTemplate
-from backend.model_utils import ensure_model_exists
+import os
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from backend.embedding_service import get_embedding_model, get_embedding_model_id
+from backend.tracing import span
 
-custom_template = """Given the following conversation and a follow up question, rephrase the follow up question to be a standalone question, in its original language.
-Chat History:
-{chat_history}
-Follow Up Input: {question}
-Standalone question:"""
+QUERY_CACHE_SIZE = int(os.environ.get("QUERY_CACHE_SIZE", "2048")) #query embeddings kept per process
 
-CUSTOM_QUESTION_PROMPT = PromptTemplate.from_template(custom_template)
+_query_embedding_cache = OrderedDict() #(model id, normalized query) -> embedding, oldest first
+_query_cache_lock = threading.Lock()
+_query_cache_stats = {"hits": 0, "misses": 0}
 
+def normalize_query(query):
+    """Normalize a processed query for cache lookups: lower case, single spaces."""
+    return " ".join(query.lower().split())
+
+def get_cached_query_embedding(processed_query, embeddings_model):
+    """
+    Embed a query, reusing the vector of an identical earlier query.
+    
+    The cache is shared by every session in the process and evicts the least
+    recently used entry once it holds QUERY_CACHE_SIZE queries.
+    
+    Args:
+        processed_query: Query text after rewriting
+        embeddings_model: Model used on a cache miss
+        
+    Returns:
+        query_embedding: Query embedding vector
+        hit: Whether the vector came from the cache
+    """
+    key = (get_embedding_model_id(), normalize_query(processed_query))
+    
+    with _query_cache_lock:
+        query_embedding = _query_embedding_cache.get(key)
+        if query_embedding is not None:
+            _query_embedding_cache.move_to_end(key)
+            _query_cache_stats["hits"] += 1
+            return query_embedding, True
+        _query_cache_stats["misses"] += 1
+    
+    query_embedding = embeddings_model.embed_query(processed_query) #encode outside the lock so other queries are not blocked
+    
+    with _query_cache_lock:
+        _query_embedding_cache[key] = query_embedding
+        _query_embedding_cache.move_to_end(key)
+        while len(_query_embedding_cache) > QUERY_CACHE_SIZE:
+            _query_embedding_cache.popitem(last=False)
+    
+    return query_embedding, False
+
+def get_query_cache_stats():
+    """Return process-wide hit/miss counters and size of the query embedding cache."""
+    with _query_cache_lock:
+        return {
+            "hits": _query_cache_stats["hits"],
+            "misses": _query_cache_stats["misses"],
+            "size": len(_query_embedding_cache),
+            "max_size": QUERY_CACHE_SIZE
+        }
+
+@lru_cache(maxsize=QUERY_CACHE_SIZE)
 def rewrite_query(query):
     """Optionally rewrite the query to improve retrieval."""
     query = query.strip()
@@ -48,24 +100,24 @@ def process_query(query, rewrite=True):
         if 'original_query' not in st.session_state:
             st.session_state['original_query'] = original_query
             
-        if rewrite:
-            processed_query = rewrite_query(query)
-        else:
-            processed_query = query
+        with span("rewrite"):
+            if rewrite:
+                processed_query = rewrite_query(query)
+            else:
+                processed_query = query
             
-        model_path = ensure_model_exists("all-MiniLM-L6-v2")
-        if not model_path:
-            st.error("Failed to load embedding model")
+        embeddings_model = get_embedding_model()
+        if not embeddings_model:
             return None, processed_query, original_query
-            
-        from langchain_community.embeddings import HuggingFaceEmbeddings
         
-        embeddings_model = HuggingFaceEmbeddings(
-            model_name=model_path,
-            model_kwargs={'device': 'cpu'}
-        )
+        with span("embed_query") as record:
+            query_embedding, cache_hit = get_cached_query_embedding(processed_query, embeddings_model)
+            record["cache_hit"] = cache_hit
+        
+        if 'debug_info' not in st.session_state:
+            st.session_state['debug_info'] = {}
         
-        query_embedding = embeddings_model.embed_query(processed_query)
+        st.session_state['debug_info']['query_cache'] = dict(get_query_cache_stats(), hit=cache_hit)
         
         return query_embedding, processed_query, original_query
         
@@ -0,0 +1,114 @@
+import os
+import time
+import threading
+import streamlit as st
+from backend.model_utils import ensure_model_exists
+from backend.tracing import span
+
+RERANK_MODEL_NAME = "ms-marco-MiniLM-L-6-v2"
+RERANK_ENABLED = os.environ.get("RERANK_ENABLED", "false").lower() == "true" #optional stage between retrieval and generation
+RERANK_CANDIDATES = int(os.environ.get("RERANK_CANDIDATES", "20")) #chunks fetched from retrieval when reranking
+RERANK_TOP_N = int(os.environ.get("RERANK_TOP_N", "4")) #chunks passed on to generation
+RERANK_BUDGET_MS = float(os.environ.get("RERANK_BUDGET_MS", "300")) #stop scoring once this much time has been spent
+RERANK_BATCH_SIZE = int(os.environ.get("RERANK_BATCH_SIZE", "32")) #most pairs scored per forward pass
+RERANK_PROBE_PAIRS = int(os.environ.get("RERANK_PROBE_PAIRS", "4")) #pairs in the first pass, timed to size the later ones
+
+_reranker = None
+_reranker_lock = threading.Lock()
+
+def get_reranker():
+    """
+    Return the process-wide cross-encoder, loading it on first use.
+
+    Returns:
+        reranker: sentence-transformers CrossEncoder, or None if loading failed
+    """
+    global _reranker
+
+    if _reranker is not None:
+        return _reranker
+
+    with _reranker_lock:
+        if _reranker is None:
+            model_path = ensure_model_exists(RERANK_MODEL_NAME)
+            if not model_path:
+                st.error("Failed to load reranking model")
+                return None
+
+            from sentence_transformers import CrossEncoder
+            _reranker = CrossEncoder(model_path, device="cpu")
+
+    return _reranker
+
+def rerank_chunks(query, chunks, top_n=RERANK_TOP_N, budget_ms=RERANK_BUDGET_MS, batch_size=RERANK_BATCH_SIZE):
+    """
+    Reorder retrieved chunks by cross-encoder relevance to the query.
+
+    A small first pass of RERANK_PROBE_PAIRS candidates measures the cost per
+    pair, and each later pass takes only as many candidates as fit the time
+    left (at most batch_size). Candidates that do not fit the budget keep
+    their retrieval order behind the scored ones.
+
+    Args:
+        query: Processed query text
+        chunks: Retrieved chunks, best first
+        top_n: Number of chunks to return
+        budget_ms: Time budget in milliseconds for scoring
+        batch_size: Most query/chunk pairs per forward pass
+
+    Returns:
+        chunks: Up to top_n chunks, best first, each scored one with a rerank_score
+    """
+    if not chunks:
+        return chunks
+
+    reranker = get_reranker()
+    if not reranker:
+        return chunks[:top_n]
+
+    start_time = time.perf_counter()
+    scored = []
+    position = 0
+    batches = 0
+    try:
+        with span("rerank", candidates=len(chunks)):
+            while position < len(chunks):
+                elapsed_ms = (time.perf_counter() - start_time) * 1000
+                if position == 0:
+                    size = max(1, min(RERANK_PROBE_PAIRS, batch_size))
+                else: #the per-pair cost so far includes each pass's fixed overhead, so this errs on the short side
+                    size = min(batch_size, int((budget_ms - elapsed_ms) / max(elapsed_ms / position, 1e-3)))
+                if size < 1: #the next pair would not finish in time, keep what has been scored
+                    break
+
+                batch = chunks[position:position + size]
+                scores = reranker.predict(
+                    [(query, chunk.get('text', '')) for chunk in batch],
+                    batch_size=len(batch),
+                    show_progress_bar=False
+                )
+                for chunk, score in zip(batch, scores):
+                    chunk['rerank_score'] = float(score)
+                    scored.append(chunk)
+                position += len(batch)
+                batches += 1
+    except Exception as e:
+        st.warning(f"Reranking failed, using retrieval order: {str(e)}")
+        return chunks[:top_n]
+
+    scored.sort(key=lambda chunk: chunk['rerank_score'], reverse=True)
+    reranked = (scored + chunks[position:])[:top_n]
+
+    if 'debug_info' not in st.session_state:
+        st.session_state['debug_info'] = {}
+
+    st.session_state['debug_info']['rerank'] = {
+        'candidates': len(chunks),
+        'scored': len(scored),
+        'batches': batches,
+        'kept': len(reranked),
+        'budget_exceeded': position < len(chunks),
+        'elapsed_ms': round((time.perf_counter() - start_time) * 1000, 1)
+    }
+
+    return reranked
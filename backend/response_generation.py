@@ -1,151 +1,134 @@
 import streamlit as st
 import os
+import time
 from dotenv import load_dotenv
-from langchain.memory import ConversationBufferMemory
-from langchain.chains import ConversationalRetrievalChain
-from langchain_google_genai import ChatGoogleGenerativeAI
-from backend.query_processing import CUSTOM_QUESTION_PROMPT
-from backend.pinecone_storage import get_langchain_retriever
+from backend.answer_cache import lookup_answer, store_answer, get_answer_cache_stats
+from backend.context_builder import build_context
+from backend.tracing import span
 
 load_dotenv()
 
-def create_conversation_chain(namespace="default"):
-    """
-    Create a LangChain conversation chain using Gemini model.
+def _create_answer_llm(api_key):
+    """Create the Gemini chat model used to answer from retrieved chunks."""
+    from langchain_google_genai import ChatGoogleGenerativeAI #the Google client libraries take seconds to import
+    return ChatGoogleGenerativeAI(
+        model="gemini-1.5-flash",
+        google_api_key=api_key,
+        temperature=0.3
+    )
+
+def _record_sources(passages):
+    """Store the (filename, chunk_index) of every chunk packed into the prompt, for the Sources list under the answer."""
+    st.session_state['sources_used'] = [
+        (passage['filename'], chunk_index)
+        for passage in passages if passage['filename'] is not None
+        for chunk_index in passage['chunk_indexes']
+    ]
+
+def build_answer_prompt(query, chunks):
+    """Build the Gemini prompt from the retrieved chunks, or return None if they carry no text."""
+    with span("context_pack"):
+        passages, context_stats = build_context(chunks) #merged, deduplicated and packed to the token budget
     
-    Args:
-        namespace: Pinecone namespace
-        
-    Returns:
-        conversation_chain: LangChain ConversationalRetrievalChain
-    """
-    try:
-        api_key = os.environ.get("GOOGLE_API_KEY")
-        if not api_key:
-            st.error("Google API key not found. Please set the GOOGLE_API_KEY in your .env file.")
-            return None
-        
-        retriever = get_langchain_retriever(namespace)
-        if not retriever:
-            st.error("Failed to create retriever")
-            return None
-        
-        llm = ChatGoogleGenerativeAI(
-            model="gemini-1.5-flash",
-            google_api_key=api_key,
-            temperature=0.2,
-            convert_system_message_to_human=True
-        )
-        
-        memory = ConversationBufferMemory(
-            memory_key='chat_history',
-            return_messages=True,
-            output_key='answer'
-        )
-        
-        conversation_chain = ConversationalRetrievalChain.from_llm(
-            llm=llm,
-            retriever=retriever,
-            condense_question_prompt=CUSTOM_QUESTION_PROMPT,
-            memory=memory,
-            return_source_documents=True
-        )
-        
-        return conversation_chain
-        
-    except Exception as e:
-        st.error(f"Error creating conversation chain: {str(e)}")
+    if 'debug_info' not in st.session_state:
+        st.session_state['debug_info'] = {}
+    st.session_state['debug_info']['context'] = context_stats
+    _record_sources(passages) #only what the model actually sees, not every retrieved candidate
+    
+    context = ""
+    for i, passage in enumerate(passages):
+        context += f"\nDocument Excerpt {i+1}:\n{passage['text']}\n"
+    
+    if not context.strip():
         return None
+    
+    return f"""
+    Based ONLY on the following information from the documents:
+    
+    {context}
+    
+    Provide a comprehensive, well-organized answer to this query: "{query}"
+    
+    Your response should:
+    1. Be well-structured with clear headings if appropriate
+    2. Use bullet points for listing strategies, techniques, or steps
+    3. Directly answer the query using ONLY the information in the provided document excerpts
+    4. NOT include any information not found in the provided excerpts
+    5. Be factual and objective
+    """
 
-def generate_direct_response_with_chunks(query, chunks):
-    """Generate a direct response using retrieved chunks."""
-    try:
-        api_key = os.environ.get("GOOGLE_API_KEY")
-        if not api_key:
-            return "I can't provide information without a valid API key."
-            
-        llm = ChatGoogleGenerativeAI(
-            model="gemini-1.5-flash",
-            google_api_key=api_key,
-            temperature=0.3
-        )
-        
-        context = ""
-        for i, chunk in enumerate(chunks):
-            if i >= 5:  
-                break
-            chunk_text = chunk.get('text', '')
-            if not chunk_text:
-                continue
-            context += f"\nDocument Excerpt {i+1}:\n{chunk_text}\n"
-        
-        if not context.strip():
-            return "I couldn't extract useful content from the retrieved documents."
-        
-        prompt = f"""
-        Based ONLY on the following information from the documents:
-        
-        {context}
-        
-        Provide a comprehensive, well-organized answer to this query: "{query}"
-        
-        Your response should:
-        1. Be well-structured with clear headings if appropriate
-        2. Use bullet points for listing strategies, techniques, or steps
-        3. Directly answer the query using ONLY the information in the provided document excerpts
-        4. NOT include any information not found in the provided excerpts
-        5. Be factual and objective
-        """
-            
-        response = llm.invoke(prompt)
-        return response.content
-        
-    except Exception as e:
-        st.error(f"Error in generate_direct_response_with_chunks: {str(e)}")
-        return f"I encountered an error trying to answer your question: {str(e)}"
-
-def generate_response(query, chunks=None):
+def stream_direct_response_with_chunks(query, chunks, query_embedding=None, namespace=None):
     """
-    Generate a response to the query using LangChain with Gemini.
+    Stream a direct response using retrieved chunks, yielding text as Gemini produces it.
+    
+    Cached answers are yielded in one piece. Time to first token and total
+    generation time are recorded in st.session_state['debug_info']['generation'].
     
     Args:
         query: User query
         chunks: Retrieved text chunks
+        query_embedding: Query embedding, enables the answer cache together with namespace
+        namespace: Pinecone namespace the chunks came from
         
-    Returns:
-        response: Generated response
+    Yields:
+        text: The next piece of the answer
     """
+    if 'debug_info' not in st.session_state:
+        st.session_state['debug_info'] = {}
+    
+    start_time = time.perf_counter()
+    use_cache = query_embedding is not None and namespace is not None
+    
     try:
-        if chunks and len(chunks) > 0:
-            return generate_direct_response_with_chunks(query, chunks)
-        
-        if 'conversation_chain' not in st.session_state:
-            st.session_state.conversation_chain = create_conversation_chain(
-                namespace=st.session_state.namespace
-            )
-        
-        if not st.session_state.conversation_chain:
-            if chunks and len(chunks) > 0:
-                return generate_direct_response_with_chunks(query, chunks)
-            return "Failed to create conversation chain. Please check your Google API key."
+        if use_cache:
+            with span("answer_cache"):
+                cached_answer = lookup_answer(namespace, chunks, query_embedding)
+            st.session_state['debug_info']['answer_cache'] = dict(get_answer_cache_stats(), hit=cached_answer is not None)
+            if cached_answer is not None:
+                _record_sources(build_context(chunks)[0]) #the cached answer was generated from the same chunks
+                st.session_state['debug_info']['generation'] = {
+                    'streamed': False,
+                    'cached': True,
+                    'total_seconds': round(time.perf_counter() - start_time, 4)
+                }
+                yield cached_answer
+                return
         
-        with st.spinner("Generating response with Gemini..."):
-            response = st.session_state.conversation_chain({'question': query})
-            
-        if 'last_response' not in st.session_state:
-            st.session_state.last_response = response
-        
-        answer = response.get('answer', "No answer found")
-        
-        return answer
+        api_key = os.environ.get("GOOGLE_API_KEY")
+        if not api_key:
+            yield "I can't provide information without a valid API key."
+            return
+        
+        prompt = build_answer_prompt(query, chunks)
+        if not prompt:
+            yield "I couldn't extract useful content from the retrieved documents."
+            return
+        
+        parts = []
+        time_to_first_token = None
+        with span("llm", streamed=True) as record:
+            llm_start = time.perf_counter()
+            for piece in _create_answer_llm(api_key).stream(prompt):
+                text = piece.content if hasattr(piece, 'content') else str(piece)
+                if not text:
+                    continue
+                if time_to_first_token is None:
+                    time_to_first_token = time.perf_counter() - start_time
+                    record["first_token_ms"] = round((time.perf_counter() - llm_start) * 1000, 2)
+                parts.append(text)
+                yield text
+        
+        answer = "".join(parts)
+        st.session_state['debug_info']['generation'] = {
+            'streamed': True,
+            'cached': False,
+            'time_to_first_token': round(time_to_first_token, 4) if time_to_first_token is not None else None,
+            'total_seconds': round(time.perf_counter() - start_time, 4)
+        }
+        
+        if use_cache and answer:
+            store_answer(namespace, chunks, query_embedding, answer)
         
     except Exception as e:
-        st.error(f"Error generating response: {str(e)}")
-        if chunks and len(chunks) > 0:
-            try:
-                st.warning("Falling back to direct chunk processing...")
-                return generate_direct_response_with_chunks(query, chunks)
-            except Exception as inner_e:
-                st.error(f"Fallback also failed: {str(inner_e)}")
-        
-        return f"An error occurred: {str(e)}"
\ No newline at end of file
+        st.error(f"Error in stream_direct_response_with_chunks: {str(e)}")
+        yield f"I encountered an error trying to answer your question: {str(e)}"
@@ -1,10 +1,62 @@
 import streamlit as st
+import os
 import numpy as np
-from backend.pinecone_storage import initialize_pinecone
+from backend.pinecone_storage import get_vector_index
+from backend.lexical_index import search as lexical_search, reciprocal_rank_fusion
+from backend.namespace_registry import touch_namespace
+from backend.chunk_store import get_chunks
+from backend.tracing import span
+
+HYBRID_SEARCH = os.environ.get("HYBRID_SEARCH", "true").lower() == "true" #fuse BM25 keyword hits with the vector hits
+HYBRID_CANDIDATES = int(os.environ.get("HYBRID_CANDIDATES", "20")) #candidates taken from each ranking before fusion
+
+def fuse_hybrid_results(dense_chunks, lexical_results, top_k):
+    """
+    Merge vector and keyword results with reciprocal rank fusion.
+    
+    Args:
+        dense_chunks: Chunks from the vector index, best first
+        lexical_results: (id, score, metadata) from the lexical index, best first, metadata None if its text is unknown
+        top_k: Number of chunks to keep
+        
+    Returns:
+        chunks: Fused chunks, best first, each with a fused_score
+    """
+    chunks_by_id = {chunk['id']: chunk for chunk in dense_chunks}
+    for doc_id, lexical_score, metadata in lexical_results:
+        chunk = chunks_by_id.get(doc_id)
+        if chunk is None: #keyword-only hit, e.g. an exact part number the vector missed
+            if not metadata or 'text' not in metadata: #not in the chunk store, nothing to show
+                continue
+            chunk = {
+                'id': doc_id,
+                'text': metadata['text'],
+                'metadata': metadata,
+                'score': None
+            }
+            chunks_by_id[doc_id] = chunk
+        chunk['lexical_score'] = lexical_score
+    
+    fused = reciprocal_rank_fusion([
+        [chunk['id'] for chunk in dense_chunks],
+        [doc_id for doc_id, _, _ in lexical_results]
+    ])
+    
+    chunks = []
+    for doc_id, fused_score in fused:
+        chunk = chunks_by_id.get(doc_id)
+        if chunk is None:
+            continue
+        chunk['fused_score'] = fused_score
+        chunks.append(chunk)
+        if len(chunks) == top_k:
+            break
+    return chunks
 
 def retrieve_chunks(query_embedding, query_text=None, namespace="default", top_k=5):
     """
-    Retrieve relevant chunks using vector similarity search.
+    Retrieve relevant chunks using vector similarity search, fused with
+    BM25 keyword search over the same namespace when query_text is given.
     
     Args:
         query_embedding: Query embedding vector
@@ -16,43 +68,62 @@ def retrieve_chunks(query_embedding, query_text=None, namespace="default", top_k
         chunks: List of relevant text chunks with metadata
     """
     try:
-        index = initialize_pinecone()
+        index = get_vector_index()
         if not index:
-            st.error("Failed to initialize Pinecone for retrieval")
+            st.error("Failed to initialize the vector index for retrieval")
             return []
         
-        search_results = index.query(
-            namespace=namespace,
-            vector=query_embedding,
-            top_k=top_k,
-            include_metadata=True
-        )
+        touch_namespace(namespace) #keeps an active session's namespace away from the reaper
         
-        chunks = []
-        for match in search_results.matches:
-            if not hasattr(match, 'metadata') or not match.metadata:
-                continue
-                
-            metadata = match.metadata
+        with span("lexical_search"):
+            lexical_results = lexical_search(namespace, query_text, HYBRID_CANDIDATES) if HYBRID_SEARCH and query_text else []
+        dense_top_k = max(top_k, HYBRID_CANDIDATES) if lexical_results else top_k
+        
+        with span("vector_query", top_k=dense_top_k) as record:
+            try:
+                search_results = index.query(
+                    namespace=namespace,
+                    vector=query_embedding,
+                    top_k=dense_top_k,
+                    include_metadata=True
+                )
+            except Exception:
+                record["retried"] = True
+                index = get_vector_index(refresh=True) #cached connection went stale, reconnect once and retry
+                if not index:
+                    st.error("Failed to reconnect to the vector index for retrieval")
+                    return []
+                search_results = index.query(
+                    namespace=namespace,
+                    vector=query_embedding,
+                    top_k=dense_top_k,
+                    include_metadata=True
+                )
+        
+        matches = search_results.matches
+        with span("hydrate"):
+            stored = get_chunks(namespace, [match.id for match in matches]) #text lives in the local chunk store, the index only holds slim metadata
+        
+        dense_chunks = []
+        for match in matches:
+            metadata = stored.get(match.id) or getattr(match, 'metadata', None) or {} #vectors stored before the chunk store still carry their text
             
             if 'text' not in metadata:
                 continue
                 
             chunk = {
+                'id': match.id,
                 'text': metadata['text'],
                 'metadata': metadata,
                 'score': match.score
             }
             
-            if 'sources_used' not in st.session_state:
-                st.session_state['sources_used'] = []
-                
-            if 'filename' in metadata and 'chunk_index' in metadata:
-                source_info = (metadata['filename'], metadata['chunk_index'])
-                if source_info not in st.session_state['sources_used']:
-                    st.session_state['sources_used'].append(source_info)
-            
-            chunks.append(chunk)
+            dense_chunks.append(chunk)
+        
+        if lexical_results:
+            chunks = fuse_hybrid_results(dense_chunks, lexical_results, top_k)
+        else:
+            chunks = dense_chunks[:top_k]
         
         if len(chunks) > 0:
             st.success(f"Retrieved {len(chunks)} relevant chunks from document.")
@@ -66,7 +137,10 @@ def retrieve_chunks(query_embedding, query_text=None, namespace="default", top_k
             'query_text': query_text,
             'top_k': top_k,
             'num_results': len(chunks),
-            'namespace': namespace
+            'namespace': namespace,
+            'hybrid': bool(lexical_results),
+            'lexical_hits': len(lexical_results),
+            'lexical_only': sum(1 for chunk in chunks if chunk.get('score') is None)
         }
         
         return chunks
@@ -0,0 +1,22 @@
+import logging
+import streamlit as st
+
+_LOG_LEVELS = {"error": logging.ERROR, "warning": logging.WARNING, "info": logging.INFO, "success": logging.INFO}
+
+def report_status(logger, level, message, show_status=True):
+    """
+    Show a status message on the page, or log it when there is no page to show it on.
+
+    Background threads such as the namespace reaper and the warm-up have no
+    Streamlit script context, so anything they pass to st.* is dropped.
+
+    Args:
+        logger: Logger of the calling module
+        level: "error", "warning", "info" or "success", the st function to call
+        message: Text to show or log
+        show_status: Show the message on the page, otherwise log it
+    """
+    if show_status:
+        getattr(st, level)(message)
+    else:
+        logger.log(_LOG_LEVELS[level], message)
@@ -1,8 +1,226 @@
+import os
+import re
+import threading
 import streamlit as st
-from langchain.text_splitter import CharacterTextSplitter
-from langchain_community.embeddings import HuggingFaceEmbeddings
+from backend.embedding_service import EMBEDDING_MODEL_NAME, get_embedding_model
 from backend.model_utils import ensure_model_exists
 
+CHUNK_TOKENS = int(os.environ.get("CHUNK_TOKENS", "256")) #MiniLM truncates inputs after 256 tokens, [CLS] and [SEP] included
+CHUNK_OVERLAP_TOKENS = int(os.environ.get("CHUNK_OVERLAP_TOKENS", "32")) #tokens repeated between chunks split mid-paragraph
+_CONTENT_TOKENS = max(1, CHUNK_TOKENS - 2) #room left for text after the special tokens
+
+_SEGMENT_PATTERN = re.compile(r"\S.*?(?:[.!?][\"')\]]*(?=\s)|(?=\n[ \t]*\n)|\Z)", re.S) #a sentence, or a run of text up to a blank line
+_FALLBACK_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+_tokenizer = None
+_tokenizer_lock = threading.Lock()
+
+def get_tokenizer():
+    """
+    Return the embedding model's fast tokenizer, loading it on first use.
+
+    Returns:
+        tokenizer: Hugging Face fast tokenizer, or None if it could not be
+            loaded, in which case chunk sizes are estimated from words
+    """
+    global _tokenizer
+
+    if _tokenizer is not None:
+        return _tokenizer or None
+
+    with _tokenizer_lock:
+        if _tokenizer is None:
+            try:
+                from transformers import AutoTokenizer
+                model_path = ensure_model_exists(EMBEDDING_MODEL_NAME)
+                tokenizer = AutoTokenizer.from_pretrained(model_path, use_fast=True) if model_path else None
+                _tokenizer = tokenizer if tokenizer is not None and tokenizer.is_fast else False #offsets need a fast tokenizer
+            except Exception as e:
+                st.warning(f"Embedding tokenizer unavailable, estimating chunk sizes from words: {str(e)}")
+                _tokenizer = False
+
+    return _tokenizer or None
+
+def _token_spans(texts):
+    """Return the character span of every model token in each text."""
+    tokenizer = get_tokenizer()
+    if tokenizer is None:
+        return [[match.span() for match in _FALLBACK_TOKEN_PATTERN.finditer(text)] for text in texts]
+    encoded = tokenizer(texts, add_special_tokens=False, return_offsets_mapping=True, verbose=False)
+    return [list(spans) for spans in encoded["offset_mapping"]]
+
+def count_tokens(texts):
+    """Return the number of model tokens in each text, [CLS] and [SEP] included."""
+    return [len(spans) + 2 for spans in _token_spans(texts)]
+
+def _page_segments(page_number, page_text, offset, pending):
+    """
+    Split one page into sentence segments carrying their position and token count.
+
+    Segments longer than a chunk are cut at token boundaries into pieces of
+    CHUNK_OVERLAP_TOKENS, so the packer can still fill and overlap chunks.
+
+    Args:
+        page_number: Page the text came from, or None
+        page_text: Text of the page
+        offset: Position of the page in the whole document text
+        pending: Whitespace between the previous segment and this page
+
+    Returns:
+        segments: List of dicts with text, leading, start, end, page, tokens and paragraph
+        pending: Whitespace left after the last segment
+    """
+    matches = list(_SEGMENT_PATTERN.finditer(page_text))
+    spans_per_match = _token_spans([match.group() for match in matches]) if matches else []
+    piece_tokens = CHUNK_OVERLAP_TOKENS if 0 < CHUNK_OVERLAP_TOKENS < _CONTENT_TOKENS else _CONTENT_TOKENS
+
+    segments = []
+    previous_end = 0
+    for match, spans in zip(matches, spans_per_match):
+        leading = pending + page_text[previous_end:match.start()]
+        pending = ""
+        previous_end = match.end()
+        paragraph = leading.count("\n") >= 2 #blank line or page break before the segment
+        if len(spans) <= _CONTENT_TOKENS:
+            segments.append({
+                "text": match.group(),
+                "leading": leading,
+                "start": offset + match.start(),
+                "end": offset + match.end(),
+                "page": page_number,
+                "tokens": len(spans),
+                "paragraph": paragraph
+            })
+            continue
+
+        piece_start = 0
+        for i in range(0, len(spans), piece_tokens):
+            last = i + piece_tokens >= len(spans)
+            piece_end = len(match.group()) if last else spans[i + piece_tokens - 1][1]
+            segments.append({
+                "text": match.group()[piece_start:piece_end],
+                "leading": leading,
+                "start": offset + match.start() + piece_start,
+                "end": offset + match.start() + piece_end,
+                "page": page_number,
+                "tokens": min(piece_tokens, len(spans) - i),
+                "paragraph": paragraph
+            })
+            next_start = piece_end if last else spans[i + piece_tokens][0]
+            leading = match.group()[piece_end:next_start] #empty when a word is cut between word pieces
+            paragraph = False
+            piece_start = next_start
+
+    return segments, pending + page_text[previous_end:]
+
+def _chunk_from(segments):
+    text = segments[0]["text"] + "".join(segment["leading"] + segment["text"] for segment in segments[1:])
+    offsets = {
+        "page": segments[0]["page"],
+        "page_end": segments[-1]["page"],
+        "char_start": segments[0]["start"],
+        "char_end": segments[-1]["end"]
+    }
+    return text, offsets
+
+def split_pages(pages):
+    """
+    Split pages of text into chunks sized in embedding model tokens.
+
+    Works in a single pass: pages are cut into sentences, each sentence is
+    tokenized once, and sentences are packed greedily into chunks of at most
+    CHUNK_TOKENS. A chunk ends early at a paragraph or page break once it is
+    half full; chunks cut mid-paragraph repeat up to CHUNK_OVERLAP_TOKENS of
+    trailing sentences. Chunks are yielded as soon as they are complete, so
+    pages can be streamed.
+
+    Character offsets refer to the document text with every non-empty page
+    followed by a blank line, as built by extract_text_from_pdf.
+
+    Args:
+        pages: Iterable of (page_number, page_text), page_number may be None
+
+    Yields:
+        chunk: Chunk text
+        offsets: Dict with page, page_end, char_start and char_end
+    """
+    current = []
+    current_tokens = 0
+    offset = 0
+    pending = ""
+
+    for page_number, page_text in pages:
+        if not page_text:
+            continue
+        segments, pending = _page_segments(page_number, page_text, offset, pending)
+        offset += len(page_text) + 2
+        pending += "\n\n"
+
+        for segment in segments:
+            at_break = segment["paragraph"] and current_tokens >= _CONTENT_TOKENS // 2
+            if current and (at_break or current_tokens + segment["tokens"] > _CONTENT_TOKENS):
+                yield _chunk_from(current)
+                overlap = []
+                overlap_tokens = 0
+                if not at_break: #a chunk that ends at a paragraph break needs no overlap
+                    for previous in reversed(current):
+                        if overlap_tokens + previous["tokens"] > CHUNK_OVERLAP_TOKENS or \
+                                overlap_tokens + previous["tokens"] + segment["tokens"] > _CONTENT_TOKENS:
+                            break
+                        overlap.insert(0, previous)
+                        overlap_tokens += previous["tokens"]
+                current = overlap
+                current_tokens = overlap_tokens
+            current.append(segment)
+            current_tokens += segment["tokens"]
+
+    if current:
+        yield _chunk_from(current)
+
+def build_chunk_metadata(chunks, metadata=None, offsets=None):
+    """
+    Build the per-chunk metadata stored alongside each vector.
+    
+    Args:
+        chunks: Text chunks
+        metadata: Document metadata copied onto every chunk
+        offsets: Optional page and character offsets of each chunk, from split_pages
+        
+    Returns:
+        chunk_metadata: Metadata for each chunk
+    """
+    chunk_metadata = []
+    for i, chunk in enumerate(chunks): #iterating through chunks using i,chunk pairs in chunks
+        chunk_meta = {                  #chunk_meta dictionary which stores chunk with index
+            "text": chunk,
+            "chunk_index": i
+        }
+        
+        if metadata and isinstance(metadata, dict): #checking if metadata is there and its dictionary
+            for key, value in metadata.items(): #iterating through key,value pairs of metadata
+                if key != "text" and key != "chunk_index": #checking if key is not text and not chunk_index
+                    chunk_meta[key] = value                 #adding key,value pair to chunk_meta
+        
+        if offsets and i < len(offsets) and offsets[i]:
+            for key, value in offsets[i].items():
+                if value is not None: #pinecone metadata cannot hold nulls
+                    chunk_meta[key] = value
+        
+        chunk_metadata.append(chunk_meta) #adding chunk_meta to chunk_metadata list
+    return chunk_metadata
+
+def split_text(text):
+    """
+    Split text into overlapping chunks of at most CHUNK_TOKENS model tokens.
+    
+    Args:
+        text: Text to split
+        
+    Returns:
+        chunks: Text chunks
+    """
+    return [chunk for chunk, _ in split_pages([(None, text)])]
+
 def chunk_and_embed(text, metadata=None):
     """
     Split text into chunks and create embeddings using LangChain.
@@ -21,44 +239,21 @@ def chunk_and_embed(text, metadata=None):
         return [], [], []
     
     try:
-        text_splitter = CharacterTextSplitter(
-            separator="\n", #split text on newline character
-            chunk_size=1000,  #one text chunk contains 1000 characters
-            chunk_overlap=200, #200 character overlaps between adjacent chunks
-            length_function=len #to calculate length of text
-        )
-        
-        chunks = text_splitter.split_text(text) #creating chunks based on text_splitter parameters
+        split = list(split_pages([(None, text)]))
+        chunks = [chunk for chunk, _ in split]
         
         if not chunks: #checking if chunks are empty
             st.warning("No chunks created")
             return [], [], []
         
-        model_path = ensure_model_exists("all-MiniLM-L6-v2") #ensure_model_exists function from model_utils.py where this embedding model gets downloaded
-        if not model_path: #if this model is not there then error is shown
-            st.error("Failed to load embedding model")
+        embeddings_model = get_embedding_model() #shared embedding model from embedding_service.py, loaded once per process
+        if not embeddings_model: #if this model is not there then error is shown
             return chunks, [], []
         
-        embeddings_model = HuggingFaceEmbeddings( #embedding model
-            model_name=model_path, #model
-            model_kwargs={'device': 'cpu'} #runs on cpu for me
-        )
-        
-        chunk_metadata = []
-        for i, chunk in enumerate(chunks): #iterating through chunks using i,chunk pairs in chunks
-            chunk_meta = {                  #chunk_meta dictionary which stores chunk with index
-                "text": chunk,
-                "chunk_index": i
-            }
-            
-            if metadata and isinstance(metadata, dict): #checking if metadata is there and its dictionary
-                for key, value in metadata.items(): #iterating through key,value pairs of metadata
-                    if key != "text" and key != "chunk_index": #checking if key is not text and not chunk_index
-                        chunk_meta[key] = value                 #adding key,value pair to chunk_meta
-            
-            chunk_metadata.append(chunk_meta) #adding chunk_meta to chunk_metadata list
+        chunk_metadata = build_chunk_metadata(chunks, metadata, [offsets for _, offsets in split])
         
-        raw_embeddings = embeddings_model.embed_documents(chunks) #creating embddings for each chunk using embed_documents function of embeddings_model
+        from backend.embedding_batching import embed_chunks #imports this module, so not at the top
+        raw_embeddings, _ = embed_chunks(embeddings_model, chunks) #embeds chunks of similar length together, returned in chunk order
         
         return chunks, raw_embeddings, chunk_metadata
         
@@ -0,0 +1,209 @@
+import os
+import time
+import uuid
+import bisect
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "0")) #serve /metrics on this port, 0 disables the endpoint
+METRICS_HOST = os.environ.get("METRICS_HOST", "127.0.0.1") #local only unless opened up on purpose
+METRICS_FILE = os.environ.get("METRICS_FILE") #optional path the metrics are also written to
+METRICS_FILE_INTERVAL = float(os.environ.get("METRICS_FILE_INTERVAL", "15")) #seconds between file writes
+HISTOGRAM_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0) #upper bounds in seconds
+
+logger = logging.getLogger(__name__)
+_current_trace = contextvars.ContextVar("queryquack_trace", default=None)
+_span_depth = contextvars.ContextVar("queryquack_span_depth", default=0) #per context, so worker threads sharing a trace do not nest under each other
+_histograms = {} #(metric, label value) -> {"buckets": [...], "sum": float, "count": int}
+_histograms_lock = threading.Lock()
+_exporter_started = False
+_exporter_lock = threading.Lock()
+
+class Trace:
+    """Spans recorded for one request, e.g. one question or one ingested file."""
+
+    def __init__(self, kind, request_id=None):
+        self.kind = kind
+        self.request_id = request_id or uuid.uuid4().hex[:12]
+        self.spans = []
+        self.start = time.perf_counter()
+        self.seconds = None
+
+    def to_dict(self):
+        """Return the trace with its spans in start order, times in milliseconds."""
+        return {
+            "request_id": self.request_id,
+            "kind": self.kind,
+            "total_ms": round((self.seconds if self.seconds is not None else time.perf_counter() - self.start) * 1000, 2),
+            "spans": sorted(self.spans, key=lambda record: record["start_ms"])
+        }
+
+def _observe(metric, label, seconds):
+    with _histograms_lock:
+        histogram = _histograms.get((metric, label))
+        if histogram is None:
+            histogram = _histograms[(metric, label)] = {"buckets": [0] * len(HISTOGRAM_BUCKETS), "sum": 0.0, "count": 0}
+        position = bisect.bisect_left(HISTOGRAM_BUCKETS, seconds)
+        if position < len(HISTOGRAM_BUCKETS):
+            histogram["buckets"][position] += 1 #cumulated when rendered
+        histogram["sum"] += seconds
+        histogram["count"] += 1
+
+def current_trace():
+    """Return the trace of the request being handled on this thread, or None."""
+    return _current_trace.get()
+
+@contextmanager
+def start_trace(kind, request_id=None):
+    """
+    Record the spans of one request.
+
+    Args:
+        kind: Request type, e.g. "query" or "ingest"
+        request_id: Id to attach the spans to, a new one is generated if omitted
+
+    Yields:
+        trace: The Trace collecting the spans
+    """
+    trace = Trace(kind, request_id)
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+        trace.seconds = time.perf_counter() - trace.start
+        _observe("queryquack_request_duration_seconds", kind, trace.seconds)
+
+@contextmanager
+def span(name, **attributes):
+    """
+    Time one stage of a request.
+
+    The duration always feeds the stage's histogram; it is also added to the
+    current trace when there is one. Attributes can be added to the yielded
+    dict while the stage runs.
+
+    Args:
+        name: Stage name, e.g. "embed_query" or "vector_query"
+        attributes: Extra values shown with the span
+
+    Yields:
+        record: Dict of the span's attributes
+    """
+    trace = _current_trace.get()
+    start = time.perf_counter()
+    record = dict(attributes)
+    depth = _span_depth.get()
+    token = _span_depth.set(depth + 1)
+    try:
+        yield record
+    finally:
+        _span_depth.reset(token)
+        seconds = time.perf_counter() - start
+        _observe("queryquack_stage_duration_seconds", name, seconds)
+        if trace is not None:
+            trace.spans.append(dict(
+                record,
+                name=name,
+                depth=depth,
+                start_ms=round((start - trace.start) * 1000, 2),
+                duration_ms=round(seconds * 1000, 2)
+            ))
+
+def get_stage_stats():
+    """Return {stage: {count, total_seconds, mean_ms}} aggregated over every recorded span."""
+    with _histograms_lock:
+        return {
+            label: {
+                "count": histogram["count"],
+                "total_seconds": round(histogram["sum"], 4),
+                "mean_ms": round(histogram["sum"] * 1000 / histogram["count"], 2) if histogram["count"] else None
+            }
+            for (metric, label), histogram in sorted(_histograms.items())
+            if metric == "queryquack_stage_duration_seconds"
+        }
+
+def render_prometheus():
+    """Return every histogram in the Prometheus text exposition format."""
+    label_names = {"queryquack_request_duration_seconds": "kind", "queryquack_stage_duration_seconds": "stage"}
+    help_texts = {
+        "queryquack_request_duration_seconds": "Time spent handling one request.",
+        "queryquack_stage_duration_seconds": "Time spent in one stage of the query or ingestion pipeline."
+    }
+    with _histograms_lock:
+        snapshot = {key: {"buckets": list(value["buckets"]), "sum": value["sum"], "count": value["count"]} for key, value in _histograms.items()}
+
+    lines = []
+    for metric in sorted(label_names):
+        lines.append(f"# HELP {metric} {help_texts[metric]}")
+        lines.append(f"# TYPE {metric} histogram")
+        for (name, label), histogram in sorted(item for item in snapshot.items() if item[0][0] == metric):
+            label = label.replace("\\", "\\\\").replace('"', '\\"')
+            cumulative = 0
+            for bound, count in zip(HISTOGRAM_BUCKETS, histogram["buckets"]):
+                cumulative += count
+                lines.append(f'{metric}_bucket{{{label_names[metric]}="{label}",le="{bound}"}} {cumulative}')
+            lines.append(f'{metric}_bucket{{{label_names[metric]}="{label}",le="+Inf"}} {histogram["count"]}')
+            lines.append(f'{metric}_sum{{{label_names[metric]}="{label}"}} {histogram["sum"]:.6f}')
+            lines.append(f'{metric}_count{{{label_names[metric]}="{label}"}} {histogram["count"]}')
+    return "\n".join(lines) + "\n"
+
+def write_metrics_file(path=None):
+    """Write the metrics to a file, replacing it atomically so scrapers never read half of it."""
+    path = path or METRICS_FILE
+    if not path:
+        return False
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        f.write(render_prometheus())
+    os.replace(path + ".tmp", path)
+    return True
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass #scrapes every few seconds would flood the server log
+
+def start_metrics_exporter(port=METRICS_PORT, path=METRICS_FILE):
+    """
+    Start exporting metrics, once per process.
+
+    Serves /metrics on METRICS_HOST:port when port is set, and rewrites path
+    every METRICS_FILE_INTERVAL seconds when a path is set.
+    """
+    global _exporter_started
+
+    with _exporter_lock:
+        if _exporter_started:
+            return
+        _exporter_started = True
+
+        if port:
+            try:
+                server = ThreadingHTTPServer((METRICS_HOST, port), _MetricsHandler)
+                threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+            except OSError as e: #another process, e.g. a second app server, already serves the port
+                logger.warning("Metrics endpoint not started on port %s: %s", port, e)
+
+        if path:
+            def run():
+                while True:
+                    time.sleep(METRICS_FILE_INTERVAL)
+                    try:
+                        write_metrics_file(path)
+                    except OSError as e:
+                        logger.warning("Writing metrics file %s failed: %s", path, e)
+
+            threading.Thread(target=run, name="metrics-file", daemon=True).start()
@@ -0,0 +1,73 @@
+import os
+import time
+import logging
+import importlib
+import threading
+
+WARM_UP_ENABLED = os.environ.get("WARM_UP_ENABLED", "true").lower() == "true" #load heavy libraries and the model in the background
+WARM_UP_DELAY = float(os.environ.get("WARM_UP_DELAY", "1.0")) #seconds to wait after the landing page is sent before starting
+WARM_UP_MODULES = ( #imported in this order, the slowest first so a visitor who clicks through early waits least
+    "sentence_transformers",
+    "langchain_google_genai",
+    "pinecone",
+    "backend.ingestion_pipeline",
+    "backend.response_generation"
+)
+
+logger = logging.getLogger(__name__)
+_warm_up_thread = None
+_warm_up_lock = threading.Lock()
+_warm_up_status = {"state": "idle", "imports": {}, "model_seconds": None, "seconds": None}
+
+def get_warm_up_status():
+    """Return {state, imports: {module: seconds}, model_seconds, seconds} of the background warm-up."""
+    with _warm_up_lock:
+        return dict(_warm_up_status, imports=dict(_warm_up_status["imports"]))
+
+def _run_warm_up(delay):
+    time.sleep(delay) #let the first page reach the browser before competing with it for the CPU
+    start = time.perf_counter()
+    with _warm_up_lock:
+        _warm_up_status["state"] = "running"
+
+    for module in WARM_UP_MODULES:
+        module_start = time.perf_counter()
+        try:
+            importlib.import_module(module)
+        except Exception as e: #an optional dependency, imported again and reported where it is used
+            logger.warning("Warm-up import of %s failed: %s", module, e)
+            continue
+        with _warm_up_lock:
+            _warm_up_status["imports"][module] = round(time.perf_counter() - module_start, 3)
+
+    from backend.embedding_service import warm_up_embedding_model
+    model_start = time.perf_counter()
+    warmed = warm_up_embedding_model(show_status=False) #no script context on this thread, errors are logged
+
+    with _warm_up_lock:
+        _warm_up_status["model_seconds"] = round(time.perf_counter() - model_start, 3)
+        _warm_up_status["seconds"] = round(time.perf_counter() - start, 3)
+        _warm_up_status["state"] = "done" if warmed else "failed"
+    if not warmed: #the page only learns of it when the first query loads the model again
+        logger.warning("Embedding model warm-up failed")
+
+def start_background_warm_up(delay=WARM_UP_DELAY):
+    """
+    Import the heavy dependencies and load the embedding model on a background thread, once per process.
+
+    Args:
+        delay: Seconds to wait before starting, so the page that triggered it paints first
+
+    Returns:
+        started: True if the warm-up is running or finished, False if disabled
+    """
+    global _warm_up_thread
+
+    if not WARM_UP_ENABLED:
+        return False
+
+    with _warm_up_lock:
+        if _warm_up_thread is None:
+            _warm_up_thread = threading.Thread(target=_run_warm_up, args=(delay,), name="warm-up", daemon=True)
+            _warm_up_thread.start()
+    return True
@@ -0,0 +1,110 @@
+import random
+
+CORPUS_SIZES = { #name -> (documents, pages per document)
+    "small": (8, 4),
+    "medium": (8, 40),
+    "large": (3, 160) #long enough to take the streaming ingestion path
+}
+LINES_PER_PAGE = 48
+CHARS_PER_LINE = 90
+
+_WORDS = (
+    "pump valve pressure sensor calibration torque bearing housing seal gasket flow rate "
+    "temperature controller firmware module interface voltage current relay fuse circuit "
+    "inspection maintenance schedule procedure warranty operator safety hazard clearance "
+    "installation bracket mounting bolt thread lubricant filter cartridge reservoir outlet "
+    "inlet alarm threshold diagnostic fault code reset manual override shutdown startup "
+    "the a of to and in for with on by from is are be this that each every should must"
+).split()
+
+def _sentence(rng):
+    words = [rng.choice(_WORDS) for _ in range(rng.randint(6, 22))]
+    if rng.random() < 0.15:
+        words.insert(rng.randrange(len(words)), f"PN-{rng.randint(1000, 9999)}") #part numbers give keyword search something to find
+    return " ".join(words).capitalize() + "."
+
+def _page_lines(rng):
+    lines = []
+    while len(lines) < LINES_PER_PAGE:
+        paragraph = " ".join(_sentence(rng) for _ in range(rng.randint(2, 7)))
+        line = ""
+        for word in paragraph.split():
+            if len(line) + len(word) + 1 > CHARS_PER_LINE:
+                lines.append(line)
+                line = word
+            else:
+                line = f"{line} {word}" if line else word
+        lines.extend([line, ""]) #blank line between paragraphs
+    return lines[:LINES_PER_PAGE]
+
+def make_pdf(pages, seed=0):
+    """
+    Build a text-only PDF with the given number of pages.
+
+    Args:
+        pages: Number of pages
+        seed: Seed for the generated text, the same seed gives the same bytes
+
+    Returns:
+        pdf_bytes: Contents of the PDF
+    """
+    rng = random.Random(seed)
+    objects = [None, None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"] #catalog and page tree are filled in below
+    page_ids = []
+    for _ in range(pages):
+        text = "".join(f"({line}) Tj T* " for line in _page_lines(rng)) #generated text has no parentheses or backslashes to escape
+        stream = f"BT /F1 10 Tf 13 TL 50 760 Td {text}ET".encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id
+        )
+        page_ids.append(len(objects))
+    objects[0] = b"<< /Type /Catalog /Pages 2 0 R >>"
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(b"%d 0 R" % i for i in page_ids), len(page_ids))
+
+    pdf = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(pdf))
+        pdf += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref_offset = len(pdf)
+    pdf += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    pdf += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    pdf += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_offset)
+    return bytes(pdf)
+
+def make_corpus(size, seed=0):
+    """
+    Build a synthetic corpus.
+
+    Args:
+        size: Key of CORPUS_SIZES
+        seed: Base seed, documents get consecutive seeds
+
+    Returns:
+        files: List of (filename, pdf_bytes)
+        pages: Total number of pages
+    """
+    documents, pages = CORPUS_SIZES[size]
+    files = [(f"{size}-{i:03d}.pdf", make_pdf(pages, seed=seed + i)) for i in range(documents)]
+    return files, documents * pages
+
+def make_queries(count, seed=0):
+    """Return questions built from the corpus vocabulary."""
+    rng = random.Random(seed)
+    templates = (
+        "What does the manual say about {} {}?",
+        "How do I check the {} {} before {}?",
+        "Explain the {} procedure for the {} {}",
+        "Which {} is used with part {}?"
+    )
+    queries = []
+    for _ in range(count):
+        template = rng.choice(templates)
+        words = [rng.choice(_WORDS[:60]) for _ in range(template.count("{}"))]
+        if "part" in template:
+            words[-1] = f"PN-{rng.randint(1000, 9999)}"
+        queries.append(template.format(*words))
+    return queries
@@ -0,0 +1,144 @@
+"""
+Check an embedding backend against the fp32 model on a reference set.
+
+    python -m benchmarks.embedding_accuracy --backend int8 --threads 4
+
+Chunks of a synthetic corpus and generated questions are embedded with both
+models. The check fails when the vectors drift too far from fp32 or when the
+nearest chunks of the questions change too much, and reports the speedup.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+def reference_set(size, queries, seed=0):
+    """
+    Build the reference chunks and questions.
+
+    Returns:
+        chunks: List of chunk texts, split the way ingestion splits them
+        questions: List of questions
+    """
+    from benchmarks.corpus import make_corpus, make_queries
+    from backend.pdf_ingestion import extract_pages_from_pdf
+    from backend.text_chunking import split_pages
+
+    files, _ = make_corpus(size, seed=seed)
+    chunks = []
+    for _, pdf_bytes in files:
+        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
+            tmp.write(pdf_bytes)
+        try:
+            pages, _ = extract_pages_from_pdf(tmp.name, workers=1)
+        finally:
+            os.remove(tmp.name)
+        chunks.extend(chunk for chunk, _ in split_pages(pages))
+    return chunks, make_queries(queries, seed=seed)
+
+def encode(embeddings_model, chunks, questions):
+    """Embed the reference set, returning the vectors and the time taken."""
+    import numpy as np
+
+    embeddings_model.embed_query("warm up") #first call pays for lazy initialization
+    start = time.perf_counter()
+    documents = np.asarray(embeddings_model.embed_documents(chunks), dtype=np.float32)
+    documents_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    queries = np.asarray([embeddings_model.embed_query(question) for question in questions], dtype=np.float32)
+    queries_seconds = time.perf_counter() - start
+    return documents, queries, {
+        "chunks_per_second": round(len(chunks) / max(documents_seconds, 1e-9), 1),
+        "query_ms": round(queries_seconds * 1000 / max(len(questions), 1), 2)
+    }
+
+def compare(reference, candidate, reference_queries, candidate_queries, top_k):
+    """
+    Compare candidate vectors with the fp32 reference.
+
+    Returns:
+        metrics: Cosine similarity of each vector to its reference, and the overlap
+            of each question's top_k nearest chunks between the two models
+    """
+    import numpy as np
+
+    def unit(vectors):
+        return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+    reference, candidate = unit(reference), unit(candidate)
+    reference_queries, candidate_queries = unit(reference_queries), unit(candidate_queries)
+    cosine = np.concatenate([
+        (reference * candidate).sum(axis=1),
+        (reference_queries * candidate_queries).sum(axis=1)
+    ])
+
+    top_k = min(top_k, len(reference))
+    reference_top = np.argsort(-(reference_queries @ reference.T), axis=1)[:, :top_k]
+    candidate_top = np.argsort(-(candidate_queries @ candidate.T), axis=1)[:, :top_k]
+    overlap = [len(set(a) & set(b)) / top_k for a, b in zip(reference_top.tolist(), candidate_top.tolist())]
+
+    return {
+        "mean_cosine": round(float(cosine.mean()), 5),
+        "min_cosine": round(float(cosine.min()), 5),
+        f"top{top_k}_overlap": round(float(np.mean(overlap)), 4),
+        "top1_agreement": round(float(np.mean(reference_top[:, 0] == candidate_top[:, 0])), 4)
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.embedding_accuracy", description="Compare an embedding backend with fp32.")
+    parser.add_argument("--backend", default="int8", help="Backend checked against fp32")
+    parser.add_argument("--threads", type=int, default=None, help="Intra-op threads, defaults to EMBEDDING_THREADS")
+    parser.add_argument("--size", default="small", help="Corpus size the reference chunks are taken from")
+    parser.add_argument("--queries", type=int, default=200, help="Reference questions")
+    parser.add_argument("--top-k", type=int, default=8, help="Nearest chunks compared per question")
+    parser.add_argument("--min-mean-cosine", type=float, default=0.99, help="Fail below this mean cosine similarity to fp32")
+    parser.add_argument("--min-overlap", type=float, default=0.85, help="Fail below this mean top-k overlap with fp32")
+    parser.add_argument("--output", help="Result file, defaults to a timestamped file in benchmarks/results")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    from backend.embedding_service import load_embedding_model, EMBEDDING_BACKENDS
+    if args.backend not in EMBEDDING_BACKENDS:
+        print(f"Unknown backend: {args.backend}. Use one of {', '.join(EMBEDDING_BACKENDS)}.", file=sys.stderr)
+        return 2
+
+    chunks, questions = reference_set(args.size, args.queries, seed=args.seed)
+    print(f"reference set: {len(chunks)} chunks, {len(questions)} questions")
+
+    results = {"config": vars(args), "chunks": len(chunks), "questions": len(questions)}
+    vectors = {}
+    for backend in ("fp32", args.backend):
+        embeddings_model = load_embedding_model(backend, threads=args.threads)
+        if embeddings_model is None:
+            print(f"Failed to load the {backend} embedding model", file=sys.stderr)
+            return 1
+        documents, queries, speed = encode(embeddings_model, chunks, questions)
+        vectors[backend] = (documents, queries)
+        results[backend] = speed
+        print(f"{backend}: {speed['chunks_per_second']} chunks/s, {speed['query_ms']} ms per query")
+
+    metrics = compare(*vectors["fp32"], *vectors[args.backend], top_k=args.top_k) if args.backend != "fp32" else None
+    results["accuracy"] = metrics
+    results["speedup"] = round(results[args.backend]["chunks_per_second"] / max(results["fp32"]["chunks_per_second"], 1e-9), 2)
+    passed = metrics is None or (
+        metrics["mean_cosine"] >= args.min_mean_cosine and metrics[f"top{min(args.top_k, len(chunks))}_overlap"] >= args.min_overlap
+    )
+    results["passed"] = passed
+    if metrics:
+        print(f"{args.backend} vs fp32: " + ", ".join(f"{key} {value}" for key, value in metrics.items()) + f", speedup {results['speedup']}x")
+    print("PASS" if passed else "FAIL")
+
+    output = args.output or os.path.join(RESULTS_DIR, time.strftime(f"embedding-{args.backend}-%Y%m%d-%H%M%S.json"))
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"results written to {output}")
+    return 0 if passed else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+import os
+import time
+import threading
+from backend.local_vector_store import LocalVectorIndex
+
+class FakePineconeIndex(LocalVectorIndex):
+    """
+    In-memory stand-in for a Pinecone index.
+
+    Answers from the local index and sleeps for a fixed round trip on every
+    request, so request counts and batching show up in the timings the way
+    they would against the hosted service.
+    """
+
+    def __init__(self, latency_ms=0.0):
+        super().__init__(persist_dir=None)
+        self.latency = latency_ms / 1000.0
+        self.requests = {"upsert": 0, "query": 0, "update": 0, "delete": 0, "describe_index_stats": 0}
+        self._requests_lock = threading.Lock()
+
+    def _round_trip(self, kind):
+        with self._requests_lock:
+            self.requests[kind] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def upsert(self, vectors, namespace=""):
+        self._round_trip("upsert")
+        return super().upsert(vectors, namespace=namespace)
+
+    def query(self, vector, top_k=10, namespace="", include_metadata=False, include_values=False, **kwargs):
+        self._round_trip("query")
+        return super().query(vector, top_k=top_k, namespace=namespace, include_metadata=include_metadata, include_values=include_values, **kwargs)
+
+    def update(self, id, set_metadata=None, namespace="", **kwargs):
+        self._round_trip("update")
+        return super().update(id, set_metadata=set_metadata, namespace=namespace, **kwargs)
+
+    def delete(self, ids=None, delete_all=False, namespace="", **kwargs):
+        self._round_trip("delete")
+        return super().delete(ids=ids, delete_all=delete_all, namespace=namespace, **kwargs)
+
+    def describe_index_stats(self):
+        self._round_trip("describe_index_stats")
+        return super().describe_index_stats()
+
+class FakeMessage:
+    """Chat model output with the .content attribute the app reads."""
+
+    def __init__(self, content):
+        self.content = content
+
+class FakeLLM:
+    """
+    Stand-in for the Gemini chat model with configurable latency.
+
+    Args:
+        first_token_ms: Delay before the first piece of the answer
+        tokens_per_second: Rate at which the rest of the answer is produced
+        answer_tokens: Length of every answer in words
+    """
+
+    def __init__(self, first_token_ms=400.0, tokens_per_second=80.0, answer_tokens=120):
+        self.first_token = first_token_ms / 1000.0
+        self.token_interval = 1.0 / tokens_per_second if tokens_per_second > 0 else 0.0
+        self.answer_tokens = answer_tokens
+        self.prompt_chars = 0
+
+    def _answer_words(self, prompt):
+        self.prompt_chars += len(prompt)
+        words = prompt.split() or ["answer"]
+        return [words[i % len(words)] for i in range(self.answer_tokens)]
+
+    def invoke(self, prompt):
+        words = self._answer_words(prompt)
+        time.sleep(self.first_token + self.token_interval * (len(words) - 1))
+        return FakeMessage(" ".join(words))
+
+    def stream(self, prompt):
+        words = self._answer_words(prompt)
+        time.sleep(self.first_token)
+        for i, word in enumerate(words):
+            if i:
+                time.sleep(self.token_interval)
+            yield FakeMessage(word + " ")
+
+class BenchSessionState(dict):
+    """
+    Session state for running the backend outside `streamlit run`.
+
+    Bare Streamlit hands out an empty state on every access, which the
+    backend's read-after-write patterns cannot work with.
+    """
+
+    def __getattr__(self, key):
+        try:
+            return self[key]
+        except KeyError:
+            raise AttributeError(key)
+
+    def __setattr__(self, key, value):
+        self[key] = value
+
+def install_fakes(vector_latency_ms=0.0, llm_first_token_ms=400.0, llm_tokens_per_second=80.0):
+    """
+    Point the backend at the fake index and fake LLM.
+
+    Returns:
+        index: The FakePineconeIndex in use
+        llm: The FakeLLM in use
+    """
+    import streamlit
+    import backend.local_vector_store as local_vector_store
+    import backend.pinecone_storage as pinecone_storage
+    import backend.response_generation as response_generation
+
+    index = FakePineconeIndex(latency_ms=vector_latency_ms)
+    llm = FakeLLM(first_token_ms=llm_first_token_ms, tokens_per_second=llm_tokens_per_second)
+
+    local_vector_store._local_index = index
+    pinecone_storage.VECTOR_STORE = "local" #get_vector_index then returns the fake instead of connecting to Pinecone
+    response_generation._create_answer_llm = lambda api_key: llm
+    os.environ.setdefault("GOOGLE_API_KEY", "benchmark") #the answer path refuses to run without a key
+    streamlit.session_state = BenchSessionState()
+    return index, llm
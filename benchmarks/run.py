@@ -0,0 +1,287 @@
+"""
+Offline end-to-end benchmark of ingestion and querying.
+
+    python -m benchmarks.run --sizes small,medium --queries 50
+
+Pinecone and Gemini are replaced by in-process fakes with configurable
+latency; extraction, chunking, embedding and retrieval run for real. Results
+are written as JSON so runs can be compared between releases.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import subprocess
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMPORT_PROFILE_TARGETS = { #entry point -> module it imports, each timed in a fresh interpreter
+    "landing_page": "landing_page.app",
+    "main_page": "components.heart",
+    "embedding_model": "sentence_transformers"
+}
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB, or None where it cannot be read."""
+    try:
+        import resource
+    except ImportError: #not available on Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1) #bytes on macOS, kilobytes elsewhere
+
+def percentiles(samples):
+    """Summarize latencies in seconds as milliseconds."""
+    import numpy as np
+    if not samples:
+        return None
+    values = np.asarray(samples) * 1000
+    return {
+        "count": len(samples),
+        "mean_ms": round(float(values.mean()), 2),
+        "p50_ms": round(float(np.percentile(values, 50)), 2),
+        "p95_ms": round(float(np.percentile(values, 95)), 2),
+        "p99_ms": round(float(np.percentile(values, 99)), 2),
+        "max_ms": round(float(values.max()), 2)
+    }
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except Exception:
+        return None
+
+def profile_import(module, top=10):
+    """
+    Import a module in a fresh interpreter with -X importtime.
+
+    Args:
+        module: Dotted module name, resolved against the repository and app/ like `streamlit run` does
+        top: Number of slowest packages reported
+
+    Returns:
+        profile: {seconds, slowest: [[package, seconds including its own imports], ...]}, or {error} if the import failed
+    """
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [REPO_ROOT, os.path.join(REPO_ROOT, "app"), os.environ.get("PYTHONPATH")])))
+    start = time.perf_counter()
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=REPO_ROOT, env=env, capture_output=True, text=True)
+    seconds = time.perf_counter() - start
+    if completed.returncode != 0:
+        lines = completed.stderr.strip().splitlines()
+        return {"error": lines[-1] if lines else f"exit code {completed.returncode}"}
+
+    packages = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[1].strip().isdigit(): #the header line
+            continue
+        name = fields[2].strip()
+        if "." not in name: #a package's root import includes everything below it
+            packages[name] = max(packages.get(name, 0), int(fields[1]) / 1e6)
+    slowest = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+    return {"seconds": round(seconds, 3), "slowest": [[name, round(value, 3)] for name, value in slowest]}
+
+def bench_stages(files):
+    """Time extraction, splitting and embedding of one document, serially and without the pipeline around them."""
+    from backend.pdf_ingestion import extract_pages_from_pdf
+    from backend.text_chunking import split_pages
+    from backend.embedding_service import get_embedding_model
+    from backend.embedding_batching import embed_chunks
+
+    filename, pdf_bytes = files[0]
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
+        tmp.write(pdf_bytes)
+    try:
+        start = time.perf_counter()
+        pages, _ = extract_pages_from_pdf(tmp.name, workers=1)
+        extract_seconds = time.perf_counter() - start
+    finally:
+        os.remove(tmp.name)
+
+    start = time.perf_counter()
+    chunks = [chunk for chunk, _ in split_pages(pages)]
+    split_seconds = time.perf_counter() - start
+
+    embeddings_model = get_embedding_model()
+    start = time.perf_counter()
+    embeddings_model.embed_documents(chunks)
+    embed_seconds = time.perf_counter() - start
+
+    headings = [" ".join(chunk.split()[:4]) for chunk in chunks]
+    mixed = [text for pair in zip(headings, chunks) for text in pair] #short headings between long paragraphs
+    start = time.perf_counter()
+    embeddings_model.embed_documents(mixed)
+    mixed_seconds = time.perf_counter() - start
+    _, bucketed = embed_chunks(embeddings_model, chunks)
+    _, bucketed_mixed = embed_chunks(embeddings_model, mixed)
+
+    return {
+        "document": filename,
+        "pages": len(pages),
+        "chunks": len(chunks),
+        "extract_pages_per_second": round(len(pages) / max(extract_seconds, 1e-9), 1),
+        "split_chunks_per_second": round(len(chunks) / max(split_seconds, 1e-9), 1),
+        "embed_chunks_per_second": round(len(chunks) / max(embed_seconds, 1e-9), 1),
+        "embed_bucketed": bucketed,
+        "embed_mixed_chunks_per_second": round(len(mixed) / max(mixed_seconds, 1e-9), 1),
+        "embed_mixed_bucketed": bucketed_mixed
+    }
+
+def bench_ingest(files, pages, namespace, index, workers):
+    """Ingest a corpus through the full pipeline and report throughput."""
+    from backend.ingestion_pipeline import ingest_files
+
+    requests_before = dict(index.requests)
+    start = time.perf_counter()
+    results = ingest_files(files, namespace=namespace, cpu_workers=workers)
+    seconds = time.perf_counter() - start
+
+    chunks = sum(result["chunks"] for result in results)
+    return {
+        "documents": len(files),
+        "pages": pages,
+        "chunks": chunks,
+        "failed": [result["name"] for result in results if result["status"] == "failed"],
+        "seconds": round(seconds, 3),
+        "pages_per_second": round(pages / seconds, 1),
+        "chunks_per_second": round(chunks / seconds, 1),
+        "index_requests": {kind: count - requests_before[kind] for kind, count in index.requests.items()},
+        "peak_rss_mb": peak_rss_mb()
+    }
+
+def bench_queries(queries, namespace, top_k):
+    """Run queries end to end and report per-stage latency percentiles."""
+    import streamlit as st
+    from backend.query_processing import process_query
+    from backend.retrieval import retrieve_chunks
+    from backend.response_generation import stream_direct_response_with_chunks
+
+    timings = {"process_query": [], "retrieve_chunks": [], "time_to_first_token": [], "generation": [], "total": []}
+    empty_results = 0
+    for query in queries:
+        st.session_state.clear()
+        start = time.perf_counter()
+        query_embedding, processed_query, original_query = process_query(query)
+        embedded = time.perf_counter()
+        chunks = retrieve_chunks(query_embedding, query_text=processed_query, namespace=namespace, top_k=top_k)
+        retrieved = time.perf_counter()
+        if not chunks:
+            empty_results += 1
+
+        first_token = None
+        for _ in stream_direct_response_with_chunks(original_query, chunks, query_embedding=query_embedding, namespace=namespace):
+            if first_token is None:
+                first_token = time.perf_counter()
+        finished = time.perf_counter()
+
+        timings["process_query"].append(embedded - start)
+        timings["retrieve_chunks"].append(retrieved - embedded)
+        timings["time_to_first_token"].append((first_token or finished) - retrieved)
+        timings["generation"].append(finished - retrieved)
+        timings["total"].append(finished - start)
+
+    return {
+        "namespace": namespace,
+        "queries": len(queries),
+        "empty_results": empty_results,
+        "latency": {stage: percentiles(samples) for stage, samples in timings.items()},
+        "peak_rss_mb": peak_rss_mb()
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run", description="Offline ingestion and query benchmark.")
+    parser.add_argument("--sizes", default="small,medium", help="Comma separated corpus sizes: small, medium, large")
+    parser.add_argument("--queries", type=int, default=50, help="Queries run against the largest corpus")
+    parser.add_argument("--top-k", type=int, default=8, help="Chunks retrieved per query")
+    parser.add_argument("--workers", type=int, default=2, help="Documents extracted and embedded at once")
+    parser.add_argument("--vector-latency-ms", type=float, default=20.0, help="Round trip added to every fake index request")
+    parser.add_argument("--llm-first-token-ms", type=float, default=400.0, help="Fake LLM delay before the first token")
+    parser.add_argument("--llm-tokens-per-second", type=float, default=80.0, help="Fake LLM generation speed")
+    parser.add_argument("--output", help="Result file, defaults to a timestamped file in benchmarks/results")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--skip-import-profile", action="store_true", help="Do not time the app's imports in fresh interpreters")
+    args = parser.parse_args(argv)
+
+    started = time.time()
+    profile = {} #startup costs, the backend is first imported below
+    cache_dir = tempfile.mkdtemp(prefix="queryquack-bench-")
+    os.environ["QUERYQUACK_CACHE_DIR"] = cache_dir #fresh caches, or a second run would only measure cache hits
+    os.environ.pop("LOCAL_VECTOR_STORE_DIR", None)
+
+    if not args.skip_import_profile:
+        profile["imports"] = {name: profile_import(module) for name, module in IMPORT_PROFILE_TARGETS.items()}
+        for name, imports in profile["imports"].items():
+            print(f"import {name}: " + (f"{imports['seconds']}s" if "seconds" in imports else f"failed ({imports['error']})"))
+
+    import_start = time.perf_counter()
+    from benchmarks.fakes import install_fakes
+    from benchmarks.corpus import CORPUS_SIZES, make_corpus, make_queries
+    from backend.embedding_service import warm_up_embedding_model, get_embedding_model_id
+    profile["backend_import_seconds"] = round(time.perf_counter() - import_start, 3)
+
+    try:
+        from streamlit.logger import set_log_level
+        set_log_level("error") #bare mode warns about the missing script context on every call
+    except Exception:
+        pass
+
+    sizes = [size.strip() for size in args.sizes.split(",") if size.strip()]
+    unknown = [size for size in sizes if size not in CORPUS_SIZES]
+    if unknown:
+        print(f"Unknown corpus sizes: {', '.join(unknown)}", file=sys.stderr)
+        return 2
+
+    index, _ = install_fakes(args.vector_latency_ms, args.llm_first_token_ms, args.llm_tokens_per_second)
+    load_start = time.perf_counter()
+    warm_up_embedding_model()
+    profile["model_load_seconds"] = round(time.perf_counter() - load_start, 3)
+
+    results = {
+        "started_at": started,
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "config": vars(args),
+        "embedding_model": get_embedding_model_id(),
+        "startup": profile,
+        "stages": {},
+        "ingest": {},
+        "query": None
+    }
+
+    for size in sizes:
+        files, pages = make_corpus(size, seed=args.seed)
+        results["stages"][size] = bench_stages(files)
+        results["ingest"][size] = bench_ingest(files, pages, f"bench-{size}", index, args.workers)
+        ingest = results["ingest"][size]
+        print(f"ingest {size}: {ingest['pages']} pages, {ingest['chunks']} chunks in {ingest['seconds']}s "
+              f"({ingest['pages_per_second']} pages/s, {ingest['chunks_per_second']} chunks/s)")
+
+    if sizes and args.queries > 0:
+        results["query"] = bench_queries(make_queries(args.queries, seed=args.seed), f"bench-{sizes[-1]}", args.top_k)
+        total = results["query"]["latency"]["total"]
+        print(f"query: p50 {total['p50_ms']} ms, p95 {total['p95_ms']} ms, p99 {total['p99_ms']} ms over {total['count']} queries")
+
+    from backend.tracing import get_stage_stats
+    from backend.embedding_batching import get_embedding_batch_stats
+    results["traced_stages"] = get_stage_stats() #where the time went inside the pipeline, across all scenarios
+    results["embedding_batches"] = get_embedding_batch_stats()
+    results["peak_rss_mb"] = peak_rss_mb()
+    results["seconds"] = round(time.time() - started, 1)
+    print(f"peak RSS: {results['peak_rss_mb']} MB")
+
+    output = args.output or os.path.join(RESULTS_DIR, time.strftime("bench-%Y%m%d-%H%M%S.json", time.localtime(started)))
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"results written to {output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,26 @@
+from backend.context_builder import build_context
+
+FILENAME = "manual.pdf"
+
+def chunk(chunk_id, text, chunk_index):
+    return {"id": chunk_id, "text": text, "metadata": {"filename": FILENAME, "chunk_index": chunk_index}}
+
+def test_chunks_claiming_the_same_index_are_both_kept():
+    new_chunk = chunk("a", "Safety notice: disconnect power first.", 0)
+    stale_chunk = chunk("b", "The pump must be primed before the first start.", 0)
+
+    passages, _ = build_context([new_chunk, stale_chunk])
+
+    texts = [passage["text"] for passage in passages]
+    assert new_chunk["text"] in texts[0] #the best chunk is never dropped
+    assert any(stale_chunk["text"] in text for text in texts)
+
+def test_consecutive_chunks_are_merged_into_one_passage():
+    passages, stats = build_context([
+        chunk("b", "Check the seal for leaks after every service interval.", 1),
+        chunk("a", "The pump must be primed before the first start.", 0)
+    ])
+
+    assert stats["passages"] == 1
+    assert passages[0]["chunk_indexes"] == [0, 1]
+    assert passages[0]["text"].startswith("The pump must be primed")
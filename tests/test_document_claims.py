@@ -0,0 +1,21 @@
+from backend.ingestion_pipeline import claim_document, release_document
+
+NAMESPACE = "test"
+
+def test_versions_of_a_file_are_granted_in_order():
+    granted = []
+    assert claim_document(NAMESPACE, "manual.pdf", lambda: granted.append(1))
+    assert not claim_document(NAMESPACE, "manual.pdf", lambda: granted.append(2))
+    assert not claim_document(NAMESPACE, "manual.pdf", lambda: granted.append(3))
+    assert claim_document("other", "manual.pdf", lambda: granted.append("other")) #namespaces do not wait for each other
+    assert granted == [1, "other"]
+
+    release_document(NAMESPACE, "manual.pdf")
+    assert granted == [1, "other", 2]
+    release_document(NAMESPACE, "manual.pdf")
+    release_document(NAMESPACE, "manual.pdf")
+    release_document("other", "manual.pdf")
+    assert granted == [1, "other", 2, 3]
+
+    assert claim_document(NAMESPACE, "manual.pdf", lambda: granted.append(4)) #free again once every claim is released
+    release_document(NAMESPACE, "manual.pdf")
@@ -0,0 +1,58 @@
+import pytest
+from backend import document_manifest
+from backend.document_manifest import plan_document_update, save_manifest, find_document
+from backend.text_chunking import build_chunk_metadata
+
+NAMESPACE = "test"
+FILENAME = "manual.pdf"
+PARAGRAPHS = [
+    "The pump must be primed before the first start.",
+    "Check the seal for leaks after every service interval.",
+    "Replace the filter cartridge when the pressure drops."
+]
+
+@pytest.fixture(autouse=True)
+def manifest_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(document_manifest, "MANIFEST_DIR", str(tmp_path))
+
+def ingest(paragraphs, content_hash):
+    """Plan and record one version of the document, the way prepare_document and store_document do."""
+    offsets = []
+    start = 0
+    for paragraph in paragraphs:
+        offsets.append({"page": 1, "page_end": 1, "char_start": start, "char_end": start + len(paragraph)})
+        start += len(paragraph) + 2
+    chunk_metadata = build_chunk_metadata(paragraphs, {"filename": FILENAME}, offsets)
+    plan = plan_document_update(NAMESPACE, FILENAME, content_hash, paragraphs, chunk_metadata)
+    save_manifest(NAMESPACE, plan["doc_key"], FILENAME, content_hash, plan["ids"], plan["positions"])
+    return plan, chunk_metadata
+
+def test_reingest_unchanged_document_does_nothing():
+    ingest(PARAGRAPHS, "v1")
+    plan, _ = ingest(PARAGRAPHS, "v1")
+
+    assert plan["unchanged"]
+    assert plan["new_positions"] == []
+    assert plan["moved_positions"] == []
+
+def test_paragraph_inserted_at_top_moves_the_stored_chunks():
+    first, _ = ingest(PARAGRAPHS, "v1")
+    plan, chunk_metadata = ingest(["Safety notice: disconnect power first."] + PARAGRAPHS, "v2")
+
+    assert plan["new_positions"] == [0] #only the inserted paragraph is embedded
+    assert plan["moved_positions"] == [1, 2, 3] #the others keep their vectors but get new positions
+    assert plan["stale_ids"] == []
+    assert not plan["unchanged"]
+    assert plan["ids"][1:] == first["ids"]
+    assert [chunk_metadata[i]["chunk_index"] for i in plan["moved_positions"]] == [1, 2, 3]
+    assert chunk_metadata[1]["char_start"] > 0
+
+    again, _ = ingest(["Safety notice: disconnect power first."] + PARAGRAPHS, "v2")
+    assert again["unchanged"] #positions were recorded, nothing left to rewrite
+
+def test_stored_content_is_found_under_its_first_filename():
+    ingest(PARAGRAPHS, "v1")
+
+    assert find_document(NAMESPACE, "v1") == FILENAME
+    assert find_document(NAMESPACE, "v2") is None
+    assert find_document("other", "v1") is None
@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+from backend import ingestion_cache
+from backend.ingestion_cache import open_ingestion_cache, load_cached_ingestion, save_ingestion
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingestion_cache, "INGESTION_CACHE_DIR", str(tmp_path))
+    return tmp_path
+
+def test_streamed_batches_load_as_one_entry():
+    writer = open_ingestion_cache("key")
+    writer.append(["first", "second"], [{"page": 1}, {"page": 1}], [[1.0, 0.0], [0.0, 1.0]])
+    writer.append(["third"], [{"page": 2}], np.array([[0.5, 0.5]]))
+    assert load_cached_ingestion("key") is None #nothing is visible before commit
+    assert writer.commit({"Author": "someone"}, pages=120)
+
+    entry = load_cached_ingestion("key")
+    assert entry["chunks"] == ["first", "second", "third"]
+    assert entry["chunk_offsets"][2] == {"page": 2}
+    assert entry["pages"] == 120
+    assert entry["pdf_metadata"] == {"Author": "someone"}
+    assert np.allclose(entry["embeddings"][[0, 2]], [[1.0, 0.0], [0.5, 0.5]])
+
+def test_aborted_entry_leaves_nothing_behind(cache_dir):
+    writer = open_ingestion_cache("key")
+    writer.append(["first"], [None], [[1.0, 0.0]])
+    writer.abort()
+
+    assert not writer.commit({})
+    assert load_cached_ingestion("key") is None
+    assert list(cache_dir.iterdir()) == []
+
+def test_existing_entry_is_not_written_again():
+    assert save_ingestion("key", {}, ["first"], [[1.0, 0.0]], [None], pages=3)
+    assert open_ingestion_cache("key") is None
+    assert save_ingestion("key", {}, ["other"], [[0.0, 1.0]])
+    assert load_cached_ingestion("key")["chunks"] == ["first"]
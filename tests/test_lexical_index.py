@@ -0,0 +1,55 @@
+import pytest
+from backend import chunk_store, lexical_index
+from backend.chunk_store import put_chunks
+from backend.lexical_index import add_documents, remove_documents, clear_namespace, search
+
+NAMESPACE = "test"
+
+@pytest.fixture(autouse=True)
+def store_path(tmp_path, monkeypatch):
+    path = str(tmp_path / "chunks.db")
+    monkeypatch.setattr(chunk_store, "CHUNK_STORE_PATH", path)
+    monkeypatch.setattr(lexical_index, "CHUNK_STORE_PATH", path)
+    monkeypatch.setattr(lexical_index, "_schema_ready", False)
+    return path
+
+def vector(doc_id, text):
+    return {"id": doc_id, "metadata": {"filename": "manual.pdf", "text": text}}
+
+def store(namespace, vectors):
+    """Store vectors the way upsert_vectors does: chunk store first, then the lexical index."""
+    put_chunks(namespace, vectors)
+    add_documents(namespace, vectors)
+
+def test_part_numbers_match_whole_and_by_part():
+    store(NAMESPACE, [
+        vector("a", "Replace seal AB-1234 every year."),
+        vector("b", "The pump must be primed before the first start.")
+    ])
+
+    results = search(NAMESPACE, "where is ab-1234")
+    assert [doc_id for doc_id, _, _ in results] == ["a"]
+    assert results[0][2]["text"] == "Replace seal AB-1234 every year." #text comes from the chunk store
+    assert [doc_id for doc_id, _, _ in search(NAMESPACE, "1234")] == ["a"]
+
+def test_namespaces_are_searched_separately():
+    store(NAMESPACE, [vector("a", "pump seal")])
+    store("other", [vector("b", "pump seal")])
+
+    assert [doc_id for doc_id, _, _ in search(NAMESPACE, "pump")] == ["a"]
+    clear_namespace("other")
+    assert search("other", "pump") == []
+    assert [doc_id for doc_id, _, _ in search(NAMESPACE, "pump")] == ["a"]
+
+def test_removed_and_replaced_chunks_are_not_found():
+    store(NAMESPACE, [vector("a", "pump seal"), vector("b", "filter cartridge")])
+    store(NAMESPACE, [vector("a", "drive belt")])
+    remove_documents(NAMESPACE, ["b"])
+
+    assert search(NAMESPACE, "pump filter") == []
+    assert [doc_id for doc_id, _, _ in search(NAMESPACE, "belt")] == ["a"]
+
+def test_chunks_stored_before_the_index_existed_are_indexed():
+    put_chunks(NAMESPACE, [vector("a", "Replace seal AB-1234 every year.")]) #e.g. loaded by an older version
+
+    assert [doc_id for doc_id, _, _ in search(NAMESPACE, "seal")] == ["a"]
@@ -0,0 +1,53 @@
+import os
+from backend import local_vector_store
+from backend.local_vector_store import LocalVectorIndex
+
+NAMESPACE = "test"
+
+def vector(vector_id, values, **metadata):
+    return {"id": vector_id, "values": values, "metadata": metadata}
+
+def ids(index, values):
+    return [match.id for match in index.query(values, top_k=10, namespace=NAMESPACE).matches]
+
+def test_changes_survive_a_restart_without_a_snapshot(tmp_path):
+    index = LocalVectorIndex(dimension=2, persist_dir=str(tmp_path))
+    index.upsert([vector("a", [1.0, 0.0], page=1), vector("b", [0.0, 1.0], page=2)], namespace=NAMESPACE)
+    with open(tmp_path / "test.journal.f32", "ab") as f:
+        f.write(b"\0" * 3) #rows of an upsert whose entry was never written
+    index.upsert([vector("c", [1.0, 1.0], page=3)], namespace=NAMESPACE)
+    index.update("a", set_metadata={"page": 4}, namespace=NAMESPACE)
+    index.delete(ids=["b"], namespace=NAMESPACE)
+    assert index.persist(NAMESPACE)
+    assert not os.path.exists(tmp_path / "test.npy") #small changes are only appended
+
+    reloaded = LocalVectorIndex(dimension=2, persist_dir=str(tmp_path))
+    matches = reloaded.query([1.0, 0.0], top_k=10, namespace=NAMESPACE, include_metadata=True).matches
+    assert [match.id for match in matches] == ["a", "c"]
+    assert matches[0].metadata == {"page": 4}
+
+def test_journal_is_compacted_once_it_outgrows_the_namespace(tmp_path, monkeypatch):
+    monkeypatch.setattr(local_vector_store, "LOCAL_COMPACT_MIN_ENTRIES", 2)
+    index = LocalVectorIndex(dimension=2, persist_dir=str(tmp_path))
+    index.upsert([vector("a", [1.0, 0.0]), vector("b", [0.0, 1.0])], namespace=NAMESPACE)
+    index.upsert([vector("a", [1.0, 0.2])], namespace=NAMESPACE)
+    index.persist(NAMESPACE)
+
+    assert os.path.exists(tmp_path / "test.npy")
+    assert not os.path.exists(tmp_path / "test.journal.jsonl")
+    index.delete(ids=["b"], namespace=NAMESPACE)
+    assert ids(LocalVectorIndex(dimension=2, persist_dir=str(tmp_path)), [0.0, 1.0]) == ["a"]
+
+def test_entry_cut_short_by_a_crash_is_ignored(tmp_path):
+    index = LocalVectorIndex(dimension=2, persist_dir=str(tmp_path))
+    index.upsert([vector("a", [1.0, 0.0])], namespace=NAMESPACE)
+    with open(tmp_path / "test.journal.f32", "ab") as f:
+        f.write(b"\0" * 6) #rows written, entry never
+    with open(tmp_path / "test.journal.jsonl", "a", encoding="utf-8") as f:
+        f.write('{"op": "delete", "ids": ["a"') #killed mid-line
+
+    reloaded = LocalVectorIndex(dimension=2, persist_dir=str(tmp_path))
+    assert ids(reloaded, [1.0, 0.0]) == ["a"]
+    assert not os.path.exists(tmp_path / "test.journal.jsonl")
+    reloaded.upsert([vector("b", [0.0, 1.0])], namespace=NAMESPACE) #appended to a fresh journal, not after the damaged line
+    assert ids(LocalVectorIndex(dimension=2, persist_dir=str(tmp_path)), [0.0, 1.0]) == ["b", "a"]